@@ -0,0 +1,120 @@
+import asyncio
+import itertools
+import json
+import secrets
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Set, Tuple
+
+EVENT_TYPES = {"post_created", "comment_added", "like_changed", "post_pinned", "post_deleted"}
+RECONNECT_DELAY_MS = 3000
+# Sent instead of events a subscriber missed: the client should refetch the feed.
+RESYNC: Tuple[Optional[int], str, Dict[str, Any]] = (None, "resync", {})
+
+
+class Subscriber:
+    """One SSE connection behind a bounded queue, so a slow client cannot buffer without limit."""
+
+    def __init__(self, max_queue: int):
+        self.queue: "asyncio.Queue[Tuple[Optional[int], str, Dict[str, Any]]]" = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def offer(self, item: Tuple[Optional[int], str, Dict[str, Any]]):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Drop what the client has not read yet and tell it to refetch once it catches up.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+                self.dropped += 1
+            self.dropped += 1
+            self.queue.put_nowait(RESYNC)
+
+
+class CommunityEventBroker:
+    """
+    In-process fan-out of community activity to SSE subscribers. Events carry increasing ids
+    and the most recent ones are kept, so a reconnecting EventSource (Last-Event-ID) gets what
+    it missed. Each worker process has its own broker; events do not cross processes.
+
+    SSE ids are "<epoch>-<seq>" with a random epoch per broker, so an id handed out by another
+    process, or by this one before a restart, is recognized as foreign and answered with a
+    resync instead of being compared with sequence numbers it has nothing to do with.
+    """
+
+    def __init__(self, max_queue: int = 100, history: int = 256, heartbeat_seconds: float = 15.0):
+        self.max_queue = max(1, int(max_queue))
+        self.heartbeat_seconds = max(0.05, float(heartbeat_seconds))
+        self.epoch = secrets.token_hex(4)
+        self._ids = itertools.count(1)
+        self._history: Deque[Tuple[int, str, Dict[str, Any]]] = deque(maxlen=max(1, int(history)))
+        self._subscribers: Set[Subscriber] = set()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event: str, data: Dict[str, Any]):
+        """Must be called from the event loop thread (the async routes)."""
+        if event not in EVENT_TYPES:
+            raise ValueError(f"unknown community event: {event}")
+        item = (next(self._ids), event, data)
+        self._history.append(item)
+        for subscriber in list(self._subscribers):
+            subscriber.offer(item)
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def _parse_event_id(self, raw: str) -> Optional[int]:
+        """Sequence number of one of this broker's SSE ids; None for foreign or malformed ids."""
+        epoch, _, seq = str(raw).strip().rpartition("-")
+        return int(seq) if epoch == self.epoch and seq.isdigit() else None
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Subscriber:
+        """`last_event_id` is the raw Last-Event-ID of a reconnecting client, if any."""
+        subscriber = Subscriber(self.max_queue)
+        if last_event_id:
+            seq = self._parse_event_id(last_event_id)
+            if seq is None or not self._history or seq > self._history[-1][0]:
+                # Another process's id, one from before a restart, or one this broker never issued.
+                subscriber.offer(RESYNC)
+            elif seq < self._history[0][0] - 1:
+                subscriber.offer(RESYNC)  # history no longer reaches back that far
+            else:
+                for item in self._history:
+                    if item[0] > seq:
+                        subscriber.offer(item)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    def format_event(self, seq: Optional[int], event: str, data: Dict[str, Any]) -> str:
+        lines = []
+        if seq is not None:
+            lines.append(f"id: {self.event_id(seq)}")
+        lines.append(f"event: {event}")
+        lines.append(f"data: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}")
+        return "\n".join(lines) + "\n\n"
+
+    async def stream(self, subscriber: Subscriber, is_disconnected=None) -> AsyncIterator[str]:
+        """
+        SSE frames for one subscriber: events as they arrive and a comment line as heartbeat
+        when idle, so proxies keep the connection open and dead clients are noticed.
+        """
+        try:
+            yield f"retry: {RECONNECT_DELAY_MS}\n\n"
+            while True:
+                try:
+                    event_id, event, data = await asyncio.wait_for(
+                        subscriber.queue.get(), timeout=self.heartbeat_seconds
+                    )
+                except asyncio.TimeoutError:
+                    if is_disconnected is not None and await is_disconnected():
+                        break
+                    yield ": heartbeat\n\n"
+                    continue
+                yield self.format_event(event_id, event, data)
+        finally:
+            self.unsubscribe(subscriber)
@@ -0,0 +1,205 @@
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set
+
+# Day buckets older than this can no longer enter any window and are not kept.
+BUCKET_DAYS = 31
+
+
+def _day(raw: Any) -> Optional[str]:
+    try:
+        return datetime.fromisoformat(str(raw)).date().isoformat()
+    except Exception:
+        return None
+
+
+def _author(raw: Any) -> str:
+    return str(raw or "").strip().lower()
+
+
+class _Contribution:
+    """What one post adds to the aggregates, kept so a later write can be diffed against it."""
+
+    __slots__ = ("totals", "post_days", "comment_days", "authors")
+
+    def __init__(self, post: Dict[str, Any], oldest_day: str):
+        comments = [c for c in post.get("comments") or [] if isinstance(c, dict)]
+        reports = post.get("reports") if isinstance(post.get("reports"), list) else []
+        comment_reports = sum(len(c.get("reports")) for c in comments if isinstance(c.get("reports"), list))
+        likes = post.get("likes_count")
+        self.totals = Counter({
+            "total_posts": 1,
+            "total_comments": len(comments),
+            "total_likes": likes if isinstance(likes, int) else 0,
+            "total_reports": len(reports) + comment_reports,
+            "pinned_posts": 1 if post.get("is_pinned") else 0,
+            "helpful_marked_posts": 1 if str(post.get("helpful_comment_id") or "").strip() else 0,
+        })
+        self.post_days: Counter = Counter()
+        self.comment_days: Counter = Counter()
+        self.authors: Counter = Counter()
+        day = _day(post.get("timestamp"))
+        if day and day >= oldest_day:
+            self.post_days[day] += 1
+            if _author(post.get("author")):
+                self.authors[(day, _author(post.get("author")))] += 1
+        for comment in comments:
+            day = _day(comment.get("timestamp"))
+            if day and day >= oldest_day:
+                self.comment_days[day] += 1
+                if _author(comment.get("author")):
+                    self.authors[(day, _author(comment.get("author")))] += 1
+
+
+class CommunityMetrics:
+    """
+    Running community aggregates: totals, plus per-day post/comment counts and per-day active
+    author multisets for the last BUCKET_DAYS days. Writes re-contribute the one post they
+    touched (an indexed lookup), so reading the metrics costs O(days in window) instead of a
+    scan of every post and comment. The aggregates remember the posts collection version they
+    are current with: a snapshot rebuilds when it moved for any other reason than this
+    process's own writes (another worker wrote), and a full rebuild also runs every
+    `reconcile_seconds` as a safety net.
+    """
+
+    def __init__(
+        self,
+        load_posts: Callable[[], List[Dict]],
+        load_post: Callable[[str], Optional[Dict]],
+        load_version: Callable[[], Optional[str]],
+        reconcile_seconds: float = 600.0,
+    ):
+        self.load_posts = load_posts
+        self.load_post = load_post
+        self.load_version = load_version
+        self.reconcile_seconds = max(1.0, float(reconcile_seconds))
+        self._lock = threading.RLock()
+        self._built_at: Optional[float] = None
+        self._version: Optional[str] = None
+        self._contributions: Dict[str, _Contribution] = {}
+        self._totals: Counter = Counter()
+        self._post_days: Counter = Counter()
+        self._comment_days: Counter = Counter()
+        self._authors_by_day: Dict[str, Counter] = {}
+        # Posts written while a rebuild scans the store, re-applied once it finishes.
+        self._touched_during_rebuild: Optional[Set[str]] = None
+
+    @staticmethod
+    def _oldest_day(now: datetime) -> str:
+        return (now - timedelta(days=BUCKET_DAYS)).date().isoformat()
+
+    def _apply(self, contribution: _Contribution, sign: int):
+        self._totals.update({k: sign * v for k, v in contribution.totals.items()})
+        self._post_days.update({k: sign * v for k, v in contribution.post_days.items()})
+        self._comment_days.update({k: sign * v for k, v in contribution.comment_days.items()})
+        for (day, author), count in contribution.authors.items():
+            bucket = self._authors_by_day.setdefault(day, Counter())
+            bucket[author] += sign * count
+            if bucket[author] <= 0:
+                del bucket[author]
+
+    def is_stale(self) -> bool:
+        with self._lock:
+            return self._built_at is None or time.monotonic() - self._built_at >= self.reconcile_seconds
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+            self._version = None
+
+    def rebuild(self, version: Optional[str] = None):
+        """Full rebuild, recorded as current with `version` (read here when not given)."""
+        with self._lock:
+            self._touched_during_rebuild = set()
+        try:
+            # Read before the posts, so a write landing in between only causes one more rebuild.
+            version = self.load_version() if version is None else version
+            posts = self.load_posts()
+            oldest = self._oldest_day(datetime.now())
+            contributions = {
+                str(post.get("id") or ""): _Contribution(post, oldest) for post in posts if isinstance(post, dict)
+            }
+        except Exception:
+            with self._lock:
+                self._touched_during_rebuild = None
+            raise
+        with self._lock:
+            touched, self._touched_during_rebuild = self._touched_during_rebuild or set(), None
+            self._contributions = {}
+            self._totals, self._post_days, self._comment_days, self._authors_by_day = Counter(), Counter(), Counter(), {}
+            for post_id, contribution in contributions.items():
+                self._contributions[post_id] = contribution
+                self._apply(contribution, 1)
+            self._built_at = time.monotonic()
+            self._version = version
+            for post_id in touched:
+                self._refresh_post(post_id)
+
+    def touch(self, post_id: str, version: Optional[str] = None):
+        """
+        Re-contribute one post after a write to it (insert, update or delete). `version` is the
+        posts version that write produced: one step past the current one means it was the only
+        change since, and the aggregates stay current without a rebuild.
+        """
+        post_id = str(post_id or "")
+        with self._lock:
+            if self._touched_during_rebuild is not None:
+                self._touched_during_rebuild.add(post_id)
+            if self._built_at is None:
+                return
+            self._refresh_post(post_id)
+            if self._version is not None and version is not None and int(version) == int(self._version) + 1:
+                self._version = version
+
+    def _refresh_post(self, post_id: str):
+        # Under the lock, so the post is read after every write that touched it before.
+        previous = self._contributions.pop(post_id, None)
+        if previous is not None:
+            self._apply(previous, -1)
+        post = self.load_post(post_id)
+        if post is not None:
+            contribution = _Contribution(post, self._oldest_day(datetime.now()))
+            self._contributions[post_id] = contribution
+            self._apply(contribution, 1)
+
+    def snapshot(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        version = self.load_version()
+        with self._lock:
+            moved = version is None or version != self._version
+        if moved or self.is_stale():
+            self.rebuild(version)
+        now = now or datetime.now()
+        today = now.date()
+        # Day granularity: an N-day window is today plus the N-1 previous calendar days.
+        days_7 = [(today - timedelta(days=offset)).isoformat() for offset in range(7)]
+        days_30 = [(today - timedelta(days=offset)).isoformat() for offset in range(30)]
+        with self._lock:
+            totals = dict(self._totals)
+            posts_7d = sum(self._post_days.get(day, 0) for day in days_7)
+            comments_7d = sum(self._comment_days.get(day, 0) for day in days_7)
+            active_authors: Set[str] = set()
+            for day in days_30:
+                active_authors.update(self._authors_by_day.get(day, ()))
+            for day in [day for day in self._authors_by_day if day < days_30[-1]]:
+                del self._authors_by_day[day]
+
+        total_posts = totals.get("total_posts", 0)
+        engagement_actions = (
+            totals.get("total_comments", 0) + totals.get("total_likes", 0) + totals.get("helpful_marked_posts", 0)
+        )
+        return {
+            "total_posts": total_posts,
+            "total_comments": totals.get("total_comments", 0),
+            "total_likes": totals.get("total_likes", 0),
+            "total_reports": totals.get("total_reports", 0),
+            "pinned_posts": totals.get("pinned_posts", 0),
+            "helpful_marked_posts": totals.get("helpful_marked_posts", 0),
+            "active_authors_30d": len(active_authors),
+            "posts_7d": posts_7d,
+            "comments_7d": comments_7d,
+            "engagement_actions": engagement_actions,
+            "engagement_per_post": round((engagement_actions / total_posts), 2) if total_posts else 0.0,
+            "generated_at": now.isoformat(),
+        }
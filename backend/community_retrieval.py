@@ -0,0 +1,403 @@
+import math
+import random
+import sys
+import zlib
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional: MinHash falls back to pure Python, TF-IDF retrieval to BM25
+    np = None
+
+try:
+    from .search_index import ReconciledPostIndex
+    from .text_search import post_semantic_tokens, stored_token_vector
+except ImportError:
+    from search_index import ReconciledPostIndex
+    from text_search import post_semantic_tokens, stored_token_vector
+
+# Okapi BM25 parameters: term-frequency saturation and document-length normalization.
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# MinHash over a post's set of retrieval terms, split into LSH bands of rows each: two posts
+# land in a common bucket with probability 1 - (1 - J^rows)^bands for term-set Jaccard J
+# (about 0.5 at J = 0.2, all but certain at J >= 0.6).
+MINHASH_PERMUTATIONS = 32
+LSH_BANDS = 16
+LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+# Buckets this full (a very common term was the minimum) say little about similarity: skipped.
+LSH_MAX_BUCKET = 1000
+# Estimated Jaccard from which a new post is reported as a possible duplicate.
+DUPLICATE_SIMILARITY = 0.8
+
+_MINHASH_PRIME = (1 << 31) - 1
+_seeded = random.Random(0x5EED)
+_MINHASH_A = [_seeded.randrange(1, _MINHASH_PRIME) for _ in range(MINHASH_PERMUTATIONS)]
+_MINHASH_B = [_seeded.randrange(0, _MINHASH_PRIME) for _ in range(MINHASH_PERMUTATIONS)]
+
+# Terms are hashed into this many TF-IDF features (no vocabulary to keep or grow).
+TFIDF_FEATURES = 1 << 18
+TFIDF_AVAILABLE = np is not None
+
+
+class BM25Index(ReconciledPostIndex):
+    """
+    Okapi BM25 over post title + content for community retrieval (/api/community/related and
+    /api/community/rag/ask). Keeps per-post term frequencies and lengths, document frequencies
+    and term -> {post_id: tf} postings, all updated per post, so a query only walks the
+    postings of its own terms.
+    """
+
+    def __init__(self, load_posts: Callable[[], Iterable[Dict[str, Any]]]):
+        super().__init__(load_posts)
+        self._term_counts: Dict[str, Counter] = {}
+        self._lengths: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._term_counts)
+
+    def _prepare(self, post: Dict[str, Any]) -> Tuple[str, Counter]:
+        vector = stored_token_vector(post)
+        counts = Counter(vector["terms"]) if vector is not None else Counter(post_semantic_tokens(post))
+        return str(post.get("id") or ""), counts
+
+    def _reset(self, entries: Dict[str, Counter]):
+        self._term_counts, self._lengths, self._postings, self._total_length = {}, {}, {}, 0
+        for post_id, counts in entries.items():
+            self._insert(post_id, counts)
+
+    def _insert(self, post_id: str, counts: Counter):
+        self._term_counts[post_id] = counts
+        length = sum(counts.values())
+        self._lengths[post_id] = length
+        self._total_length += length
+        for term, tf in counts.items():
+            self._postings.setdefault(term, {})[post_id] = tf
+
+    def _delete(self, post_id: str):
+        counts = self._term_counts.pop(post_id, None)
+        if counts is None:
+            return
+        self._total_length -= self._lengths.pop(post_id, 0)
+        for term in counts:
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(post_id, None)
+            if not posting:
+                del self._postings[term]
+
+    def scores(
+        self,
+        query_tokens: Iterable[str],
+        exclude_id: Optional[str] = None,
+        only: Optional[Iterable[str]] = None,
+    ) -> Dict[str, float]:
+        """
+        BM25 of every post sharing a term with the query, scaled so the best match is 1.0
+        (0..1, the same range as the Jaccard overlap it replaces). Query terms count once;
+        `exclude_id` (the post a "related" query starts from) is left out before scaling.
+        With `only`, just those posts are scored (re-ranking a candidate set).
+        """
+        candidates: Optional[Set[str]] = None if only is None else set(only)
+        self.ensure_built()
+        raw: Dict[str, float] = {}
+        with self._lock:
+            total = len(self._term_counts)
+            if not total:
+                return {}
+            average_length = self._total_length / total or 1.0
+            lengths = self._lengths
+            for term in set(query_tokens):
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                df = len(posting)
+                idf = math.log(1.0 + (total - df + 0.5) / (df + 0.5))
+                if candidates is not None:
+                    matches = [(post_id, posting[post_id]) for post_id in candidates if post_id in posting]
+                else:
+                    matches = posting.items()
+                for post_id, tf in matches:
+                    norm = BM25_K1 * (1.0 - BM25_B + BM25_B * lengths[post_id] / average_length)
+                    raw[post_id] = raw.get(post_id, 0.0) + idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+        raw.pop(str(exclude_id or ""), None)
+        top = max(raw.values(), default=0.0)
+        if top <= 0:
+            return {}
+        return {post_id: score / top for post_id, score in raw.items()}
+
+
+def minhash_signature(terms: Iterable[str]) -> Optional[Tuple[int, ...]]:
+    """MinHash of a term set under MINHASH_PERMUTATIONS seeded hash functions; None when empty."""
+    hashes = [zlib.crc32(term.encode("utf-8")) for term in set(terms)]
+    if not hashes:
+        return None
+    if np is not None:
+        values = np.array(hashes, dtype=np.uint64)
+        a = np.array(_MINHASH_A, dtype=np.uint64)[:, None]
+        b = np.array(_MINHASH_B, dtype=np.uint64)[:, None]
+        return tuple(int(v) for v in ((a * values[None, :] + b) % _MINHASH_PRIME).min(axis=1))
+    return tuple(min((a * h + b) % _MINHASH_PRIME for h in hashes) for a, b in zip(_MINHASH_A, _MINHASH_B))
+
+
+def _band_keys(signature: Tuple[int, ...]) -> List[int]:
+    keys = []
+    for band in range(LSH_BANDS):
+        key = 0
+        for value in signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]:
+            key = (key << 31) | value
+        keys.append(key)
+    return keys
+
+
+class MinHashLSHIndex(ReconciledPostIndex):
+    """
+    Near-neighbour index for "related posts" and duplicate detection: a MinHash signature per
+    post (over the same terms BM25 uses) and LSH_BANDS bucket tables keyed by band. A lookup
+    touches only the query's own buckets, so it stays cheap however many posts there are.
+    """
+
+    def __init__(self, load_posts: Callable[[], Iterable[Dict[str, Any]]]):
+        super().__init__(load_posts)
+        self._signatures: Dict[str, Tuple[int, ...]] = {}
+        self._buckets: List[Dict[int, Set[str]]] = [{} for _ in range(LSH_BANDS)]
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def _prepare(self, post: Dict[str, Any]) -> Tuple[str, Optional[Tuple[int, ...]]]:
+        vector = stored_token_vector(post)
+        terms = vector["terms"].keys() if vector is not None else post_semantic_tokens(post)
+        return str(post.get("id") or ""), minhash_signature(terms)
+
+    def _reset(self, entries: Dict[str, Optional[Tuple[int, ...]]]):
+        self._signatures, self._buckets = {}, [{} for _ in range(LSH_BANDS)]
+        for post_id, signature in entries.items():
+            self._insert(post_id, signature)
+
+    def _insert(self, post_id: str, signature: Optional[Tuple[int, ...]]):
+        if signature is None:
+            return
+        self._signatures[post_id] = signature
+        for table, key in zip(self._buckets, _band_keys(signature)):
+            table.setdefault(key, set()).add(post_id)
+
+    def _delete(self, post_id: str):
+        signature = self._signatures.pop(post_id, None)
+        if signature is None:
+            return
+        for table, key in zip(self._buckets, _band_keys(signature)):
+            bucket = table.get(key)
+            if bucket is not None:
+                bucket.discard(post_id)
+                if not bucket:
+                    del table[key]
+
+    def similar(
+        self,
+        terms: Iterable[str],
+        exclude_id: Optional[str] = None,
+        limit: int = 200,
+    ) -> List[Tuple[str, float]]:
+        """
+        Up to `limit` (post_id, estimated Jaccard) pairs for the posts sharing an LSH bucket with
+        `terms`, most similar first. Posts without any common bucket are not considered.
+        """
+        signature = minhash_signature(terms)
+        if signature is None:
+            return []
+        self.ensure_built()
+        with self._lock:
+            candidates: Set[str] = set()
+            for table, key in zip(self._buckets, _band_keys(signature)):
+                bucket = table.get(key)
+                if bucket and len(bucket) <= LSH_MAX_BUCKET:
+                    candidates.update(bucket)
+            candidates.discard(str(exclude_id or ""))
+            estimates = [
+                (post_id, sum(1 for a, b in zip(signature, self._signatures[post_id]) if a == b) / MINHASH_PERMUTATIONS)
+                for post_id in candidates
+            ]
+        estimates.sort(key=lambda item: item[1], reverse=True)
+        return estimates[:limit]
+
+
+class TfidfIndex(ReconciledPostIndex):
+    """
+    Hashed TF-IDF matrix over post title + content for /api/community/rag/ask (requires NumPy).
+    Posts are rows of a sparse matrix held as parallel (row, feature, weight) arrays; each row's
+    weights are 1 + log(tf), L2-normalized once when the post is indexed. IDF comes from live
+    document frequencies at query time, so adding or removing a post never rewrites other rows.
+    A query is one sparse matrix-vector product (a bincount over the stored entries) followed by
+    an argpartition for the top k.
+
+    Removed posts leave dead rows behind; the arrays are compacted once dead rows outnumber live ones.
+    """
+
+    def __init__(
+        self,
+        load_posts: Callable[[], Iterable[Dict[str, Any]]],
+        features: int = TFIDF_FEATURES,
+    ):
+        if np is None:
+            raise RuntimeError("TfidfIndex requires numpy")
+        super().__init__(load_posts)
+        self.features = int(features)
+        self._df = np.zeros(self.features, dtype=np.int32)
+        self._query = np.zeros(self.features, dtype=np.float32)
+        self._reset({})
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def _prepare(self, post: Dict[str, Any]) -> Tuple[str, Tuple[Any, Any]]:
+        vector = stored_token_vector(post)
+        counts = Counter(vector["terms"]) if vector is not None else Counter(post_semantic_tokens(post))
+        return str(post.get("id") or ""), self._weights(counts, normalize=True)
+
+    def _weights(self, counts: Counter, normalize: bool) -> Tuple[Any, Any]:
+        hashed: Counter = Counter()
+        for term, tf in counts.items():
+            hashed[zlib.crc32(term.encode("utf-8")) % self.features] += tf
+        cols = np.fromiter(hashed.keys(), dtype=np.int32, count=len(hashed))
+        vals = 1.0 + np.log(np.fromiter(hashed.values(), dtype=np.float32, count=len(hashed)))
+        if normalize and len(vals):
+            vals /= np.sqrt(np.dot(vals, vals))
+        return cols, vals.astype(np.float32)
+
+    def _reset(self, entries: Dict[str, Tuple[Any, Any]]):
+        self._row_ids: List[Optional[str]] = list(entries)
+        self._row_of: Dict[str, int] = {post_id: row for row, post_id in enumerate(self._row_ids)}
+        self._spans: List[Tuple[int, int]] = []
+        start = 0
+        for cols, _ in entries.values():
+            self._spans.append((start, start + len(cols)))
+            start += len(cols)
+        self._nnz = start
+        lengths = [len(cols) for cols, _ in entries.values()]
+        self._rows = np.repeat(np.arange(len(self._row_ids), dtype=np.int32), lengths)
+        self._cols = np.concatenate([cols for cols, _ in entries.values()] or [np.zeros(0, np.int32)])
+        self._vals = np.concatenate([vals for _, vals in entries.values()] or [np.zeros(0, np.float32)])
+        self._df[:] = np.bincount(self._cols, minlength=self.features)
+
+    def _reserve(self, extra: int):
+        needed = self._nnz + extra
+        if needed <= len(self._cols):
+            return
+        capacity = max(needed, 2 * len(self._cols), 1024)
+        self._rows = np.concatenate([self._rows[:self._nnz], np.zeros(capacity - self._nnz, np.int32)])
+        self._cols = np.concatenate([self._cols[:self._nnz], np.zeros(capacity - self._nnz, np.int32)])
+        self._vals = np.concatenate([self._vals[:self._nnz], np.zeros(capacity - self._nnz, np.float32)])
+
+    def _insert(self, post_id: str, entry: Tuple[Any, Any]):
+        cols, vals = entry
+        self._reserve(len(cols))
+        row, start, end = len(self._row_ids), self._nnz, self._nnz + len(cols)
+        self._rows[start:end] = row
+        self._cols[start:end] = cols
+        self._vals[start:end] = vals
+        self._nnz = end
+        self._df[cols] += 1
+        self._row_ids.append(post_id)
+        self._spans.append((start, end))
+        self._row_of[post_id] = row
+
+    def _delete(self, post_id: str):
+        row = self._row_of.pop(post_id, None)
+        if row is None:
+            return
+        start, end = self._spans[row]
+        self._df[self._cols[start:end]] -= 1
+        self._vals[start:end] = 0.0
+        self._row_ids[row] = None
+        if len(self._row_ids) - len(self._row_of) > max(len(self._row_of), 1000):
+            self._compact()
+
+    def _compact(self):
+        live = [row for row, post_id in enumerate(self._row_ids) if post_id is not None]
+        self._reset({
+            self._row_ids[row]: (self._cols[start:end].copy(), self._vals[start:end].copy())
+            for row in live
+            for start, end in [self._spans[row]]
+        })
+
+    def top(self, query_tokens: Iterable[str], k: int, exclude_id: Optional[str] = None) -> List[Tuple[str, float]]:
+        """
+        The `k` posts with the highest TF-IDF dot product with the query, best first, as
+        (post_id, score scaled so the best is 1.0). Posts sharing no feature with the query
+        are left out.
+        """
+        self.ensure_built()
+        with self._lock:
+            total = len(self._row_of)
+            cols, tf = self._weights(Counter(query_tokens), normalize=False)
+            if not total or not len(cols) or k <= 0:
+                return []
+            # Smoothed IDF; squared because it weights both the query and the document side.
+            idf = np.log((1.0 + total) / (1.0 + self._df[cols])) + 1.0
+            self._query[cols] = tf * idf * idf
+            try:
+                weights = self._vals[:self._nnz] * self._query[self._cols[:self._nnz]]
+                scores = np.bincount(self._rows[:self._nnz], weights=weights, minlength=len(self._row_ids))
+            finally:
+                self._query[cols] = 0.0
+            excluded = self._row_of.get(str(exclude_id or ""))
+            if excluded is not None:
+                scores[excluded] = 0.0
+            k = min(int(k), int(np.count_nonzero(scores > 0)))
+            if k <= 0:
+                return []
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best], kind="stable")]
+            top_score = float(scores[best[0]])
+            return [(self._row_ids[row], float(scores[row]) / top_score) for row in best]
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Bytes held by the index: allocated matrix arrays, the IDF/query vectors and the id maps."""
+        with self._lock:
+            matrix = self._rows.nbytes + self._cols.nbytes + self._vals.nbytes
+            vectors = self._df.nbytes + self._query.nbytes
+            ids = (
+                sys.getsizeof(self._row_ids)
+                + sys.getsizeof(self._row_of)
+                + sys.getsizeof(self._spans)
+                + sum(sys.getsizeof(post_id) for post_id in self._row_of)
+            )
+            return {
+                "posts": len(self._row_of),
+                "rows": len(self._row_ids),
+                "entries": self._nnz,
+                "features": self.features,
+                "matrix_bytes": matrix,
+                "vector_bytes": vectors,
+                "id_bytes": ids,
+                "total_bytes": matrix + vectors + ids,
+            }
+
+
+def retrieval_score(
+    semantic: float,
+    semantic_weight: float,
+    category: str,
+    comments_count: int,
+    likes_count: int,
+    is_pinned: bool,
+    preferred_categories: Iterable[str] = (),
+    base_category: Optional[str] = None,
+) -> float:
+    """Community ranking: text relevance (0..1) times its weight, plus category and engagement boosts."""
+    score = semantic * semantic_weight
+    if base_category and category == base_category:
+        score += 2.0
+    if category in preferred_categories:
+        score += 1.5
+    score += min(2.0, comments_count * 0.2)
+    score += min(1.5, likes_count * 0.1)
+    if is_pinned:
+        score += 1.0
+    return score
@@ -1,25 +1,126 @@
+import asyncio
+import base64
+import functools
+import hashlib
 import os
 import json
 import logging
 import re
+import threading
+import time
 import uuid
 from datetime import datetime, timedelta
-from typing import Any, List, Dict, Optional
+from typing import Any, Iterable, List, Dict, Optional, Set, Tuple, Union
 from pathlib import Path
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError, ConfigurationError
+from pymongo import ASCENDING, DESCENDING, MongoClient, ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import (
+    BulkWriteError,
+    ConnectionFailure,
+    ServerSelectionTimeoutError,
+    ConfigurationError,
+    OperationFailure,
+)
+
+try:
+    from .local_store import JournalCollection, atomic_write_bytes, file_lock
+    from .sqlite_store import SQLiteCollection, SQLiteStore
+    from .text_search import POST_TEXT_FIELDS, post_matches_search, search_tokens, stored_token_vector, token_vector
+    from .community_metrics import CommunityMetrics
+    from .search_index import PostIndexSync, PostSearchIndex
+    from .community_retrieval import DUPLICATE_SIMILARITY, TFIDF_AVAILABLE, BM25Index, MinHashLSHIndex, TfidfIndex
+except ImportError:
+    from local_store import JournalCollection, atomic_write_bytes, file_lock
+    from sqlite_store import SQLiteCollection, SQLiteStore
+    from text_search import POST_TEXT_FIELDS, post_matches_search, search_tokens, stored_token_vector, token_vector
+    from community_metrics import CommunityMetrics
+    from search_index import PostIndexSync, PostSearchIndex
+    from community_retrieval import DUPLICATE_SIMILARITY, TFIDF_AVAILABLE, BM25Index, MinHashLSHIndex, TfidfIndex
 
 logger = logging.getLogger(__name__)
 
+LocalCollection = Union[JournalCollection, SQLiteCollection]
+
+# (collection, keys, options) for every index the Mongo queries below rely on.
+MONGO_INDEXES: List[Tuple[str, List[Tuple[str, int]], Dict[str, Any]]] = [
+    ("posts", [("id", ASCENDING)], {"name": "posts_id_unique", "unique": True}),
+    ("posts", [("timestamp", DESCENDING)], {"name": "posts_timestamp"}),
+    ("posts", [("category", ASCENDING), ("timestamp", DESCENDING)], {"name": "posts_category_timestamp"}),
+    # Feed order (pinned first, newest, id tie-break), overall and per category.
+    (
+        "posts",
+        [("is_pinned", DESCENDING), ("timestamp", DESCENDING), ("id", ASCENDING)],
+        {"name": "posts_feed_order"},
+    ),
+    (
+        "posts",
+        [("category", ASCENDING), ("is_pinned", DESCENDING), ("timestamp", DESCENDING), ("id", ASCENDING)],
+        {"name": "posts_category_feed_order"},
+    ),
+    (
+        "posts",
+        [("is_pinned", DESCENDING), ("comments_count", DESCENDING), ("timestamp", ASCENDING), ("id", ASCENDING)],
+        {"name": "posts_most_commented"},
+    ),
+    ("users", [("username", ASCENDING)], {"name": "users_username_unique", "unique": True}),
+    ("vr_jobs", [("id", ASCENDING)], {"name": "vr_jobs_id_unique", "unique": True}),
+    ("submissions", [("time", DESCENDING)], {"name": "submissions_time"}),
+    # Moderation queue (REPORTS_ORDER), overall, per status and per status + reason.
+    ("community_reports", [("id", ASCENDING)], {"name": "community_reports_id_unique", "unique": True}),
+    ("community_reports", [("timestamp", DESCENDING), ("id", DESCENDING)], {"name": "community_reports_queue"}),
+    (
+        "community_reports",
+        [("status", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)],
+        {"name": "community_reports_status_queue"},
+    ),
+    (
+        "community_reports",
+        [("status", ASCENDING), ("reason", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)],
+        {"name": "community_reports_status_reason_queue"},
+    ),
+    ("community_reports", [("post_id", ASCENDING)], {"name": "community_reports_post"}),
+]
+# Jobs per bulk_write round trip when replacing the VR catalog.
+VR_JOBS_BULK_CHUNK_SIZE = max(1, int(os.getenv("VR_JOBS_BULK_CHUNK_SIZE", "500")))
+# How long a looked-up author role is trusted; role changes made through Database drop it at once.
+ROLE_CACHE_TTL_SECONDS = float(os.getenv("ROLE_CACHE_TTL_SECONDS", "60"))
+# Moderation queue order: newest report first, index entry id as the tie-break.
+REPORTS_ORDER: List[Tuple[str, int]] = [("timestamp", DESCENDING), ("id", DESCENDING)]
+# Sort modes understood by Database.query_posts; anything else means "newest".
+POST_SORT_MODES = {"newest", "oldest", "most_commented"}
+# Stored on posts for the server's own use (text_search.token_vector); never sent to clients,
+# and left out of Mongo list reads.
+INTERNAL_POST_FIELDS = ["token_vector"]
+# Fields post_matches_search reads, plus the sort keys: all a keyword scan needs from Mongo.
+POST_SEARCH_FIELDS = ["id", "title", "content", "author", "category", "timestamp", "is_pinned", "comments_count"]
+# OperationFailure codes meaning an equivalent index already exists under another name/options.
+INDEX_CONFLICT_CODES = {85, 86}
+
+def _tracks_write(collection: str):
+    """
+    Marks a Database write method; see Database._after_write for what runs once it returns.
+    (The SQLite and JSON stores version themselves on every write.)
+    """
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self._after_write(collection, args, kwargs)
+        return wrapper
+    return decorate
+
+
 class Database:
     def __init__(self):
         self.db = None
         self.is_mongo = False
         self.db_name = os.getenv("MONGODB_DB_NAME", "careervr")
+        storage_backend = str(os.getenv("STORAGE_BACKEND", "")).strip().lower()
         
         # 1. Try MongoDB Connection
         mongo_uri = os.getenv("MONGODB_URI")
-        if mongo_uri:
+        if mongo_uri and storage_backend != "sqlite":
             try:
                 client = MongoClient(mongo_uri, serverSelectionTimeoutMS=3000, tlsAllowInvalidCertificates=True) # Short timeout
                 client.admin.command('ping')
@@ -30,6 +131,9 @@ class Database:
                 logger.error(f"❌ MongoDB Connection Failed: {e}")
                 # Do NOT fallback to local files on Vercel if Mongo was intended but failed.
                 # Just stay in 'not mongo' state which will return empty lists/defaults.
+        self.index_state: Dict[str, Any] = {"status": "not_applicable", "indexes": {}}
+        if self.is_mongo:
+            self.ensure_indexes()
 
         # 2. Local Files Setup (Only relevant if NOT Mongo)
         # We define paths but DO NOT create directories automatically to avoid Read-Only errors on Vercel
@@ -38,6 +142,171 @@ class Database:
         self.submissions_file = self.data_dir / "submissions.json"
         self.posts_file = self.data_dir / "posts.json"
         self.users_file = self.data_dir / "users.json"
+        # Write-through cache of local JSON files, keyed by path and invalidated by mtime/size.
+        self._local_cache: Dict[str, Dict[str, Any]] = {}
+        # Journal-backed stores for the collections that take per-record writes, keyed by path.
+        self._local_stores: Dict[str, JournalCollection] = {}
+        # Filtered+sorted post lists per (category, feed order), valid while the store's
+        # all() list is the same object (every write replaces it).
+        # (category, order) -> (records it was built from, sorted view, post by id, feed key by id).
+        self._post_views: Dict[Tuple[str, Tuple], Tuple[List[Dict], List[Dict], Dict[str, Dict], Dict[str, Optional[Tuple]]]] = {}
+        # Same for the moderation queue, per (status, reason) filter.
+        self._report_views: Dict[Tuple[str, str], Tuple[List[Dict], List[Dict]]] = {}
+        # username -> (expires_at, stored role), valid for the users version it was read at; see get_user_roles.
+        self._role_cache: Dict[str, Tuple[float, str]] = {}
+        self._role_cache_version: Optional[str] = None
+        self._role_cache_lock = threading.Lock()
+        # Running community aggregates, re-contributed per post by every posts write.
+        self.community_metrics = CommunityMetrics(
+            self.get_posts,
+            self.get_post,
+            self._posts_version,
+            reconcile_seconds=float(os.getenv("COMMUNITY_METRICS_RECONCILE_SECONDS", "600")),
+        )
+        # Text indexes over posts, updated by add_post/delete_post: keyword search, BM25
+        # retrieval (related posts), MinHash LSH (related candidates, duplicates) and, with NumPy,
+        # a TF-IDF matrix for community Q&A. Writes from other processes are replayed from the
+        # posts collection version before each index query (see _sync_post_indexes).
+        self.search_index = PostSearchIndex(self._search_documents)
+        self.retrieval_index = BM25Index(self._search_documents)
+        self.similarity_index = MinHashLSHIndex(self._search_documents)
+        self.tfidf_index: Optional[TfidfIndex] = TfidfIndex(self._search_documents) if TFIDF_AVAILABLE else None
+        self.post_index_sync = PostIndexSync(
+            self._post_indexes,
+            self._posts_version,
+            self._search_documents,
+            self._stored_post_ids,
+            self._search_documents,
+        )
+
+        # 3. Optional SQLite store (STORAGE_BACKEND=sqlite): indexed tables behind the same local code paths.
+        self.sqlite: Optional[SQLiteStore] = None
+        self.is_sqlite = False
+        if storage_backend == "sqlite":
+            sqlite_path = Path(os.getenv("SQLITE_PATH") or (self.data_dir / "careervr.sqlite3"))
+            try:
+                self.sqlite = SQLiteStore(sqlite_path)
+                self.is_sqlite = True
+                self._import_local_files_into_sqlite()
+                logger.info(f"✅ Using SQLite store at {sqlite_path}")
+            except Exception as e:
+                self.sqlite = None
+                self.is_sqlite = False
+                logger.error(f"❌ SQLite Store Failed, using local JSON files: {e}")
+
+    def ensure_indexes(self) -> Dict[str, Any]:
+        """
+        Create the Mongo indexes in MONGO_INDEXES. create_index is a no-op for an identical
+        existing index, so this is safe on every startup. Failures are recorded, never raised:
+        e.g. a unique index cannot be built while duplicate ids exist.
+        """
+        results: Dict[str, str] = {}
+        for collection, keys, options in MONGO_INDEXES:
+            name = options["name"]
+            try:
+                self.db[collection].create_index(keys, **options)
+                results[name] = "ok"
+            except OperationFailure as e:
+                if e.code in INDEX_CONFLICT_CODES:
+                    results[name] = "exists_with_other_options"
+                else:
+                    logger.error(f"Mongo Index Error ({name}): {e}")
+                    results[name] = f"error: {e}"
+            except Exception as e:
+                logger.error(f"Mongo Index Error ({name}): {e}")
+                results[name] = f"error: {e}"
+        failed = [name for name, state in results.items() if state.startswith("error")]
+        self.index_state = {
+            "status": "ok" if not failed else ("failed" if len(failed) == len(results) else "partial"),
+            "indexes": results,
+        }
+        return self.index_state
+
+    def get_index_state(self) -> Dict[str, Any]:
+        if self.sqlite is not None:
+            try:
+                indexes = {
+                    table: self.sqlite.index_names(table)
+                    for table in ("posts", "users", "submissions", "vr_jobs")
+                }
+                return {"status": "ok", "indexes": indexes}
+            except Exception as e:
+                return {"status": "failed", "indexes": {}, "error": str(e)}
+        return self.index_state
+
+    def get_collection_versions(self, names: Iterable[str]) -> Optional[Dict[str, str]]:
+        """
+        Current write version of each named collection (posts, users, submissions, vr_jobs),
+        cheap enough to check before any real query. None when it cannot be determined.
+        """
+        names = list(dict.fromkeys(str(name) for name in names))
+        if self.is_mongo:
+            try:
+                rows = self.db.meta.find({"_id": {"$in": [f"version:{name}" for name in names]}})
+                found = {str(row.get("_id")).split(":", 1)[-1]: int(row.get("version") or 0) for row in rows}
+                return {name: str(found.get(name, 0)) for name in names}
+            except Exception as e:
+                logger.error(f"Mongo Collection Version Error: {e}")
+                return None
+        try:
+            return {name: str(self._local_version(name)) for name in names}
+        except Exception as e:
+            logger.error(f"Local Collection Version Error: {e}")
+            return None
+
+    def _local_version(self, name: str) -> Any:
+        if name == "vr_jobs":
+            if self.sqlite is not None:
+                return self.sqlite.vr_jobs.version()
+            return self._file_signature(self.vr_jobs_file)
+        stores = {"posts": self._posts_store, "users": self._users_store, "submissions": self._submissions_store}
+        return stores[name]().version()
+
+    def _after_write(self, collection: str, args: Tuple, kwargs: Dict[str, Any]):
+        version = self._bump_mongo_version(collection) if self.is_mongo else None
+        if collection != "posts":
+            return
+        target = kwargs.get("post_id", kwargs.get("post", args[0] if args else None))
+        post_id = target.get("id") if isinstance(target, dict) else target
+        try:
+            if isinstance(post_id, str) and post_id:
+                if not self.is_mongo:
+                    written = self._posts_store().last_write_version()
+                    version = str(written) if written is not None else None
+                # The metrics and indexes now hold this write; the next read need not replay it.
+                self.community_metrics.touch(post_id, version)
+                self.post_index_sync.written(version)
+            else:
+                # Bulk rewrites (migrations, ownership repair): rebuild on next read.
+                self.community_metrics.invalidate()
+                self.post_index_sync.invalidate()
+        except Exception as e:
+            logger.error(f"Community Metrics Update Error: {e}")
+            self.community_metrics.invalidate()
+
+    def _bump_mongo_version(self, name: str) -> Optional[str]:
+        """Increments the collection's version counter; returns the new value (None on failure)."""
+        try:
+            row = self.db.meta.find_one_and_update(
+                {"_id": f"version:{name}"},
+                {"$inc": {"version": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            return str(int((row or {}).get("version") or 0))
+        except Exception as e:
+            logger.error(f"Mongo Version Bump Error: {e}")
+            return None
+
+    def _posts_version(self) -> Optional[str]:
+        """Posts change counter the text indexes sync against (see PostIndexSync); None if unknown."""
+        if self.is_mongo:
+            return (self.get_collection_versions(["posts"]) or {}).get("posts")
+        try:
+            return str(self._posts_store().change_version())
+        except Exception as e:
+            logger.error(f"Local Posts Version Error: {e}")
+            return None
 
     @staticmethod
     def _write_result(ok: bool, reason: str = "", **extra) -> Dict[str, Any]:
@@ -57,6 +326,100 @@ class Database:
     def _disabled_write_result(self) -> Dict[str, Any]:
         return self._write_result(False, "vercel_local_write_disabled")
 
+    @staticmethod
+    def _file_signature(path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load_local(self, path: Path, default: Any = None) -> Any:
+        """
+        Return the parsed contents of a local JSON file from the in-process cache.
+        The file is only re-read when its mtime/size changed (e.g. another process wrote it).
+        The returned object is shared: callers must copy before mutating.
+        """
+        cache_key = str(path)
+        signature = self._file_signature(path)
+        if signature is None:
+            self._local_cache.pop(cache_key, None)
+            return default
+        entry = self._local_cache.get(cache_key)
+        if entry and entry["signature"] == signature:
+            return entry["data"]
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            self._local_cache.pop(cache_key, None)
+            return default
+        self._local_cache[cache_key] = {"signature": signature, "data": data}
+        return data
+
+    def _local_store(self, path: Path, key_field: Optional[str] = None) -> JournalCollection:
+        # Resolved per call so callers (and tests) that repoint the *_file paths get a matching store.
+        store = self._local_stores.get(str(path))
+        if store is None:
+            store = JournalCollection(path, key_field=key_field)
+            self._local_stores[str(path)] = store
+        return store
+
+    def _posts_store(self) -> LocalCollection:
+        if self.sqlite is not None:
+            return self.sqlite.posts
+        return self._local_store(self.posts_file, key_field="id")
+
+    def _users_store(self) -> LocalCollection:
+        if self.sqlite is not None:
+            return self.sqlite.users
+        return self._local_store(self.users_file, key_field="username")
+
+    def _reports_store(self) -> LocalCollection:
+        if self.sqlite is not None:
+            return self.sqlite.community_reports
+        # Lives next to posts.json so repointing posts_file moves the index with it.
+        return self._local_store(self.posts_file.with_name("community_reports.json"), key_field="id")
+
+    def _submissions_store(self) -> LocalCollection:
+        if self.sqlite is not None:
+            return self.sqlite.submissions
+        return self._local_store(self.submissions_file)
+
+    def _import_local_files_into_sqlite(self):
+        """Seed empty SQLite tables from the local JSON files once, so switching backends keeps existing data."""
+        sources = [
+            (self.sqlite.posts, self.posts_file, "id"),
+            (self.sqlite.users, self.users_file, "username"),
+            (self.sqlite.submissions, self.submissions_file, None),
+        ]
+        for collection, path, key_field in sources:
+            if collection.count() or not (path.exists() or path.with_name(path.name + ".journal").exists()):
+                continue
+            records = JournalCollection(path, key_field=key_field).all()
+            if records:
+                collection.replace_all(records)
+                logger.info(f"Imported {len(records)} records from {path.name} into SQLite")
+        jobs = self._load_local(self.vr_jobs_file)
+        if isinstance(jobs, list) and jobs and not self.sqlite.vr_jobs.count():
+            self.sqlite.vr_jobs.replace_all(jobs)
+
+    def _local_write_error(self, path: Path, e: Exception) -> Dict[str, Any]:
+        logger.error(f"Local Write Error: {e}")
+        return self._write_result(False, "local_write_error", error=str(e), path=str(path))
+
+    @staticmethod
+    def _clone_post(post: Dict, comments_limit: Optional[int] = None) -> Dict:
+        # Two-level copy: request handlers decorate posts and comments in place.
+        # With comments_limit only the newest N comments are kept (and copied).
+        cloned = dict(post)
+        comments = post.get("comments")
+        if isinstance(comments, list):
+            if comments_limit is not None:
+                comments = comments[max(0, len(comments) - comments_limit):] if comments_limit > 0 else []
+            cloned["comments"] = [dict(c) if isinstance(c, dict) else c for c in comments]
+        return cloned
+
     @staticmethod
     def _validate_vr_jobs_payload(jobs: Any, allow_empty: bool = False) -> Dict[str, Any]:
         if not isinstance(jobs, list):
@@ -98,33 +461,85 @@ class Database:
                 return default_jobs
         
         # Local Fallback
-        if self.vr_jobs_file.exists():
-            try:
-                with open(self.vr_jobs_file, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except Exception:
-                pass
+        if self.sqlite is not None:
+            return [dict(job) for job in self.sqlite.vr_jobs.all()] or default_jobs
+        jobs = self._load_local(self.vr_jobs_file)
+        if isinstance(jobs, list):
+            return [dict(job) for job in jobs]
         return default_jobs
 
-    def update_vr_jobs(self, jobs: List[Dict], allow_empty: bool = False) -> Dict[str, Any]:
+    def _replace_vr_jobs_mongo(
+        self,
+        jobs: List[Dict],
+        allow_empty: bool = False,
+        chunk_size: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Upsert the catalog with unordered bulk_write batches, then drop jobs that are no longer
+        listed. Removal is skipped when any chunk failed so a bad import never empties the catalog.
+        """
+        size = chunk_size or VR_JOBS_BULK_CHUNK_SIZE
+        counts = {"created": 0, "updated": 0, "removed": 0}
+        chunk_errors: List[Dict[str, Any]] = []
+        for start in range(0, len(jobs), size):
+            chunk = jobs[start:start + size]
+            requests = [ReplaceOne({"id": str(job.get("id"))}, job, upsert=True) for job in chunk]
+            try:
+                result = self.db.vr_jobs.bulk_write(requests, ordered=False)
+                details = result.bulk_api_result
+            except BulkWriteError as e:
+                details = e.details
+                write_errors = details.get("writeErrors") or []
+                chunk_errors.append({
+                    "chunk": start // size,
+                    "offset": start,
+                    "failed": len(write_errors),
+                    "error": str((write_errors[0] or {}).get("errmsg") if write_errors else e),
+                })
+            except Exception as e:
+                logger.error(f"Mongo Bulk Write Error (chunk {start // size}): {e}")
+                chunk_errors.append({"chunk": start // size, "offset": start, "failed": len(chunk), "error": str(e)})
+                continue
+            counts["created"] += int(details.get("nUpserted") or 0)
+            counts["updated"] += int(details.get("nMatched") or 0)
+
+        if chunk_errors:
+            logger.error(f"Mongo Bulk Write Error: {len(chunk_errors)} chunk(s) failed")
+            return self._write_result(
+                False, "mongo_bulk_write_error", count=len(jobs), chunk_errors=chunk_errors, **counts
+            )
+
+        try:
+            new_ids = [str(job.get("id")) for job in jobs]
+            if new_ids:
+                counts["removed"] = self.db.vr_jobs.delete_many({"id": {"$nin": new_ids}}).deleted_count
+            elif allow_empty:
+                counts["removed"] = self.db.vr_jobs.delete_many({}).deleted_count
+        except Exception as e:
+            logger.error(f"Mongo Write Error: {e}")
+            return self._write_result(False, "mongo_write_error", error=str(e), **counts)
+        return self._write_result(True, "mongo_write_ok", count=len(jobs), mode="bulk_upsert", **counts)
+
+    @_tracks_write("vr_jobs")
+    def update_vr_jobs(
+        self,
+        jobs: List[Dict],
+        allow_empty: bool = False,
+        chunk_size: Optional[int] = None,
+    ) -> Dict[str, Any]:
         if self._writes_disabled():
             return self._disabled_write_result()
         payload_check = self._validate_vr_jobs_payload(jobs, allow_empty=allow_empty)
         if not payload_check.get("ok"):
             return self._write_result(False, payload_check.get("reason", "invalid_payload"))
         if self.is_mongo:
+            return self._replace_vr_jobs_mongo(jobs, allow_empty=allow_empty, chunk_size=chunk_size)
+        elif self.sqlite is not None:
             try:
-                new_ids = [str(job.get("id")) for job in jobs]
-                for job in jobs:
-                    self.db.vr_jobs.replace_one({"id": str(job.get("id"))}, job, upsert=True)
-                if new_ids:
-                    self.db.vr_jobs.delete_many({"id": {"$nin": new_ids}})
-                elif allow_empty:
-                    self.db.vr_jobs.delete_many({})
-                return self._write_result(True, "mongo_write_ok", count=len(jobs), mode="replace_upsert")
+                self.sqlite.vr_jobs.replace_all(jobs)
             except Exception as e:
-                logger.error(f"Mongo Write Error: {e}")
-                return self._write_result(False, "mongo_write_error", error=str(e))
+                return self._local_write_error(self.sqlite.path, e)
+            return self._write_result(True, "local_write_ok", path=str(self.sqlite.path), count=len(jobs))
         else:
             # Only write locally if we can (avoids Vercel crashes)
             return self._save_local(self.vr_jobs_file, jobs)
@@ -137,14 +552,9 @@ class Database:
                 return []
         
         # Local Fallback
-        if self.submissions_file.exists():
-            try:
-                with open(self.submissions_file, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except Exception:
-                pass
-        return []
+        return [dict(row) for row in self._submissions_store().all()]
 
+    @_tracks_write("submissions")
     def add_submission(self, submission: Dict) -> Dict[str, Any]:
         if self._writes_disabled():
             return self._disabled_write_result()
@@ -156,9 +566,11 @@ class Database:
                 logger.error(f"Mongo Insert Error: {e}")
                 return self._write_result(False, "mongo_insert_error", error=str(e))
         else:
-            current = self.get_submissions()
-            current.append(submission)
-            return self._save_local(self.submissions_file, current)
+            try:
+                self._submissions_store().insert(submission)
+            except Exception as e:
+                return self._local_write_error(self.submissions_file, e)
+            return self._write_result(True, "local_write_ok", path=str(self.submissions_file))
 
     def _save_local(self, path: Path, data: Any) -> Dict[str, Any]:
         # STRICT PROTECTION: Never write in deployment-mode without explicit local-write override.
@@ -168,10 +580,17 @@ class Database:
         try:
             # Ensure dir exists only when we actually try to write
             path.parent.mkdir(parents=True, exist_ok=True)
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            payload = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+            # Other workers may write the same file: serialize writers and swap the file atomically.
+            with file_lock(path.with_name(path.name + ".lock")):
+                atomic_write_bytes(path, payload)
+            # Write-through: the saved object becomes the cached copy for this file.
+            signature = self._file_signature(path)
+            if signature is not None:
+                self._local_cache[str(path)] = {"signature": signature, "data": data}
             return self._write_result(True, "local_write_ok", path=str(path))
         except Exception as e:
+            self._local_cache.pop(str(path), None)
             logger.error(f"Local Write Error: {e}")
             return self._write_result(False, "local_write_error", error=str(e), path=str(path))
 
@@ -185,20 +604,73 @@ class Database:
                 # Fallback to local
         
         # Local Fallback
-        if self.users_file.exists():
-            try:
-                with open(self.users_file, "r", encoding="utf-8") as f:
-                    users = json.load(f)
-                    for u in users:
-                        if u.get("username") == username:
-                            return u
-            except Exception:
-                pass
-        return None
+        user = self._users_store().get(username)
+        return dict(user) if user is not None else None
 
+    def get_user_roles(self, usernames: Iterable[Any]) -> Dict[str, str]:
+        """
+        Stored role (lowercased, "" when unknown) for each username, with one `$in` query for
+        whatever is not in the cache. The cache is dropped whenever the users collection version
+        moves (another worker changed a role), so roles never lag the feed ETag built from it.
+        """
+        wanted = {str(name or "").strip() for name in usernames}
+        wanted.discard("")
+        if not wanted:
+            return {}
+        # Read before the users, so a write landing in between only costs one more lookup.
+        version = (self.get_collection_versions(["users"]) or {}).get("users")
+        now = time.monotonic()
+        roles: Dict[str, str] = {}
+        missing: List[str] = []
+        with self._role_cache_lock:
+            if version is None or version != self._role_cache_version:
+                self._role_cache.clear()
+                self._role_cache_version = version
+            for username in wanted:
+                cached = self._role_cache.get(username)
+                if cached is not None and cached[0] > now:
+                    roles[username] = cached[1]
+                else:
+                    missing.append(username)
+        if not missing:
+            return roles
+
+        found: Dict[str, Any] = {}
+        try:
+            if self.is_mongo:
+                rows = self.db.users.find({"username": {"$in": missing}}, {"_id": 0, "username": 1, "role": 1})
+                found = {str(row.get("username") or ""): row.get("role") for row in rows}
+            else:
+                store = self._users_store()
+                for username in missing:
+                    user = store.get(username)
+                    if user is not None:
+                        found[username] = user.get("role")
+        except Exception as e:
+            logger.error(f"Get User Roles Error: {e}")
+            # Unresolved names fall back to the default role without being cached.
+            return {**roles, **{username: "" for username in missing}}
+
+        expires_at = now + ROLE_CACHE_TTL_SECONDS
+        with self._role_cache_lock:
+            # Roles read under an unknown or since-superseded version are answered, not cached.
+            cacheable = version is not None and version == self._role_cache_version
+            for username in missing:
+                role = str(found.get(username) or "").strip().lower()
+                roles[username] = role
+                if cacheable:
+                    self._role_cache[username] = (expires_at, role)
+        return roles
+
+    def _forget_user_role(self, username: Any):
+        with self._role_cache_lock:
+            self._role_cache.pop(str(username or "").strip(), None)
+
+    @_tracks_write("users")
     def create_user(self, user_data: Dict) -> Dict[str, Any]:
         if self._writes_disabled():
             return self._disabled_write_result()
+        self._forget_user_role(user_data.get("username"))
         success = False
         if self.is_mongo:
             try:
@@ -212,16 +684,16 @@ class Database:
                  return self._write_result(False, "mongo_insert_error", error=msg)
 
         if not success:
-            current = []
-            if self.users_file.exists():
-                try:
-                    with open(self.users_file, "r", encoding="utf-8") as f:
-                        current = json.load(f)
-                except: pass
-            current.append(user_data)
-            return self._save_local(self.users_file, current)
+            try:
+                inserted = self._users_store().insert(user_data)
+            except Exception as e:
+                return self._local_write_error(self.users_file, e)
+            if not inserted:
+                return self._write_result(False, "username_exists")
+            return self._write_result(True, "local_write_ok", path=str(self.users_file))
         return self._write_result(True, "mongo_insert_ok")
 
+    @_tracks_write("users")
     def update_user_history(self, username: str, key: str, value: Any) -> Dict[str, Any]:
         """Update user persistent data (e.g., last_riasec_result, chat_history)"""
         if self._writes_disabled():
@@ -239,20 +711,11 @@ class Database:
                 return self._write_result(False, "mongo_update_error", error=str(e))
 
         if not success:
-            users = []
-            if self.users_file.exists():
-                try:
-                    with open(self.users_file, "r", encoding="utf-8") as f:
-                        users = json.load(f)
-                except: pass
-            
-            for u in users:
-                if u.get("username") == username:
-                    u[key] = value
-                    break
-            return self._save_local(self.users_file, users)
+            return self._update_local_user(username, {key: value})
+        self._forget_user_role(username)
         return self._write_result(True, "mongo_update_ok")
 
+    @_tracks_write("users")
     def update_user_profile(self, username: str, updates: Dict) -> Dict[str, Any]:
         """Update multiple user fields (e.g. full_name, school, class)"""
         if self._writes_disabled():
@@ -270,21 +733,20 @@ class Database:
                 return self._write_result(False, "mongo_update_error", error=str(e))
 
         if not success:
-            users = []
-            if self.users_file.exists():
-                try:
-                    with open(self.users_file, "r", encoding="utf-8") as f:
-                        users = json.load(f)
-                except: pass
-            
-            for u in users:
-                if u.get("username") == username:
-                    for k, v in updates.items():
-                        u[k] = v
-                    break
-            return self._save_local(self.users_file, users)
+            return self._update_local_user(username, updates)
+        self._forget_user_role(username)
         return self._write_result(True, "mongo_update_ok")
 
+    def _update_local_user(self, username: str, updates: Dict) -> Dict[str, Any]:
+        try:
+            # Unknown usernames were a silent no-op with the whole-file rewrite; keep that.
+            self._users_store().update(username, lambda user: (dict(updates), True))
+        except Exception as e:
+            return self._local_write_error(self.users_file, e)
+        # Dropped after the write lands so a concurrent lookup cannot re-cache the old role.
+        self._forget_user_role(username)
+        return self._write_result(True, "local_write_ok", path=str(self.users_file))
+
     # ===== COMMUNITY POSTS =====
     @staticmethod
     def _derive_post_title(post: Dict) -> str:
@@ -324,6 +786,7 @@ class Database:
 
         return patch if patch else None
 
+    @_tracks_write("posts")
     def repair_post_ownership(self, dry_run: bool = True, limit: int = 5000) -> Dict[str, Any]:
         safe_limit = max(1, min(int(limit or 5000), 20000))
         summary: Dict[str, Any] = {
@@ -416,7 +879,7 @@ class Database:
                 changed = True
 
         if changed and not dry_run:
-            save_result = self._save_local(self.posts_file, posts)
+            save_result = self._replace_local_posts(posts)
             if not save_result.get("ok"):
                 return {
                     **summary,
@@ -425,11 +888,14 @@ class Database:
                 }
         return summary
 
+    @_tracks_write("posts")
     def normalize_community_posts_schema(self) -> Dict[str, int]:
         """
         Backfill legacy community post fields in storage.
         Ensures each post has: title, category, owner_actor, comments(list), likes_count,
-        liked_by(list), helpful_comment_id, reports(list), and comment ids/reports.
+        liked_by(list), helpful_comment_id, reports(list), and comment ids/reports, plus the
+        comments_count/reports_count/open_reports_count counters (comments: the report counters),
+        and a current token_vector.
         """
         stats = {"scanned": 0, "updated": 0}
 
@@ -443,6 +909,9 @@ class Database:
                         updates["title"] = self._derive_post_title(post)
                     if not str(post.get("category") or "").strip():
                         updates["category"] = "general"
+                    elif post.get("category") != str(post.get("category")).strip().lower():
+                        # Feed queries match category exactly.
+                        updates["category"] = str(post.get("category")).strip().lower()
                     if str(post.get("author_role") or "").strip().lower() not in {"admin", "mentor", "user"}:
                         updates["author_role"] = "user"
                     if "author_username" not in post:
@@ -481,8 +950,17 @@ class Database:
                         if not isinstance(comment.get("reports"), list):
                             comment["reports"] = []
                             comments_changed = True
+                        for field, value in self._report_counters(comment.get("reports")).items():
+                            if comment.get(field) != value:
+                                comment[field] = value
+                                comments_changed = True
                     if comments_changed:
                         updates["comments"] = comments
+                    for field, value in self._post_counters({**post, **updates}).items():
+                        if post.get(field) != value:
+                            updates[field] = value
+                    if stored_token_vector(post) is None or "title" in updates or "category" in updates:
+                        updates["token_vector"] = token_vector({**post, **updates})
                     if updates:
                         self.db.posts.update_one({"id": post.get("id")}, {"$set": updates})
                         stats["updated"] += 1
@@ -492,23 +970,21 @@ class Database:
                 return stats
 
         # Local fallback
-        posts = []
-        if self.posts_file.exists():
-            try:
-                with open(self.posts_file, "r", encoding="utf-8") as f:
-                    posts = json.load(f)
-            except Exception:
-                posts = []
+        posts = [self._clone_post(p) for p in self._posts_store().all()]
 
         stats["scanned"] = len(posts)
         changed = False
         for post in posts:
+            text_before = (post.get("title"), post.get("category"))
             if not str(post.get("title") or "").strip():
                 post["title"] = self._derive_post_title(post)
                 changed = True
             if not str(post.get("category") or "").strip():
                 post["category"] = "general"
                 changed = True
+            elif post.get("category") != str(post.get("category")).strip().lower():
+                post["category"] = str(post.get("category")).strip().lower()
+                changed = True
             if str(post.get("author_role") or "").strip().lower() not in {"admin", "mentor", "user"}:
                 post["author_role"] = "user"
                 changed = True
@@ -555,60 +1031,649 @@ class Database:
                 if not isinstance(comment.get("reports"), list):
                     comment["reports"] = []
                     changed = True
+                for field, value in self._report_counters(comment.get("reports")).items():
+                    if comment.get(field) != value:
+                        comment[field] = value
+                        changed = True
+            for field, value in self._post_counters(post).items():
+                if post.get(field) != value:
+                    post[field] = value
+                    changed = True
+            if stored_token_vector(post) is None or (post.get("title"), post.get("category")) != text_before:
+                post["token_vector"] = token_vector(post)
+                changed = True
             if changed:
                 stats["updated"] += 1
                 changed = False
 
         if stats["updated"] > 0:
-            self._save_local(self.posts_file, posts)
+            self._replace_local_posts(posts)
         return stats
 
+    def _replace_local_posts(self, posts: List[Dict]) -> Dict[str, Any]:
+        if self._writes_disabled():
+            return self._disabled_write_result()
+        try:
+            self._posts_store().replace_all(posts)
+        except Exception as e:
+            return self._local_write_error(self.posts_file, e)
+        return self._write_result(True, "local_write_ok", path=str(self.posts_file))
+
     def get_posts(self) -> List[Dict]:
         if self.is_mongo:
             try:
                 # return newest first
-                return list(self.db.posts.find({}, {"_id": 0}).sort("timestamp", -1))
+                projection = {"_id": 0, **{field: 0 for field in INTERNAL_POST_FIELDS}}
+                return list(self.db.posts.find({}, projection).sort("timestamp", -1))
             except Exception:
                 return []
         
         # Local Fallback
-        if self.posts_file.exists():
+        posts = [self._clone_post(p) for p in self._posts_store().all()]
+        # Sort by timestamp desc locally too if possible
+        try:
+            posts.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
+        except:
+            pass
+        return posts
+
+    def get_post(self, post_id: str, projection: Optional[Iterable[str]] = None) -> Optional[Dict]:
+        """
+        One post through the id index (Mongo's unique `id` index, the local stores' key lookup).
+        `projection` lists the fields to return (`id` is always included).
+        """
+        post_id = str(post_id or "").strip()
+        if not post_id:
+            return None
+        fields = None if projection is None else ["id", *[f for f in projection if f != "id"]]
+        if self.is_mongo:
+            try:
+                mongo_projection: Dict[str, Any] = {"_id": 0}
+                if fields is not None:
+                    mongo_projection.update({field: 1 for field in fields})
+                return self.db.posts.find_one({"id": post_id}, mongo_projection)
+            except Exception as e:
+                logger.error(f"Mongo Get Post Error: {e}")
+                return None
+
+        post = self._posts_store().get(post_id)
+        if post is None:
+            return None
+        if fields is not None:
+            post = {field: post[field] for field in fields if field in post}
+        return self._clone_post(post)
+
+    def get_comment(self, post_id: str, comment_id: str) -> Optional[Dict]:
+        """One comment of one post; only that comment is returned from Mongo (positional projection)."""
+        post_id = str(post_id or "").strip()
+        comment_id = str(comment_id or "").strip()
+        if not post_id or not comment_id:
+            return None
+        if self.is_mongo:
+            try:
+                post = self.db.posts.find_one({"id": post_id, "comments.id": comment_id}, {"_id": 0, "comments.$": 1})
+            except Exception as e:
+                logger.error(f"Mongo Get Comment Error: {e}")
+                return None
+            comments = (post or {}).get("comments") or []
+            return dict(comments[0]) if comments and isinstance(comments[0], dict) else None
+
+        post = self._posts_store().get(post_id)
+        for comment in (post or {}).get("comments") or []:
+            if isinstance(comment, dict) and str(comment.get("id") or "") == comment_id:
+                return dict(comment)
+        return None
+
+    @staticmethod
+    def _comments_count(post: Dict) -> int:
+        stored = post.get("comments_count")
+        if isinstance(stored, int):
+            return stored
+        comments = post.get("comments")
+        return len(comments) if isinstance(comments, list) else 0
+
+    @staticmethod
+    def _report_counters(reports: Any) -> Dict[str, int]:
+        reports = reports if isinstance(reports, list) else []
+        open_count = sum(1 for r in reports if isinstance(r, dict) and str(r.get("status") or "open") == "open")
+        return {"reports_count": len(reports), "open_reports_count": open_count}
+
+    @classmethod
+    def _post_counters(cls, post: Dict) -> Dict[str, int]:
+        """The denormalized counters a post (and each of its comments) should carry."""
+        comments = post.get("comments")
+        return {
+            "comments_count": len(comments) if isinstance(comments, list) else 0,
+            **cls._report_counters(post.get("reports")),
+        }
+
+    @classmethod
+    def _with_comment_counters(cls, comment: Dict) -> Dict:
+        return {**comment, **cls._report_counters(comment.get("reports"))}
+
+    @staticmethod
+    def _feed_order(sort: str, pinned_first: bool) -> List[Tuple[str, int]]:
+        """
+        Total feed ordering as (field, direction) pairs. The id tie-break makes every position
+        unique, which keyset cursors rely on.
+        """
+        order: List[Tuple[str, int]] = [("is_pinned", DESCENDING)] if pinned_first else []
+        if sort == "oldest":
+            order.append(("timestamp", ASCENDING))
+        elif sort == "most_commented":
+            order += [("comments_count", DESCENDING), ("timestamp", ASCENDING)]
+        else:
+            order.append(("timestamp", DESCENDING))
+        order.append(("id", ASCENDING))
+        return order
+
+    @classmethod
+    def _feed_values(cls, post: Dict, order: List[Tuple[str, int]]) -> List[Any]:
+        values: List[Any] = []
+        for field, _ in order:
+            if field == "is_pinned":
+                values.append(bool(post.get("is_pinned")))
+            elif field == "comments_count":
+                values.append(cls._comments_count(post))
+            else:
+                values.append(str(post.get(field) or ""))
+        return values
+
+    @staticmethod
+    def _feed_compare(left: List[Any], right: List[Any], order: List[Tuple[str, int]]) -> int:
+        for (_, direction), a, b in zip(order, left, right):
+            if a != b:
+                comes_first = a < b if direction == ASCENDING else a > b
+                return -1 if comes_first else 1
+        return 0
+
+    @staticmethod
+    def _sort_by_feed(keyed: List[Tuple[Tuple, Dict]], order: List[Tuple[str, int]]):
+        """
+        Sort (feed values, post) pairs in feed order, in place. Descending strings cannot be
+        negated into one tuple key, so this is one stable C-level sort per field, last field
+        first, each on a plain item key.
+        """
+        for idx in range(len(order) - 1, -1, -1):
+            keyed.sort(key=lambda item: item[0][idx], reverse=order[idx][1] == DESCENDING)
+
+    @staticmethod
+    def encode_feed_cursor(order: List[Tuple[str, int]], values: List[Any]) -> str:
+        payload = json.dumps({"o": [field for field, _ in order], "v": values}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def decode_feed_cursor(raw: str, order: List[Tuple[str, int]]) -> List[Any]:
+        """Values of the last post already served. Raises ValueError for foreign or damaged cursors."""
+        try:
+            padded = raw + "=" * (-len(raw) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+            fields, values = payload["o"], payload["v"]
+        except Exception as e:
+            raise ValueError(f"invalid cursor: {e}")
+        if fields != [field for field, _ in order] or not isinstance(values, list) or len(values) != len(order):
+            raise ValueError("cursor does not match this sort mode")
+        expected = {"is_pinned": bool, "comments_count": int}
+        for (field, _), value in zip(order, values):
+            if not isinstance(value, expected.get(field, str)):
+                raise ValueError(f"invalid cursor value for {field}")
+        return values
+
+    def query_feed_page(
+        self,
+        category: Optional[str] = None,
+        keyword: str = "",
+        sort: str = "newest",
+        limit: int = 20,
+        cursor: str = "",
+        comments_limit: Optional[int] = None,
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Keyset-paginated feed (pinned first): the posts after `cursor` plus the cursor for the
+        next page, or None on the last page. Each page is a range query, whatever its depth.
+        """
+        sort = sort if sort in POST_SORT_MODES else "newest"
+        order = self._feed_order(sort, True)
+        after = self.decode_feed_cursor(cursor, order) if cursor else None
+        limit = max(1, int(limit))
+        posts = self.query_posts(category, keyword, sort, True, limit + 1, 0, after=after, comments_limit=comments_limit)
+        if len(posts) <= limit:
+            return posts, None
+        posts = posts[:limit]
+        return posts, self.encode_feed_cursor(order, self._feed_values(posts[-1], order))
+
+    def query_posts(
+        self,
+        category: Optional[str] = None,
+        keyword: str = "",
+        sort: str = "newest",
+        pinned_first: bool = True,
+        limit: int = 100,
+        offset: int = 0,
+        after: Optional[List[Any]] = None,
+        comments_limit: Optional[int] = None,
+    ) -> List[Dict]:
+        """
+        One feed page. `category` is matched exactly (None/"all" = every category) and `keyword`
+        must already be folded with normalize_text_search. `after` holds the _feed_values of the
+        last post already served (see query_feed_page). With `comments_limit` each post carries
+        only its newest N comments; comments_count still counts all of them. Only the returned
+        posts are copied or fetched in full; filtering, sorting and paging happen in the store.
+        """
+        category = str(category or "").strip().lower()
+        if category == "all":
+            category = ""
+        sort = sort if sort in POST_SORT_MODES else "newest"
+        limit = max(0, int(limit))
+        offset = max(0, int(offset))
+        order = self._feed_order(sort, pinned_first)
+        if comments_limit is not None:
+            comments_limit = max(0, int(comments_limit))
+        # Keyword pages start from the search index's matches; None (no words to look up, or
+        # the index failed) falls back to scanning.
+        matched_ids: Optional[Set[str]] = None
+        if keyword and search_tokens(keyword):
+            try:
+                if self._sync_post_indexes():
+                    matched_ids = self.search_index.search(keyword)
+            except Exception as e:
+                logger.error(f"Search Index Error: {e}")
+            if matched_ids is not None and not matched_ids:
+                return []
+        if self.is_mongo:
             try:
-                with open(self.posts_file, "r", encoding="utf-8") as f:
-                    posts = json.load(f)
-                    # Sort by timestamp desc locally too if possible
-                    try:
-                        posts.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-                    except:
-                        pass
+                return self._query_posts_mongo(category, keyword, order, limit, offset, after, comments_limit, matched_ids)
+            except Exception as e:
+                logger.error(f"Mongo Query Posts Error: {e}")
+                return []
+
+        if self.sqlite is not None and (not keyword or matched_ids is not None):
+            try:
+                posts = self.sqlite.query_posts(category, order, limit, offset, after, ids=matched_ids)
+                if comments_limit is None:
                     return posts
-            except Exception:
-                pass
-        return []
+                return [self._clone_post(p, comments_limit) for p in posts]
+            except Exception as e:
+                logger.error(f"SQLite Query Posts Error: {e}")
+                return []
+
+        if matched_ids is not None:
+            posts = self._local_matched_view(matched_ids, category, order)
+            keyword = ""
+        else:
+            posts = self._local_post_view(category, order)
+        if after is not None:
+            # Binary search for the first post ordered after the cursor.
+            lo, hi = 0, len(posts)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._feed_compare(self._feed_values(posts[mid], order), after, order) <= 0:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            posts = posts[lo:]
+        if keyword:
+            matched: List[Dict] = []
+            for post in posts:
+                if post_matches_search(post, keyword):
+                    matched.append(post)
+                    if len(matched) >= offset + limit:
+                        break
+            posts = matched
+        return [self._clone_post(p, comments_limit) for p in posts[offset:offset + limit]]
+
+    def _local_matched_view(self, post_ids: Set[str], category: str, order: List[Tuple[str, int]]) -> List[Dict]:
+        # Keyed lookups of the matched posts only, sorted like _local_post_view.
+        store = self._posts_store()
+        keyed = []
+        for post_id in post_ids:
+            post = store.get(post_id)
+            if post is None:
+                continue
+            if category and str(post.get("category") or "general").strip().lower() != category:
+                continue
+            keyed.append((tuple(self._feed_values(post, order)), post))
+        self._sort_by_feed(keyed, order)
+        return [p for _, p in keyed]
+
+    def _local_post_view(self, category: str, order: List[Tuple[str, int]]) -> List[Dict]:
+        records = self._posts_store().all()
+        view_key = (category, tuple(order))
+        cached = self._post_views.get(view_key)
+        if cached is not None and cached[0] is records:
+            return cached[1]
+
+        def feed_key(post: Dict) -> Optional[Tuple]:
+            if category and str(post.get("category") or "general").strip().lower() != category:
+                return None
+            return tuple(self._feed_values(post, order))
+
+        # The store swaps in a new dict only for the records a write touched, so only those
+        # are re-keyed. When none of them moved in the ordering (a like, a comment under
+        # "newest", ...) the previous order is kept with the current post objects.
+        previous_posts, previous_keys = (cached[2], cached[3]) if cached is not None else ({}, {})
+        posts = {str(p.get("id")): p for p in records}
+        keys = dict(previous_keys)
+        reorder = cached is None or len(posts) != len(previous_posts)
+        for post_id, post in posts.items():
+            if previous_posts.get(post_id) is post:
+                continue
+            key = feed_key(post)
+            reorder = reorder or post_id not in previous_keys or previous_keys[post_id] != key
+            keys[post_id] = key
+        if reorder:
+            keys = {post_id: keys[post_id] if post_id in keys else feed_key(p) for post_id, p in posts.items()}
+            keyed = [(key, posts[post_id]) for post_id, key in keys.items() if key is not None]
+            self._sort_by_feed(keyed, order)
+            view = [p for _, p in keyed]
+        else:
+            view = [posts[str(p.get("id"))] for p in cached[1]]
+        if len(self._post_views) >= 64:
+            self._post_views.clear()
+        self._post_views[view_key] = (records, view, posts, keys)
+        return view
+
+    @staticmethod
+    def _mongo_keyset(order: List[Tuple[str, int]], after: List[Any]) -> List[Dict[str, Any]]:
+        # Keyset range: strictly after `after` in `order`, one $or branch per sort key.
+        branches = []
+        for idx, (field, direction) in enumerate(order):
+            branch: Dict[str, Any] = {prev: value for (prev, _), value in zip(order[:idx], after[:idx])}
+            branch[field] = {"$gt" if direction == ASCENDING else "$lt": after[idx]}
+            branches.append(branch)
+        return branches
+
+    def _query_posts_mongo(
+        self,
+        category: str,
+        keyword: str,
+        order: List[Tuple[str, int]],
+        limit: int,
+        offset: int,
+        after: Optional[List[Any]],
+        comments_limit: Optional[int] = None,
+        matched_ids: Optional[Set[str]] = None,
+    ) -> List[Dict]:
+        match: Dict[str, Any] = {"category": category} if category else {}
+        if matched_ids is not None:
+            match["id"] = {"$in": sorted(matched_ids)}
+        page_projection: Dict[str, Any] = {"_id": 0, **{field: 0 for field in INTERNAL_POST_FIELDS}}
+        if comments_limit == 0:
+            page_projection["comments"] = 0
+        elif comments_limit is not None:
+            page_projection["comments"] = {"$slice": -comments_limit}
+        if after is not None:
+            match["$or"] = self._mongo_keyset(order, after)
+        if not keyword or matched_ids is not None:
+            cursor = self.db.posts.find(match, page_projection).sort(order).skip(offset).limit(limit)
+            return list(cursor)
+
+        # Keywords the index cannot answer: scan only the searchable fields,
+        # pick the page here, then fetch just those posts in full.
+        projection: Dict[str, Any] = {"_id": 0, **{field: 1 for field in POST_SEARCH_FIELDS}}
+        rows = self.db.posts.find(match, projection).sort(order)
+        page_ids: List[str] = []
+        seen = 0
+        for row in rows:
+            if not post_matches_search(row, keyword):
+                continue
+            if seen >= offset:
+                page_ids.append(str(row.get("id")))
+                if len(page_ids) >= limit:
+                    break
+            seen += 1
+        if not page_ids:
+            return []
+        by_id = {str(p.get("id")): p for p in self.db.posts.find({"id": {"$in": page_ids}}, page_projection)}
+        return [by_id[post_id] for post_id in page_ids if post_id in by_id]
+
+    def _post_indexes(self) -> Tuple[Any, ...]:
+        indexes = (self.search_index, self.retrieval_index, self.similarity_index, self.tfidf_index)
+        return tuple(index for index in indexes if index is not None)
+
+    def _index_post(self, post: Dict):
+        for index in self._post_indexes():
+            try:
+                index.add(post)
+            except Exception as e:
+                logger.error(f"Post Index Error: {e}")
+                index.invalidate()
+
+    def _unindex_post(self, post_id: str):
+        for index in self._post_indexes():
+            index.remove(post_id)
+
+    def _search_documents(self, post_ids: Optional[List[str]] = None) -> List[Dict]:
+        """What the text indexes are built from: each post's id and text fields (all posts, or `post_ids`)."""
+        if self.is_mongo:
+            projection = {"_id": 0, "id": 1, "token_vector": 1, **{field: 1 for field in POST_TEXT_FIELDS}}
+            query = {} if post_ids is None else {"id": {"$in": list(post_ids)}}
+            return list(self.db.posts.find(query, projection))
+        store = self._posts_store()
+        if post_ids is None:
+            return store.all()
+        return [post for post in (store.get(post_id) for post_id in post_ids) if post is not None]
+
+    def _stored_post_ids(self) -> List[str]:
+        if self.is_mongo:
+            return [str(post.get("id") or "") for post in self.db.posts.find({}, {"_id": 0, "id": 1})]
+        if self.sqlite is not None:
+            return self.sqlite.post_ids()
+        return [str(post.get("id") or "") for post in self._posts_store().all()]
+
+    def _sync_post_indexes(self) -> bool:
+        """
+        Bring the text indexes up to the stored posts (other processes' creates/deletes).
+        False when that failed: callers then answer without the indexes.
+        """
+        try:
+            self.post_index_sync.sync()
+            return True
+        except Exception as e:
+            logger.error(f"Post Index Sync Error: {e}")
+            self.post_index_sync.invalidate()
+            return False
+
+    def rebuild_search_index(self) -> Dict[str, Any]:
+        self.post_index_sync.rebuild()
+        return self.community_index_stats()
+
+    def community_index_stats(self) -> Dict[str, Any]:
+        """Indexed post counts, plus the TF-IDF matrix's memory accounting (None without NumPy)."""
+        return {
+            "posts": len(self.search_index),
+            "retrieval_posts": len(self.retrieval_index),
+            "similarity_posts": len(self.similarity_index),
+            "tfidf": self.tfidf_index.memory_usage() if self.tfidf_index is not None else None,
+        }
+
+    def get_posts_by_ids(self, post_ids: Iterable[str], projection: Optional[Iterable[str]] = None) -> List[Dict]:
+        """Several posts through the id index, in no particular order; unknown ids are skipped."""
+        post_ids = [str(post_id) for post_id in post_ids if post_id]
+        if not post_ids:
+            return []
+        if self.is_mongo:
+            fields: Dict[str, Any] = {"_id": 0}
+            if projection is not None:
+                fields.update({"id": 1, **{field: 1 for field in projection}})
+            try:
+                return list(self.db.posts.find({"id": {"$in": post_ids}}, fields))
+            except Exception as e:
+                logger.error(f"Mongo Get Posts Error: {e}")
+                return []
+        store = self._posts_store()
+        posts = [post for post in (store.get(post_id) for post_id in post_ids) if post is not None]
+        if projection is None:
+            return [self._clone_post(post) for post in posts]
+        keep = {"id", *projection}
+        return [{k: v for k, v in post.items() if k in keep} for post in posts]
+
+    def retrieve_posts(
+        self,
+        query_tokens: List[str],
+        exclude_id: Optional[str] = None,
+        projection: Optional[Iterable[str]] = None,
+    ) -> List[Tuple[Dict, float]]:
+        """
+        (post, relevance) for every post sharing a term with the query, relevance being BM25
+        scaled to 0..1 (see BM25Index.scores). Only the matching posts are fetched.
+        """
+        self._sync_post_indexes()
+        scores = self.retrieval_index.scores(query_tokens, exclude_id)
+        posts = self.get_posts_by_ids(scores.keys(), projection)
+        return [(post, scores[str(post.get("id"))]) for post in posts if str(post.get("id")) in scores]
 
+    def retrieve_top_posts(
+        self,
+        query_tokens: List[str],
+        limit: int,
+        projection: Optional[Iterable[str]] = None,
+    ) -> List[Tuple[Dict, float]]:
+        """
+        The `limit` most relevant (post, relevance 0..1) pairs for a question: TF-IDF top-k when
+        NumPy is available, otherwise the best BM25 matches. Only those posts are fetched.
+        """
+        self._sync_post_indexes()
+        if self.tfidf_index is not None:
+            ranked = self.tfidf_index.top(query_tokens, limit)
+        else:
+            ranked = sorted(self.retrieval_index.scores(query_tokens).items(), key=lambda item: item[1], reverse=True)
+            ranked = ranked[:max(0, int(limit))]
+        scores = dict(ranked)
+        posts = self.get_posts_by_ids(scores.keys(), projection)
+        return [(post, scores[str(post.get("id"))]) for post in posts if str(post.get("id")) in scores]
+
+    def retrieve_similar_posts(
+        self,
+        query_tokens: List[str],
+        exclude_id: Optional[str] = None,
+        projection: Optional[Iterable[str]] = None,
+        min_candidates: int = 20,
+    ) -> List[Tuple[Dict, float]]:
+        """
+        Like retrieve_posts, but only the posts the LSH index puts near the query are scored.
+        Falls back to the full BM25 walk when LSH yields fewer than `min_candidates` posts
+        (short or unusual queries), so small result sets are never thinner than before.
+        """
+        self._sync_post_indexes()
+        candidates = [post_id for post_id, _ in self.similarity_index.similar(query_tokens, exclude_id)]
+        only = candidates if len(candidates) >= min_candidates else None
+        scores = self.retrieval_index.scores(query_tokens, exclude_id, only=only)
+        posts = self.get_posts_by_ids(scores.keys(), projection)
+        return [(post, scores[str(post.get("id"))]) for post in posts if str(post.get("id")) in scores]
+
+    def find_near_duplicates(
+        self,
+        terms: Iterable[str],
+        threshold: float = DUPLICATE_SIMILARITY,
+        limit: int = 5,
+    ) -> List[Dict[str, Any]]:
+        """Existing posts whose estimated term-set Jaccard with `terms` is at least `threshold`."""
+        self._sync_post_indexes()
+        matches = [(post_id, estimate) for post_id, estimate in self.similarity_index.similar(terms) if estimate >= threshold]
+        matches = matches[:max(0, int(limit))]
+        if not matches:
+            return []
+        titles = {str(post.get("id")): post.get("title") for post in self.get_posts_by_ids([m[0] for m in matches], ["title"])}
+        return [
+            {"id": post_id, "title": str(titles.get(post_id) or ""), "similarity": round(estimate, 4)}
+            for post_id, estimate in matches
+            if post_id in titles
+        ]
+
+    def get_comments_page(self, post_id: str, before: Optional[int] = None, limit: int = 20) -> Optional[Dict[str, Any]]:
+        """
+        Comments of one post, newest page first: the `limit` comments stored right before index
+        `before` (the newest ones when None), in thread order. Only that slice is read from the
+        store. Returns None when the post does not exist; `start` is the index of the first
+        comment returned, i.e. the `before` of the next (older) page.
+        """
+        limit = max(1, int(limit))
+        if before is not None:
+            before = max(0, int(before))
+        if self.is_mongo:
+            try:
+                projection: Dict[str, Any] = {"_id": 0, "comments_count": 1, "helpful_comment_id": 1}
+                if before is None:
+                    projection["comments"] = {"$slice": -limit}
+                else:
+                    start = max(0, before - limit)
+                    projection["comments"] = {"$slice": [start, max(1, before - start)]}
+                post = self.db.posts.find_one({"id": post_id}, projection)
+                if not post:
+                    return None
+                comments = post.get("comments") if isinstance(post.get("comments"), list) else []
+                if before is None:
+                    total = max(self._comments_count(post), len(comments))
+                    start = total - len(comments)
+                else:
+                    total = self._comments_count(post)
+                    comments = comments if before > 0 else []
+                return {
+                    "comments": comments,
+                    "comments_count": total,
+                    "helpful_comment_id": post.get("helpful_comment_id"),
+                    "start": start,
+                }
+            except Exception as e:
+                logger.error(f"Mongo Get Comments Error: {e}")
+                return None
+
+        if self.sqlite is not None:
+            try:
+                return self.sqlite.comments_slice(post_id, before, limit)
+            except Exception as e:
+                logger.error(f"SQLite Get Comments Error: {e}")
+                return None
+
+        post = self._posts_store().get(post_id)
+        if not post:
+            return None
+        comments = post.get("comments") if isinstance(post.get("comments"), list) else []
+        stop = len(comments) if before is None else min(before, len(comments))
+        start = max(0, stop - limit)
+        return {
+            "comments": [dict(c) for c in comments[start:stop] if isinstance(c, dict)],
+            "comments_count": len(comments),
+            "helpful_comment_id": post.get("helpful_comment_id"),
+            "start": start,
+        }
+
+    @_tracks_write("posts")
     def add_post(self, post: Dict) -> Dict[str, Any]:
         if self._writes_disabled():
             return self._disabled_write_result()
+        post = {**post, **self._post_counters(post)}
+        if isinstance(post.get("comments"), list):
+            post["comments"] = [self._with_comment_counters(c) for c in post["comments"] if isinstance(c, dict)]
         if self.is_mongo:
             try:
                 self.db.posts.insert_one(post)
+                self._index_post(post)
                 return self._write_result(True, "mongo_insert_ok")
             except Exception as e:
                 logger.error(f"Mongo Insert Post Error: {e}")
                 return self._write_result(False, "mongo_insert_error", error=str(e))
         else:
-            current = self.get_posts()
-            current.append(post)
-            return self._save_local(self.posts_file, current)
+            try:
+                inserted = self._posts_store().insert(post)
+            except Exception as e:
+                return self._local_write_error(self.posts_file, e)
+            if not inserted:
+                return self._write_result(False, "duplicate_post_id")
+            self._index_post(post)
+            return self._write_result(True, "local_write_ok", path=str(self.posts_file))
 
+    @_tracks_write("posts")
     def add_comment(self, post_id: str, comment: Dict) -> Dict[str, Any]:
         if self._writes_disabled():
             return self._disabled_write_result()
+        comment = self._with_comment_counters(comment)
         if self.is_mongo:
             try:
                 result = self.db.posts.update_one(
                     {"id": post_id},
-                    {"$push": {"comments": comment}}
+                    {"$push": {"comments": comment}, "$inc": {"comments_count": 1}}
                 )
                 if result.matched_count == 0:
                     return self._write_result(False, "post_not_found")
@@ -617,19 +1682,20 @@ class Database:
                 logger.error(f"Mongo Add Comment Error: {e}")
                 return self._write_result(False, "mongo_update_error", error=str(e))
         else:
-            posts = self.get_posts()
-            found = False
-            for p in posts:
-                if p.get("id") == post_id:
-                    if "comments" not in p:
-                        p["comments"] = []
-                    p["comments"].append(comment)
-                    found = True
-                    break
+            def apply(post: Dict) -> Tuple[Dict, bool]:
+                comments = list(post.get("comments") or [])
+                comments.append(comment)
+                return {"comments": comments, "comments_count": len(comments)}, True
+
+            try:
+                found = self._posts_store().update(post_id, apply)
+            except Exception as e:
+                return self._local_write_error(self.posts_file, e)
             if not found:
                 return self._write_result(False, "post_not_found")
-            return self._save_local(self.posts_file, posts)
+            return self._write_result(True, "local_write_ok", path=str(self.posts_file))
 
+    @_tracks_write("posts")
     def delete_post(self, post_id: str) -> Dict[str, Any]:
         if self._writes_disabled():
             return self._disabled_write_result()
@@ -638,16 +1704,22 @@ class Database:
                 result = self.db.posts.delete_one({"id": post_id})
                 if result.deleted_count == 0:
                     return self._write_result(False, "post_not_found")
+                self._delete_post_reports(post_id)
+                self._unindex_post(post_id)
                 return self._write_result(True, "mongo_delete_ok", deleted=result.deleted_count)
             except Exception as e:
                 logger.error(f"Mongo Delete Post Error: {e}")
                 return self._write_result(False, "mongo_delete_error", error=str(e))
 
-        posts = self.get_posts()
-        next_posts = [p for p in posts if str(p.get("id") or "") != str(post_id)]
-        if len(next_posts) == len(posts):
+        try:
+            deleted = self._posts_store().delete(post_id)
+        except Exception as e:
+            return self._local_write_error(self.posts_file, e)
+        if not deleted:
             return self._write_result(False, "post_not_found")
-        return self._save_local(self.posts_file, next_posts)
+        self._delete_post_reports(post_id)
+        self._unindex_post(post_id)
+        return self._write_result(True, "local_write_ok", path=str(self.posts_file))
 
     @staticmethod
     def _upsert_report(reports: List[Dict], actor_id: str, reason: str, detail: str) -> List[Dict]:
@@ -669,205 +1741,331 @@ class Database:
         })
         return reports
 
+    def _upsert_report_mongo(
+        self,
+        post_id: str,
+        comment_id: Optional[str],
+        actor_id: str,
+        reason: str,
+        detail: str,
+    ) -> Optional[Dict]:
+        """
+        Server-side counterpart of _upsert_report for one comment's reports (or the post's when
+        comment_id is None): refresh the actor's existing entry in place, else push a new one.
+        """
+        entry = {
+            "actor_id": actor_id,
+            "reason": reason,
+            "detail": (detail or "")[:300],
+            "timestamp": datetime.now().isoformat(),
+            "status": "open",
+        }
+        open_entry = {"actor_id": actor_id, "status": "open"}
+        closed_entry = {"actor_id": actor_id, "status": {"$ne": "open"}}
+        if comment_id is None:
+            def match(reports_clause: Dict[str, Any]) -> Dict[str, Any]:
+                return {"id": post_id, "reports": reports_clause}
+            entry_path, push_path = "reports.$[r]", "reports"
+            counter_path, push_counter_path = "", ""
+            array_filters = [{"r.actor_id": actor_id}]
+            projection = {"_id": 0, "reports_count": 1}
+        else:
+            def match(reports_clause: Dict[str, Any]) -> Dict[str, Any]:
+                return {"id": post_id, "comments": {"$elemMatch": {"id": comment_id, "reports": reports_clause}}}
+            entry_path, push_path = "comments.$[c].reports.$[r]", "comments.$.reports"
+            counter_path, push_counter_path = "comments.$[c].", "comments.$."
+            array_filters = [{"c.id": comment_id}, {"r.actor_id": actor_id}]
+            projection = {"_id": 0, "comments": {"$elemMatch": {"id": comment_id}}}
+        refresh = {f"{entry_path}.{field}": value for field, value in entry.items() if field != "actor_id"}
+
+        # Refresh an open report, reopen a closed one, or push a new one; only the last two move
+        # the counters. Each step matches only in its own case, so counts stay exact under races.
+        attempts = [
+            (match({"$elemMatch": open_entry}), {"$set": refresh}, array_filters),
+            (
+                match({"$elemMatch": closed_entry}),
+                {"$set": refresh, "$inc": {f"{counter_path}open_reports_count": 1}},
+                array_filters,
+            ),
+            (
+                match({"$not": {"$elemMatch": {"actor_id": actor_id}}}),
+                {
+                    "$push": {push_path: entry},
+                    "$inc": {
+                        f"{push_counter_path}reports_count": 1,
+                        f"{push_counter_path}open_reports_count": 1,
+                    },
+                },
+                None,
+            ),
+        ]
+        for _ in range(2):
+            for query, update, filters in attempts:
+                options: Dict[str, Any] = {"projection": projection, "return_document": ReturnDocument.AFTER}
+                if filters:
+                    options["array_filters"] = filters
+                updated = self.db.posts.find_one_and_update(query, update, **options)
+                if updated is not None:
+                    holder = updated if comment_id is None else ((updated.get("comments") or [{}])[0])
+                    return {"reports_count": int(holder.get("reports_count") or 0)}
+        return None
+
+    @_tracks_write("posts")
     def report_post(self, post_id: str, actor_id: str, reason: str, detail: str = "") -> Optional[Dict]:
         if self._writes_disabled():
             return None
         if self.is_mongo:
             try:
-                post = self.db.posts.find_one({"id": post_id}, {"_id": 0})
-                if not post:
-                    return None
-                reports = post.get("reports") or []
-                if not isinstance(reports, list):
-                    reports = []
-                reports = self._upsert_report(reports, actor_id, reason, detail)
-                self.db.posts.update_one({"id": post_id}, {"$set": {"reports": reports}})
-                return {"reports_count": len(reports)}
+                result = self._upsert_report_mongo(post_id, None, actor_id, reason, detail)
             except Exception as e:
                 logger.error(f"Mongo Report Post Error: {e}")
                 return None
+            if result is not None:
+                self._index_report(post_id, None, actor_id)
+            return result
 
-        posts = self.get_posts()
-        result = None
-        for post in posts:
-            if post.get("id") != post_id:
-                continue
+        def apply(post: Dict) -> Tuple[Dict, Dict]:
             reports = post.get("reports") or []
             if not isinstance(reports, list):
                 reports = []
-            reports = self._upsert_report(reports, actor_id, reason, detail)
-            post["reports"] = reports
-            result = {"reports_count": len(reports)}
-            break
+            reports = self._upsert_report([dict(r) for r in reports], actor_id, reason, detail)
+            return {"reports": reports, **self._report_counters(reports)}, {"reports_count": len(reports)}
+
+        try:
+            result = self._posts_store().update(post_id, apply)
+        except Exception as e:
+            logger.error(f"Local Report Post Error: {e}")
+            return None
         if result is not None:
-            self._save_local(self.posts_file, posts)
+            self._index_report(post_id, None, actor_id)
         return result
 
+    @_tracks_write("posts")
     def report_comment(self, post_id: str, comment_id: str, actor_id: str, reason: str, detail: str = "") -> Optional[Dict]:
         if self._writes_disabled():
             return None
         if self.is_mongo:
             try:
-                post = self.db.posts.find_one({"id": post_id}, {"_id": 0})
-                if not post:
-                    return None
-                comments = post.get("comments") or []
-                found = False
-                count = 0
-                for comment in comments:
-                    if str(comment.get("id") or "").strip() != comment_id:
-                        continue
-                    reports = comment.get("reports") or []
-                    if not isinstance(reports, list):
-                        reports = []
-                    reports = self._upsert_report(reports, actor_id, reason, detail)
-                    comment["reports"] = reports
-                    count = len(reports)
-                    found = True
-                    break
-                if not found:
-                    return None
-                self.db.posts.update_one({"id": post_id}, {"$set": {"comments": comments}})
-                return {"reports_count": count}
+                result = self._upsert_report_mongo(post_id, comment_id, actor_id, reason, detail)
             except Exception as e:
                 logger.error(f"Mongo Report Comment Error: {e}")
                 return None
+            if result is not None:
+                self._index_report(post_id, comment_id, actor_id)
+            return result
 
-        posts = self.get_posts()
-        result = None
-        for post in posts:
-            if post.get("id") != post_id:
-                continue
-            comments = post.get("comments") or []
-            for comment in comments:
+        def apply(post: Dict) -> Tuple[Optional[Dict], Optional[Dict]]:
+            comments = list(post.get("comments") or [])
+            for idx, comment in enumerate(comments):
                 if str(comment.get("id") or "").strip() != comment_id:
                     continue
                 reports = comment.get("reports") or []
                 if not isinstance(reports, list):
                     reports = []
-                reports = self._upsert_report(reports, actor_id, reason, detail)
-                comment["reports"] = reports
-                result = {"reports_count": len(reports)}
-                break
-            break
+                reports = self._upsert_report([dict(r) for r in reports], actor_id, reason, detail)
+                comments[idx] = {**comment, "reports": reports, **self._report_counters(reports)}
+                return {"comments": comments}, {"reports_count": len(reports)}
+            return None, None
+
+        try:
+            result = self._posts_store().update(post_id, apply)
+        except Exception as e:
+            logger.error(f"Local Report Comment Error: {e}")
+            return None
         if result is not None:
-            self._save_local(self.posts_file, posts)
+            self._index_report(post_id, comment_id, actor_id)
         return result
 
-    def get_community_reports(self) -> List[Dict]:
-        posts = self.get_posts()
-        report_items = []
-        for post in posts:
-            post_id = str(post.get("id") or "")
-            post_title = str(post.get("title") or "")
-            post_author = str(post.get("author") or "")
-            for entry in (post.get("reports") or []):
-                report_items.append({
-                    "type": "post",
-                    "post_id": post_id,
-                    "comment_id": None,
-                    "post_title": post_title,
-                    "target_author": post_author,
-                    "reason": entry.get("reason"),
-                    "detail": entry.get("detail"),
-                    "timestamp": entry.get("timestamp"),
-                    "status": entry.get("status", "open"),
-                })
-            for comment in (post.get("comments") or []):
-                comment_id = str(comment.get("id") or "")
-                comment_author = str(comment.get("author") or "")
-                for entry in (comment.get("reports") or []):
-                    report_items.append({
-                        "type": "comment",
-                        "post_id": post_id,
-                        "comment_id": comment_id,
-                        "post_title": post_title,
-                        "target_author": comment_author,
-                        "reason": entry.get("reason"),
-                        "detail": entry.get("detail"),
-                        "timestamp": entry.get("timestamp"),
-                        "status": entry.get("status", "open"),
-                    })
-        report_items.sort(key=lambda x: str(x.get("timestamp") or ""), reverse=True)
-        return report_items
-
-    def get_community_metrics(self) -> Dict[str, Any]:
-        posts = self.get_posts()
-        now = datetime.now()
-        window_7d = now - timedelta(days=7)
-        window_30d = now - timedelta(days=30)
-
-        total_posts = len(posts)
-        total_comments = 0
-        total_likes = 0
-        total_reports = 0
-        pinned_posts = 0
-        helpful_marked = 0
-        posts_7d = 0
-        comments_7d = 0
-        active_authors_30d = set()
-
-        def parse_dt(raw: Any) -> Optional[datetime]:
-            try:
-                return datetime.fromisoformat(str(raw))
-            except Exception:
-                return None
+    @staticmethod
+    def _report_index_entry(post: Dict, comment: Optional[Dict], report: Dict) -> Dict[str, Any]:
+        """Moderation-queue entry for one report on a post (comment=None) or on one of its comments."""
+        post_id = str(post.get("id") or "")
+        comment_id = str(comment.get("id") or "") if comment is not None else None
+        actor_id = str(report.get("actor_id") or "").strip()
+        # Stable per (target, reporter), so re-indexing upserts; hashed so the id handed to
+        # moderators does not reveal who reported.
+        key = json.dumps([post_id, comment_id or "", actor_id])
+        return {
+            "id": hashlib.sha1(key.encode("utf-8")).hexdigest(),
+            "type": "post" if comment is None else "comment",
+            "post_id": post_id,
+            "comment_id": comment_id,
+            "post_title": str(post.get("title") or ""),
+            "target_author": str((post if comment is None else comment).get("author") or ""),
+            "actor_id": actor_id,
+            "reason": report.get("reason"),
+            "detail": report.get("detail"),
+            "timestamp": str(report.get("timestamp") or ""),
+            "status": str(report.get("status") or "open"),
+        }
 
-        for post in posts:
-            post_dt = parse_dt(post.get("timestamp"))
-            if post_dt and post_dt >= window_7d:
-                posts_7d += 1
-            if post_dt and post_dt >= window_30d:
-                author = str(post.get("author") or "").strip()
-                if author:
-                    active_authors_30d.add(author.lower())
+    @classmethod
+    def _report_index_entries(cls, post: Dict) -> List[Dict[str, Any]]:
+        entries = [cls._report_index_entry(post, None, r) for r in post.get("reports") or [] if isinstance(r, dict)]
+        for comment in post.get("comments") or []:
+            if isinstance(comment, dict):
+                entries.extend(
+                    cls._report_index_entry(post, comment, r) for r in comment.get("reports") or [] if isinstance(r, dict)
+                )
+        return entries
 
-            likes = post.get("likes_count")
-            total_likes += int(likes if isinstance(likes, int) else 0)
+    def _put_report_entry(self, entry: Dict[str, Any]):
+        if self.is_mongo:
+            self.db.community_reports.replace_one({"id": entry["id"]}, entry, upsert=True)
+            return
+        store = self._reports_store()
+        # Update in place, else insert; a concurrent insert of the same entry makes ours a no-op update.
+        if store.update(entry["id"], lambda _: (entry, True)) is None and not store.insert(entry):
+            store.update(entry["id"], lambda _: (entry, True))
+
+    def _index_report(self, post_id: str, comment_id: Optional[str], actor_id: str):
+        """Copy the report `actor_id` just filed into the moderation queue, as stored on the post."""
+        try:
+            if comment_id is None:
+                post = self.get_post(post_id, projection=["title", "author", "reports"])
+                target = post
+            else:
+                post = self.get_post(post_id, projection=["title"])
+                target = self.get_comment(post_id, comment_id)
+            if post is None or target is None:
+                return
+            for report in target.get("reports") or []:
+                if isinstance(report, dict) and str(report.get("actor_id") or "").strip() == actor_id:
+                    self._put_report_entry(self._report_index_entry(post, None if comment_id is None else target, report))
+                    return
+        except Exception as e:
+            logger.error(f"Report Index Error: {e}")
 
-            if bool(post.get("is_pinned")):
-                pinned_posts += 1
+    def _delete_post_reports(self, post_id: str):
+        try:
+            if self.is_mongo:
+                self.db.community_reports.delete_many({"post_id": post_id})
+            elif self.sqlite is not None:
+                self.sqlite.delete_reports_for_post(post_id)
+            else:
+                store = self._reports_store()
+                for entry in [e for e in store.all() if e.get("post_id") == post_id]:
+                    store.delete(entry["id"])
+        except Exception as e:
+            logger.error(f"Report Index Delete Error: {e}")
 
-            if str(post.get("helpful_comment_id") or "").strip():
-                helpful_marked += 1
+    def backfill_community_reports(self) -> Dict[str, int]:
+        """
+        Bring the moderation queue in line with the reports stored on posts: add entries that are
+        missing (reports filed before the queue existed) and drop entries of deleted posts or
+        keyed by the old "post|comment|actor" ids, which exposed the reporter. Existing entries
+        are left alone. Safe to run on every startup.
+        """
+        stats = {"scanned": 0, "added": 0, "removed": 0}
+        if self._writes_disabled():
+            return stats
+        posts = self.get_posts()
+        entries = [entry for post in posts for entry in self._report_index_entries(post)]
+        post_ids = [str(p.get("id") or "") for p in posts]
+        stats["scanned"] = len(entries)
+        try:
+            if self.is_mongo:
+                if entries:
+                    result = self.db.community_reports.bulk_write(
+                        [UpdateOne({"id": e["id"]}, {"$setOnInsert": e}, upsert=True) for e in entries],
+                        ordered=False,
+                    )
+                    stats["added"] = int(result.upserted_count)
+                removed = self.db.community_reports.delete_many(
+                    {"$or": [{"post_id": {"$nin": post_ids}}, {"id": {"$regex": r"\|"}}]}
+                )
+                stats["removed"] = int(removed.deleted_count)
+                return stats
+            store = self._reports_store()
+            for entry in entries:
+                if store.insert(entry):
+                    stats["added"] += 1
+            known = set(post_ids)
+            for entry in [e for e in store.all() if e.get("post_id") not in known or "|" in str(e.get("id"))]:
+                if store.delete(entry["id"]):
+                    stats["removed"] += 1
+        except Exception as e:
+            logger.error(f"Report Index Backfill Error: {e}")
+        return stats
 
-            post_reports = post.get("reports") or []
-            if isinstance(post_reports, list):
-                total_reports += len(post_reports)
+    def query_community_reports(
+        self,
+        status: str = "open",
+        reason: str = "",
+        limit: int = 50,
+        cursor: str = "",
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        One page of the moderation queue, newest first: the entries after `cursor` plus the cursor
+        for the next page (None on the last one). `status`/`reason` filter exactly; "" or "all"
+        means no filter. Raises ValueError for a damaged cursor.
+        """
+        status = "" if str(status or "").strip().lower() in ("", "all") else str(status).strip().lower()
+        reason = "" if str(reason or "").strip().lower() in ("", "all") else str(reason).strip()
+        order = REPORTS_ORDER
+        after = self.decode_feed_cursor(cursor, order) if cursor else None
+        limit = max(1, int(limit))
+        if self.is_mongo:
+            match: Dict[str, Any] = {}
+            if status:
+                match["status"] = status
+            if reason:
+                match["reason"] = reason
+            if after is not None:
+                match["$or"] = self._mongo_keyset(order, after)
+            try:
+                entries = list(self.db.community_reports.find(match, {"_id": 0}).sort(order).limit(limit + 1))
+            except Exception as e:
+                logger.error(f"Mongo Query Reports Error: {e}")
+                return [], None
+        elif self.sqlite is not None:
+            try:
+                entries = self.sqlite.query_reports(status, reason, order, limit + 1, after)
+            except Exception as e:
+                logger.error(f"SQLite Query Reports Error: {e}")
+                return [], None
+        else:
+            view = self._local_report_view(status, reason)
+            lo = 0
+            if after is not None:
+                hi = len(view)
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    if self._feed_compare(self._feed_values(view[mid], order), after, order) <= 0:
+                        lo = mid + 1
+                    else:
+                        hi = mid
+            entries = [dict(e) for e in view[lo:lo + limit + 1]]
+        if len(entries) <= limit:
+            return entries, None
+        entries = entries[:limit]
+        return entries, self.encode_feed_cursor(order, self._feed_values(entries[-1], order))
+
+    def _local_report_view(self, status: str, reason: str) -> List[Dict]:
+        records = self._reports_store().all()
+        view_key = (status, reason)
+        cached = self._report_views.get(view_key)
+        if cached is not None and cached[0] is records:
+            return cached[1]
+        view = [
+            e for e in records
+            if (not status or str(e.get("status") or "open") == status) and (not reason or e.get("reason") == reason)
+        ]
+        view.sort(key=lambda e: self._feed_values(e, REPORTS_ORDER), reverse=True)
+        if len(self._report_views) >= 64:
+            self._report_views.clear()
+        self._report_views[view_key] = (records, view)
+        return view
 
-            comments = post.get("comments") or []
-            if isinstance(comments, list):
-                total_comments += len(comments)
-                for comment in comments:
-                    comment_dt = parse_dt(comment.get("timestamp"))
-                    if comment_dt and comment_dt >= window_7d:
-                        comments_7d += 1
-                    if comment_dt and comment_dt >= window_30d:
-                        c_author = str(comment.get("author") or "").strip()
-                        if c_author:
-                            active_authors_30d.add(c_author.lower())
-                    comment_reports = comment.get("reports") or []
-                    if isinstance(comment_reports, list):
-                        total_reports += len(comment_reports)
-
-        engagement_actions = total_comments + total_likes + helpful_marked
-        engagement_per_post = round((engagement_actions / total_posts), 2) if total_posts else 0.0
+    def get_community_metrics(self) -> Dict[str, Any]:
+        return self.community_metrics.snapshot()
 
-        return {
-            "total_posts": total_posts,
-            "total_comments": total_comments,
-            "total_likes": total_likes,
-            "total_reports": total_reports,
-            "pinned_posts": pinned_posts,
-            "helpful_marked_posts": helpful_marked,
-            "active_authors_30d": len(active_authors_30d),
-            "posts_7d": posts_7d,
-            "comments_7d": comments_7d,
-            "engagement_actions": engagement_actions,
-            "engagement_per_post": engagement_per_post,
-            "generated_at": now.isoformat(),
-        }
+    def reconcile_community_metrics(self) -> Dict[str, Any]:
+        """Full rebuild of the running aggregates from the stored posts."""
+        self.community_metrics.rebuild()
+        return self.community_metrics.snapshot()
 
+    @_tracks_write("posts")
     def set_post_pin(self, post_id: str, pinned: Optional[bool] = None) -> Optional[Dict]:
         if self._writes_disabled():
             return None
@@ -888,21 +2086,19 @@ class Database:
                 logger.error(f"Mongo Set Post Pin Error: {e}")
                 return None
 
-        posts = self.get_posts()
-        result = None
-        for post in posts:
-            if post.get("id") != post_id:
-                continue
+        def apply(post: Dict) -> Tuple[Dict, Dict]:
             current = bool(post.get("is_pinned", False))
             next_state = (not current) if pinned is None else bool(pinned)
-            post["is_pinned"] = next_state
-            post["pinned_at"] = datetime.now().isoformat() if next_state else None
-            result = {"is_pinned": next_state, "pinned_at": post["pinned_at"]}
-            break
-        if result is not None:
-            self._save_local(self.posts_file, posts)
-        return result
+            pinned_at = datetime.now().isoformat() if next_state else None
+            return {"is_pinned": next_state, "pinned_at": pinned_at}, {"is_pinned": next_state, "pinned_at": pinned_at}
+
+        try:
+            return self._posts_store().update(post_id, apply)
+        except Exception as e:
+            logger.error(f"Local Set Post Pin Error: {e}")
+            return None
 
+    @_tracks_write("posts")
     def set_helpful_comment(
         self,
         post_id: str,
@@ -918,73 +2114,130 @@ class Database:
 
         if self.is_mongo:
             try:
-                post = self.db.posts.find_one({"id": post_id}, {"_id": 0})
+                post = self.db.posts.find_one(
+                    {"id": post_id},
+                    {
+                        "_id": 0,
+                        "author": 1,
+                        "owner_actor": 1,
+                        "helpful_comment_id": 1,
+                        "comments": {"$elemMatch": {"id": comment_id}},
+                    },
+                )
                 if not post:
                     return None
 
+                updates: Dict[str, Any] = {}
                 owner_actor = str(post.get("owner_actor") or "").strip()
                 if not owner_actor:
                     owner_actor = self._derive_owner_actor(str(post.get("author") or ""))
-                    self.db.posts.update_one({"id": post_id}, {"$set": {"owner_actor": owner_actor}})
+                    updates["owner_actor"] = owner_actor
                 if actor != owner_actor:
+                    if updates:
+                        self.db.posts.update_one({"id": post_id}, {"$set": updates})
                     return {"error": "forbidden"}
 
-                comments = post.get("comments") or []
-                matched = any(str(c.get("id") or "").strip() == comment_id for c in comments)
-                if not matched:
+                if not post.get("comments"):
                     return None
 
                 current_helpful = str(post.get("helpful_comment_id") or "").strip()
                 should_mark = (current_helpful != comment_id) if helpful is None else bool(helpful)
                 next_helpful_id = comment_id if should_mark else None
 
-                for comment in comments:
-                    comment["helpful"] = bool(next_helpful_id and str(comment.get("id") or "").strip() == next_helpful_id)
-
-                self.db.posts.update_one(
-                    {"id": post_id},
-                    {"$set": {"helpful_comment_id": next_helpful_id, "comments": comments}}
+                # Only the target comment and whichever one was marked before are touched.
+                updates["helpful_comment_id"] = next_helpful_id
+                if should_mark:
+                    updates["comments.$[target].helpful"] = True
+                    updates["comments.$[previous].helpful"] = False
+                    array_filters = [{"target.id": comment_id}, {"previous.helpful": True, "previous.id": {"$ne": comment_id}}]
+                else:
+                    updates["comments.$[previous].helpful"] = False
+                    array_filters = [{"previous.helpful": True}]
+                result = self.db.posts.update_one(
+                    {"id": post_id, "comments.id": comment_id},
+                    {"$set": updates},
+                    array_filters=array_filters,
                 )
+                if not result.matched_count:
+                    return None
                 return {"helpful_comment_id": next_helpful_id, "helpful": should_mark}
             except Exception as e:
                 logger.error(f"Mongo Mark Helpful Comment Error: {e}")
                 return None
 
         # Local fallback
-        posts = self.get_posts()
-        updated = None
-        for post in posts:
-            if post.get("id") != post_id:
-                continue
-
+        def apply(post: Dict) -> Tuple[Optional[Dict], Optional[Dict]]:
+            changes: Dict[str, Any] = {}
             owner_actor = str(post.get("owner_actor") or "").strip()
             if not owner_actor:
                 owner_actor = self._derive_owner_actor(str(post.get("author") or ""))
-                post["owner_actor"] = owner_actor
+                changes["owner_actor"] = owner_actor
             if actor != owner_actor:
-                return {"error": "forbidden"}
+                return None, {"error": "forbidden"}
 
             comments = post.get("comments") or []
             matched = any(str(c.get("id") or "").strip() == comment_id for c in comments)
             if not matched:
-                return None
+                return None, None
 
             current_helpful = str(post.get("helpful_comment_id") or "").strip()
             should_mark = (current_helpful != comment_id) if helpful is None else bool(helpful)
             next_helpful_id = comment_id if should_mark else None
-            post["helpful_comment_id"] = next_helpful_id
+            changes["helpful_comment_id"] = next_helpful_id
+            changes["comments"] = [
+                {**comment, "helpful": bool(next_helpful_id and str(comment.get("id") or "").strip() == next_helpful_id)}
+                for comment in comments
+            ]
+            return changes, {"helpful_comment_id": next_helpful_id, "helpful": should_mark}
 
-            for comment in comments:
-                cid = str(comment.get("id") or "").strip()
-                comment["helpful"] = bool(next_helpful_id and cid == next_helpful_id)
+        try:
+            return self._posts_store().update(post_id, apply)
+        except Exception as e:
+            logger.error(f"Local Mark Helpful Comment Error: {e}")
+            return None
 
-            updated = {"helpful_comment_id": next_helpful_id, "helpful": should_mark}
-            break
+    def _toggle_post_like_mongo(self, post_id: str, actor: str, liked: Optional[bool]) -> Optional[Dict]:
+        """
+        Like/unlike with one conditional update each: the filter only matches when the actor's
+        membership in liked_by actually changes, so $inc never double-counts and the array never
+        leaves the server.
+        """
+        like_op = (
+            {"id": post_id, "liked_by": {"$ne": actor}},
+            {"$addToSet": {"liked_by": actor}, "$inc": {"likes_count": 1}},
+            True,
+        )
+        unlike_op = (
+            {"id": post_id, "liked_by": actor},
+            {"$pull": {"liked_by": actor}, "$inc": {"likes_count": -1}},
+            False,
+        )
+        if liked is None:
+            ops = [like_op, unlike_op]
+        else:
+            ops = [like_op] if liked else [unlike_op]
+
+        # A toggle can lose a race between its two attempts; a couple of retries settle it.
+        for _ in range(3):
+            for query, update, now_liked in ops:
+                updated = self.db.posts.find_one_and_update(
+                    query,
+                    update,
+                    projection={"_id": 0, "likes_count": 1},
+                    return_document=ReturnDocument.AFTER,
+                )
+                if updated is not None:
+                    return {"likes_count": max(0, int(updated.get("likes_count") or 0)), "liked": now_liked}
+            if liked is not None:
+                break
 
-        if updated is not None:
-            self._save_local(self.posts_file, posts)
-        return updated
+        current = self.db.posts.find_one({"id": post_id}, {"_id": 0, "likes_count": 1})
+        if current is None:
+            return None
+        # Explicit like/unlike that was already in effect: report the unchanged state.
+        return {"likes_count": max(0, int(current.get("likes_count") or 0)), "liked": bool(liked)}
 
+    @_tracks_write("posts")
     def toggle_post_like(self, post_id: str, actor_id: str, liked: Optional[bool] = None) -> Optional[Dict]:
         if self._writes_disabled():
             return None
@@ -994,52 +2247,55 @@ class Database:
 
         if self.is_mongo:
             try:
-                post = self.db.posts.find_one({"id": post_id}, {"_id": 0})
-                if not post:
-                    return None
-                liked_by = post.get("liked_by") or []
-                if not isinstance(liked_by, list):
-                    liked_by = []
-                is_liked = actor in liked_by
-                should_like = (not is_liked) if liked is None else bool(liked)
-
-                if should_like and actor not in liked_by:
-                    liked_by.append(actor)
-                if not should_like and actor in liked_by:
-                    liked_by = [x for x in liked_by if x != actor]
-
-                likes_count = len(liked_by)
-                self.db.posts.update_one(
-                    {"id": post_id},
-                    {"$set": {"liked_by": liked_by, "likes_count": likes_count}}
-                )
-                return {"likes_count": likes_count, "liked": actor in liked_by}
+                return self._toggle_post_like_mongo(post_id, actor, liked)
             except Exception as e:
                 logger.error(f"Mongo Toggle Like Error: {e}")
                 return None
 
         # Local fallback
-        posts = self.get_posts()
-        updated = None
-        for p in posts:
-            if p.get("id") != post_id:
-                continue
-            liked_by = p.get("liked_by") or []
+        def apply(post: Dict) -> Tuple[Dict, Dict]:
+            liked_by = post.get("liked_by") or []
             if not isinstance(liked_by, list):
                 liked_by = []
             is_liked = actor in liked_by
             should_like = (not is_liked) if liked is None else bool(liked)
             if should_like and actor not in liked_by:
-                liked_by.append(actor)
+                liked_by = liked_by + [actor]
             if not should_like and actor in liked_by:
                 liked_by = [x for x in liked_by if x != actor]
-            p["liked_by"] = liked_by
-            p["likes_count"] = len(liked_by)
-            updated = {"likes_count": p["likes_count"], "liked": actor in liked_by}
-            break
-        if updated is not None:
-            self._save_local(self.posts_file, posts)
-        return updated
+            return (
+                {"liked_by": liked_by, "likes_count": len(liked_by)},
+                {"likes_count": len(liked_by), "liked": actor in liked_by},
+            )
+
+        try:
+            return self._posts_store().update(post_id, apply)
+        except Exception as e:
+            logger.error(f"Local Toggle Like Error: {e}")
+            return None
+
+class AsyncDatabase:
+    """
+    Awaitable view of a Database for async route handlers: every public method runs in a worker
+    thread, so a slow Mongo round trip or file read does not stall the event loop. Attribute
+    reads (is_mongo, paths, ...) pass straight through to the wrapped instance.
+    """
+
+    def __init__(self, database: Database):
+        self._database = database
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._database, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(attr, *args, **kwargs)
+
+        return call
+
 
 # Global instance
 db = Database()
+adb = AsyncDatabase(db)
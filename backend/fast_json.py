@@ -0,0 +1,92 @@
+import json
+import typing
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # optional speed-up; the stdlib encoder produces the same JSON
+    orjson = None
+
+# Per model, built once: (output key, default) of plain fields, and
+# (output key, nested model, is_list, default) of fields holding other models.
+_FieldPlan = Tuple[List[Tuple[str, Any]], List[Tuple[str, Type[BaseModel], bool, Any]]]
+_plans: Dict[Type[BaseModel], _FieldPlan] = {}
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def _nested_model(annotation: Any) -> Tuple[Optional[Type[BaseModel]], bool]:
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, False
+    if typing.get_origin(annotation) in (list, List):
+        args = typing.get_args(annotation)
+        if args and isinstance(args[0], type) and issubclass(args[0], BaseModel):
+            return args[0], True
+    return None, False
+
+
+def _plan(model: Type[BaseModel]) -> _FieldPlan:
+    plan = _plans.get(model)
+    if plan is None:
+        plain: List[Tuple[str, Any]] = []
+        nested_fields: List[Tuple[str, Type[BaseModel], bool, Any]] = []
+        for name, field in model.model_fields.items():
+            nested, is_list = _nested_model(field.annotation)
+            default = None if field.is_required() else field.get_default(call_default_factory=True)
+            if nested is None:
+                plain.append((field.alias or name, default))
+            else:
+                nested_fields.append((field.alias or name, nested, is_list, default))
+        plan = (plain, nested_fields)
+        _plans[model] = plan
+    return plan
+
+
+def project(item: Dict[str, Any], model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    Shape a trusted, already-normalized dict like `model` would serialize it (same keys,
+    defaults for missing fields, extra keys dropped) without validating the values.
+    """
+    plain, nested_fields = _plan(model)
+    get = item.get
+    out = {key: get(key, default) for key, default in plain}
+    for key, nested, is_list, default in nested_fields:
+        value = get(key, default)
+        if is_list and isinstance(value, list):
+            value = [project(v, nested) for v in value if isinstance(v, dict)]
+        elif not is_list and isinstance(value, dict):
+            value = project(value, nested)
+        out[key] = value
+    return out
+
+
+class TrustedJSONResponse(Response):
+    """JSON response for content that is already plain dicts/lists shaped like the response_model."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def trusted_response(
+    items: Iterable[Dict[str, Any]],
+    model: Type[BaseModel],
+    sub_response: Optional[Response] = None,
+) -> TrustedJSONResponse:
+    """
+    List endpoint fast path: skips FastAPI's response_model validation and jsonable_encoder.
+    The route keeps its response_model, so the OpenAPI schema does not change. Headers set
+    on the injected `sub_response` (ETag, cursors) are carried over.
+    """
+    headers = {}
+    if sub_response is not None:
+        headers = {k: v for k, v in sub_response.headers.items() if k.lower() not in {"content-length", "content-type"}}
+    return TrustedJSONResponse([project(item, model) for item in items], headers=headers)
@@ -0,0 +1,488 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: only in-process locking is available
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Journal operations appended since the last snapshot before a background compaction starts.
+DEFAULT_COMPACT_THRESHOLD = int(os.getenv("LOCAL_JOURNAL_COMPACT_OPS", "1000") or 1000)
+# How long the first writer of a batch waits for concurrent writers before flushing them together.
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("LOCAL_GROUP_COMMIT_MS", "2") or 0)
+FSYNC_WRITES = str(os.getenv("LOCAL_STORE_FSYNC", "1")).strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _fingerprint(record: Any) -> str:
+    return json.dumps(record, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+@contextmanager
+def file_lock(lock_path: Path, exclusive: bool = True):
+    """
+    Advisory inter-process lock held on a sidecar `*.lock` file.
+    Degrades to a no-op where fcntl is missing or the directory is read-only (Vercel).
+    """
+    if fcntl is None:
+        yield
+        return
+    try:
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(lock_path), os.O_RDWR | os.O_CREAT, 0o644)
+    except OSError:
+        yield
+        return
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+    finally:
+        os.close(fd)
+
+
+def atomic_write_bytes(path: Path, payload: bytes, fsync: bool = FSYNC_WRITES):
+    """Write to a sibling temp file and rename it over `path`, so readers never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class _PendingWrite:
+    __slots__ = ("build", "result", "error", "done", "change")
+
+    def __init__(self, build: Callable[[], Tuple[List[Dict[str, Any]], Any]]):
+        self.build = build
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.done = False
+        # change_version() right after this write's operations, when it wrote any.
+        self.change: Optional[int] = None
+
+
+class JournalCollection:
+    """
+    Local collection stored as a JSON snapshot (the pretty-printed array the app has always
+    written) plus an append-only JSONL journal of insert/patch/delete operations.
+
+    The whole collection lives in memory. Writes append one journal line, so their cost is
+    O(record) instead of O(collection); the snapshot is rewritten by a background compaction
+    once the journal grows past `compact_threshold` operations.
+
+    Several processes may share the files: every write re-reads what other workers appended
+    while holding an exclusive flock, and concurrent writers are grouped into one append+fsync.
+
+    Records handed out by `all()`/`get()` are shared and must be treated as read-only:
+    patches replace the stored dict instead of mutating it.
+    """
+
+    def __init__(self, path: Path, key_field: Optional[str] = None, compact_threshold: int = DEFAULT_COMPACT_THRESHOLD):
+        self.path = Path(path)
+        self.journal_path = self.path.with_name(self.path.name + ".journal")
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self.key_field = key_field
+        self.compact_threshold = max(1, int(compact_threshold))
+        self._lock = threading.RLock()
+        self._disk_lock_held = False
+        self._commit_cond = threading.Condition()
+        self._pending: List[_PendingWrite] = []
+        self._committing = False
+        self._items: Dict[str, Dict[str, Any]] = {}
+        self._next_auto_key = 0
+        self._snapshot_signature: Optional[Tuple[int, int]] = None
+        self._snapshot_hash = ""
+        self._journal_ino: Optional[int] = None
+        self._journal_offset = 0
+        self._journal_ops = 0
+        self._loaded = False
+        self._compacting = False
+        self._records_view: Optional[List[Dict[str, Any]]] = None
+        # Operations applied in this process (own writes and replayed foreign ones), +2 per reload.
+        self._changes = 0
+        self._last_write = threading.local()
+
+    # ----- public API -----
+    def all(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            if self._records_view is None:
+                self._records_view = list(self._items.values())
+            return self._records_view
+
+    def get(self, key: Any) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            return self._items.get(str(key or ""))
+
+    def change_version(self) -> int:
+        """
+        In-process counter that moves by one per applied write operation, whichever process
+        made it, and by two on a full reload (which may hide any number of changes).
+        """
+        with self._lock:
+            self._refresh()
+            return self._changes
+
+    def last_write_version(self) -> Optional[int]:
+        """change_version() right after this thread's last write, if it changed anything; then cleared."""
+        version, self._last_write.version = getattr(self._last_write, "version", None), None
+        return version
+
+    def version(self) -> str:
+        """Token that changes with every write, including writes made by other processes."""
+        with self._lock:
+            self._refresh()
+            return f"{self._snapshot_hash[:16]}:{self._journal_ino or 0}:{self._journal_offset}"
+
+    def insert(self, record: Dict[str, Any]) -> bool:
+        """Append a record. Returns False when a keyed record with the same key already exists."""
+        def build():
+            if self.key_field is not None and self._record_key(record) in self._items:
+                return [], False
+            return [{"op": "insert", "record": record}], True
+        return self._commit(build)
+
+    def update(self, key: Any, mutate: Callable[[Dict[str, Any]], Tuple[Optional[Dict[str, Any]], Any]]) -> Any:
+        """
+        Read-modify-write one record against the latest on-disk state.
+        `mutate(record)` returns `(changes, result)`; `changes` are top-level fields to set
+        (nothing is written when empty). Returns `result`, or None when the key is unknown.
+        """
+        def build():
+            current = self._items.get(str(key or ""))
+            if current is None:
+                return [], None
+            changes, result = mutate(current)
+            if not changes:
+                return [], result
+            return [{"op": "patch", "key": str(key), "set": changes}], result
+        return self._commit(build)
+
+    def delete(self, key: Any) -> bool:
+        def build():
+            if str(key or "") not in self._items:
+                return [], False
+            return [{"op": "delete", "key": str(key)}], True
+        return self._commit(build)
+
+    def replace_all(self, records: List[Dict[str, Any]]):
+        """Replace the collection wholesale (migrations/repairs): rewrites the snapshot and resets the journal."""
+        with self._lock, self._disk_lock(exclusive=True):
+            self._sync_from_disk()
+            self._load_records(records)
+            self._write_snapshot(self._serialize_snapshot(list(self._items.values())), tail=b"")
+
+    def compact(self):
+        """Fold the journal into a fresh snapshot. Writers are only blocked while files are swapped."""
+        with self._lock:
+            self._refresh()
+            records = list(self._items.values())
+            signature = self._snapshot_signature
+            journal_ino = self._journal_ino
+            offset = self._journal_offset
+        payload = self._serialize_snapshot(records)
+        with self._lock, self._disk_lock(exclusive=True):
+            self._sync_from_disk()
+            if self._snapshot_signature != signature or self._journal_ino != journal_ino:
+                return  # another worker compacted in the meantime
+            tail = b""
+            if self._journal_offset > offset:
+                with open(self.journal_path, "rb") as f:
+                    f.seek(offset)
+                    tail = f.read(self._journal_offset - offset)
+                # Operations that landed while the snapshot was serialized move to the new journal.
+                tail = b"".join(
+                    line for line in tail.splitlines(keepends=True)
+                    if line.strip() and not line.startswith(b'{"op": "base"')
+                )
+            self._write_snapshot(payload, tail=tail)
+
+    # ----- group commit -----
+    def _commit(self, build: Callable[[], Tuple[List[Dict[str, Any]], Any]]) -> Any:
+        self._last_write.version = None
+        pending = _PendingWrite(build)
+        leader = False
+        with self._commit_cond:
+            self._pending.append(pending)
+            while self._committing and not pending.done:
+                self._commit_cond.wait()
+            if not pending.done:
+                self._committing = True
+                leader = True
+        if leader:
+            if GROUP_COMMIT_WINDOW_MS > 0:
+                time.sleep(GROUP_COMMIT_WINDOW_MS / 1000.0)
+            with self._commit_cond:
+                batch, self._pending = self._pending, []
+            try:
+                self._flush_batch(batch)
+            finally:
+                with self._commit_cond:
+                    self._committing = False
+                    self._commit_cond.notify_all()
+        if pending.error is not None:
+            raise pending.error
+        self._last_write.version = pending.change
+        return pending.result
+
+    def _flush_batch(self, batch: List[_PendingWrite]):
+        try:
+            with self._lock, self._disk_lock(exclusive=True):
+                self._sync_from_disk()
+                ops: List[Dict[str, Any]] = []
+                for pending in batch:
+                    try:
+                        pending_ops, pending.result = pending.build()
+                    except Exception as e:
+                        pending.error = e
+                        continue
+                    # Apply right away so later writes in the same batch see this one.
+                    for op in pending_ops:
+                        self._apply(op)
+                    if pending_ops:
+                        pending.change = self._changes
+                    ops.extend(pending_ops)
+                if ops:
+                    try:
+                        self._write_journal(ops)
+                    except Exception:
+                        # Memory is ahead of disk now; resync from the files on next access.
+                        self._loaded = False
+                        raise
+        except Exception as e:
+            for pending in batch:
+                if pending.error is None:
+                    pending.error = e
+        finally:
+            for pending in batch:
+                pending.done = True
+        if self._journal_ops >= self.compact_threshold and not self._compacting:
+            self._compacting = True
+            threading.Thread(target=self._background_compact, daemon=True).start()
+
+    # ----- internals -----
+    @contextmanager
+    def _disk_lock(self, exclusive: bool):
+        # Callers hold self._lock, so a plain flag is enough to make nested sections reuse the flock.
+        if self._disk_lock_held:
+            yield
+            return
+        with file_lock(self.lock_path, exclusive=exclusive):
+            self._disk_lock_held = True
+            try:
+                yield
+            finally:
+                self._disk_lock_held = False
+
+    def _record_key(self, record: Dict[str, Any]) -> str:
+        if self.key_field is None:
+            self._next_auto_key += 1
+            return f"#{self._next_auto_key}"
+        return str(record.get(self.key_field) or "")
+
+    @staticmethod
+    def _signature(path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _journal_stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self.journal_path.stat()
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_size)
+
+    def _load_records(self, records: List[Any]):
+        self._changes += 2
+        self._items = {}
+        self._next_auto_key = 0
+        for record in records:
+            if not isinstance(record, dict):
+                continue
+            key = self._record_key(record)
+            # First record wins on duplicate keys, matching the old linear-scan lookups.
+            self._items.setdefault(key, record)
+        self._records_view = None
+
+    def _refresh(self):
+        """Cheap stat check on every read; only touches the files when another worker changed them."""
+        if self._loaded and self._signature(self.path) == self._snapshot_signature:
+            journal = self._journal_stat()
+            expected = (self._journal_ino, self._journal_offset) if self._journal_ino is not None else None
+            if journal == expected or (journal is None and self._journal_offset == 0):
+                return
+        with self._disk_lock(exclusive=False):
+            self._sync_from_disk()
+
+    def _sync_from_disk(self):
+        signature = self._signature(self.path)
+        if not self._loaded or signature != self._snapshot_signature:
+            self._reload(signature)
+            return
+        journal = self._journal_stat()
+        if journal is None:
+            if self._journal_offset > 0:
+                self._reload(signature)
+            return
+        ino, size = journal
+        if self._journal_ino is None and self._journal_offset == 0:
+            self._replay(0, trusted=False)
+        elif ino != self._journal_ino or size < self._journal_offset:
+            self._reload(signature)
+        elif size > self._journal_offset:
+            self._replay(self._journal_offset, trusted=True)
+
+    def _reload(self, signature: Optional[Tuple[int, int]]):
+        raw = b""
+        if signature is not None:
+            try:
+                with open(self.path, "rb") as f:
+                    raw = f.read()
+            except OSError as e:
+                logger.error(f"Local Store Read Error ({self.path}): {e}")
+        records: List[Any] = []
+        if raw.strip():
+            try:
+                records = json.loads(raw.decode("utf-8"))
+            except Exception as e:
+                logger.error(f"Local Store Parse Error ({self.path}): {e}")
+                records = []
+        self._load_records(records if isinstance(records, list) else [])
+        self._snapshot_signature = signature
+        self._snapshot_hash = hashlib.sha1(raw).hexdigest()
+        self._journal_ino = None
+        self._journal_offset = 0
+        self._journal_ops = 0
+        self._loaded = True
+        self._replay(0, trusted=False)
+
+    def _replay(self, offset: int, trusted: bool):
+        try:
+            with open(self.journal_path, "rb") as f:
+                self._journal_ino = os.fstat(f.fileno()).st_ino
+                f.seek(offset)
+                chunk = f.read()
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.error(f"Local Journal Read Error ({self.journal_path}): {e}")
+            return
+        # A torn last line (writer crashed mid-append) is left for the next writer to truncate.
+        end = chunk.rfind(b"\n")
+        if end < 0:
+            return
+        lines = chunk[:end + 1].splitlines()
+        self._journal_offset = offset + end + 1
+
+        # When the journal was not written against the current snapshot (a crash between the
+        # snapshot swap and the journal reset, or a hand-edited snapshot) keyed operations are
+        # still safe to re-apply, but keyless inserts may already be in the snapshot.
+        stale_fingerprints: Optional[Dict[str, int]] = None
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                op = json.loads(line.decode("utf-8"))
+            except Exception:
+                logger.warning(f"Skipping corrupt journal line in {self.journal_path}")
+                continue
+            kind = op.get("op")
+            if kind == "base":
+                if not trusted and op.get("snapshot") != self._snapshot_hash and self.key_field is None:
+                    stale_fingerprints = {}
+                    for record in self._items.values():
+                        fp = _fingerprint(record)
+                        stale_fingerprints[fp] = stale_fingerprints.get(fp, 0) + 1
+                continue
+            if kind == "insert" and stale_fingerprints:
+                fp = _fingerprint(op.get("record"))
+                if stale_fingerprints.get(fp, 0) > 0:
+                    stale_fingerprints[fp] -= 1
+                    continue
+            self._apply(op)
+            self._journal_ops += 1
+
+    def _apply(self, op: Dict[str, Any]):
+        kind = op.get("op")
+        if kind == "insert":
+            record = op.get("record")
+            if isinstance(record, dict):
+                self._items[self._record_key(record)] = record
+        elif kind == "patch":
+            key = str(op.get("key") or "")
+            current = self._items.get(key)
+            changes = op.get("set") or {}
+            if current is not None and isinstance(changes, dict):
+                self._items[key] = {**current, **changes}
+        elif kind == "delete":
+            self._items.pop(str(op.get("key") or ""), None)
+        self._changes += 1
+        self._records_view = None
+
+    def _write_journal(self, ops: List[Dict[str, Any]]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        lines = []
+        if self._journal_offset == 0:
+            lines.append(json.dumps({"op": "base", "snapshot": self._snapshot_hash}) + "\n")
+        for op in ops:
+            lines.append(json.dumps(op, ensure_ascii=False, separators=(",", ":")) + "\n")
+        data = "".join(lines).encode("utf-8")
+        with open(self.journal_path, "ab") as f:
+            # Drop a torn line left behind by a crashed writer before appending after it.
+            if f.tell() != self._journal_offset:
+                f.truncate(self._journal_offset)
+                f.seek(self._journal_offset)
+            f.write(data)
+            f.flush()
+            if FSYNC_WRITES:
+                os.fsync(f.fileno())
+            self._journal_ino = os.fstat(f.fileno()).st_ino
+        self._journal_offset += len(data)
+        self._journal_ops += len(ops)
+
+    def _background_compact(self):
+        try:
+            self.compact()
+        except Exception as e:
+            logger.error(f"Local Journal Compaction Error ({self.path}): {e}")
+        finally:
+            self._compacting = False
+
+    @staticmethod
+    def _serialize_snapshot(records: List[Dict[str, Any]]) -> bytes:
+        return json.dumps(records, ensure_ascii=False, indent=2).encode("utf-8")
+
+    def _write_snapshot(self, payload: bytes, tail: bytes):
+        snapshot_hash = hashlib.sha1(payload).hexdigest()
+        header = (json.dumps({"op": "base", "snapshot": snapshot_hash}) + "\n").encode("utf-8")
+        journal = header + tail if tail else b""
+        atomic_write_bytes(self.path, payload)
+        atomic_write_bytes(self.journal_path, journal)
+        self._snapshot_signature = self._signature(self.path)
+        self._snapshot_hash = snapshot_hash
+        journal_stat = self._journal_stat()
+        self._journal_ino = journal_stat[0] if journal_stat else None
+        self._journal_offset = len(journal)
+        self._journal_ops = tail.count(b"\n")
@@ -1,7 +1,7 @@
 from dotenv import load_dotenv
 load_dotenv() # Load env vars FIRST before other imports use them
 
-from fastapi import FastAPI, HTTPException, Request, BackgroundTasks, Depends, status, UploadFile, File
+from fastapi import FastAPI, HTTPException, Request, Response, BackgroundTasks, Depends, status, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
@@ -17,14 +17,20 @@ import uuid
 import io
 import re
 import unicodedata
+import hashlib
 import sys
+import asyncio
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from riasec_calculator import calculate_riasec, get_recommendations_3_plus_1
 from datetime import datetime, timedelta, timezone
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from database import db
+from database import INTERNAL_POST_FIELDS, adb, db
+from text_search import extract_semantic_tokens, normalize_text_search, token_vector
+from community_events import CommunityEventBroker
+from fast_json import trusted_response
+from community_retrieval import retrieval_score
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -55,13 +61,14 @@ async def add_process_time_header(request: Request, call_next):
 async def run_data_migrations():
     write_enabled = bool(db.is_mongo or not os.getenv("VERCEL"))
     logger.info(
-        "Persistence mode: is_mongo=%s, vercel=%s, write_enabled=%s",
+        "Persistence mode: is_mongo=%s, is_sqlite=%s, vercel=%s, write_enabled=%s",
         db.is_mongo,
+        getattr(db, "is_sqlite", False),
         bool(os.getenv("VERCEL")),
         write_enabled,
     )
     try:
-        stats = db.normalize_community_posts_schema()
+        stats = await adb.normalize_community_posts_schema()
         logger.info(
             "Community schema migration completed: scanned=%s, updated=%s",
             stats.get("scanned", 0),
@@ -69,6 +76,53 @@ async def run_data_migrations():
         )
     except Exception as exc:
         logger.error(f"Community schema migration failed: {exc}")
+    try:
+        stats = await adb.backfill_community_reports()
+        logger.info(
+            "Community reports index backfill completed: scanned=%s, added=%s, removed=%s",
+            stats.get("scanned", 0),
+            stats.get("added", 0),
+            stats.get("removed", 0),
+        )
+    except Exception as exc:
+        logger.error(f"Community reports index backfill failed: {exc}")
+    try:
+        # Built here, after the schema migration refreshed stored token vectors, not on the first query.
+        stats = await adb.rebuild_search_index()
+        logger.info(
+            "Community indexes built: posts=%s, tfidf_bytes=%s",
+            stats.get("posts", 0),
+            (stats.get("tfidf") or {}).get("total_bytes", 0),
+        )
+    except Exception as exc:
+        logger.error(f"Community index build failed: {exc}")
+
+
+async def reconcile_community_indexes_periodically():
+    # Safety-net rebuild of the per-process aggregates, in the background so a request rarely
+    # pays for it. Other workers' writes need no timer: the metrics and the text indexes
+    # follow the posts collection version on every read.
+    interval = db.community_metrics.reconcile_seconds
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if db.community_metrics.is_stale():
+                await adb.reconcile_community_metrics()
+        except Exception as exc:
+            logger.error(f"Community index reconciliation failed: {exc}")
+
+
+@app.on_event("startup")
+async def start_community_index_reconciliation():
+    # Keep a reference so the task is not garbage collected.
+    app.state.index_reconciler = asyncio.create_task(reconcile_community_indexes_periodically())
+
+
+@app.on_event("shutdown")
+async def stop_community_index_reconciliation():
+    task = getattr(app.state, "index_reconciler", None)
+    if task is not None:
+        task.cancel()
 
 @app.get("/favicon.ico", include_in_schema=False)
 async def favicon():
@@ -163,7 +217,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     except JWTError:
         raise credentials_exception
     
-    user = db.get_user(username)
+    user = await adb.get_user(username)
     if user is None:
         raise credentials_exception
     return user
@@ -185,10 +239,10 @@ async def update_profile(profile: UserProfileUpdate, current_user: dict = Depend
     if not updates:
         return current_user
 
-    db.update_user_profile(current_user["username"], updates)
+    await adb.update_user_profile(current_user["username"], updates)
     
     # Fetch updated user to return
-    updated_data = db.get_user(current_user["username"])
+    updated_data = await adb.get_user(current_user["username"])
     return User(**updated_data)
 
 async def get_current_active_user(current_user: dict = Depends(get_current_user)):
@@ -206,6 +260,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
+)
+
+# Live community activity for /api/community/stream (per worker process).
+community_events = CommunityEventBroker(
+    max_queue=int(os.getenv("COMMUNITY_STREAM_QUEUE_SIZE", "100")),
+    heartbeat_seconds=float(os.getenv("COMMUNITY_STREAM_HEARTBEAT_SECONDS", "15")),
 )
 
 # ===== PERSISTENCE SETUP =====
@@ -266,12 +327,19 @@ class Post(BaseModel):
     owner_actor: str = ""
     helpful_comment_id: Optional[str] = None
     can_mark_helpful: bool = False
+    comments_count: int = 0
+    comments_next_cursor: Optional[str] = None
     reports_count: int = 0
     is_pinned: bool = False
     pinned_at: Optional[str] = None
     can_delete: bool = False
     can_delete_reason: Optional[str] = None
 
+class CommentsPageResponse(BaseModel):
+    comments: List[Comment] = []
+    comments_count: int = 0
+    next_cursor: Optional[str] = None
+
 class CreatePostRequest(BaseModel):
     author: str
     title: Optional[str] = None
@@ -371,15 +439,6 @@ def normalize_community_category(raw: Optional[str]) -> str:
     return category if category in COMMUNITY_ALLOWED_CATEGORIES else "general"
 
 
-def normalize_text_search(value: Optional[str]) -> str:
-    raw = str(value or "").strip().lower()
-    normalized = "".join(
-        ch for ch in unicodedata.normalize("NFD", raw)
-        if unicodedata.category(ch) != "Mn"
-    )
-    return normalized
-
-
 def normalize_actor_id(value: Optional[str]) -> str:
     return str(value or "").strip()[:128]
 
@@ -392,13 +451,22 @@ def fallback_owner_actor_from_author(author: Optional[str]) -> str:
     return f"author:{slug}"
 
 
-def resolve_user_role(username: Optional[str]) -> str:
+def _role_of_user(user: Optional[Dict[str, Any]]) -> str:
+    role = str((user or {}).get("role") or "").strip().lower()
+    return role if role in {"admin", "mentor"} else "user"
+
+
+async def resolve_user_roles(usernames: List[Optional[str]]) -> Dict[str, str]:
+    """Author role per username for a whole response, from one (cached) bulk lookup."""
+    stored = await adb.get_user_roles(usernames)
+    return {username: _role_of_user({"role": role}) for username, role in stored.items()}
+
+
+async def resolve_user_role_async(username: Optional[str]) -> str:
     username = str(username or "").strip()
     if not username:
         return "user"
-    user = db.get_user(username)
-    role = str((user or {}).get("role") or "").strip().lower()
-    return role if role in {"admin", "mentor"} else "user"
+    return (await resolve_user_roles([username])).get(username, "user")
 
 
 def resolve_bound_actor_id(
@@ -424,11 +492,18 @@ def resolve_bound_actor_id(
     return raw
 
 
+def actor_username(actor: Optional[str]) -> str:
+    actor_norm = normalize_actor_id(actor)
+    return actor_norm.split(":", 1)[1].strip().lower() if actor_norm.startswith("user:") else ""
+
+
 def evaluate_post_delete_permission(
     post: Dict[str, Any],
     actor: Optional[str],
     current_user: Optional[dict] = None,
+    roles: Optional[Dict[str, str]] = None,
 ) -> Dict[str, Any]:
+    """`roles` maps usernames to roles (resolve_user_roles); it must cover the actor's username."""
     actor_norm = normalize_actor_id(actor)
     owner_actor = str(post.get("owner_actor") or "").strip()
     if not owner_actor:
@@ -437,13 +512,11 @@ def evaluate_post_delete_permission(
     post_author_username = str(post.get("author_username") or "").strip().lower()
     post_author_name = normalize_text_search(post.get("author"))
 
-    actor_user = ""
-    if actor_norm.startswith("user:"):
-        actor_user = actor_norm.split(":", 1)[1].strip().lower()
+    actor_user = actor_username(actor_norm)
 
     role = str((current_user or {}).get("role") or "").strip().lower()
     if not role and actor_user:
-        role = resolve_user_role(actor_user)
+        role = (roles or {}).get(actor_user, "user")
     is_admin = role == "admin"
 
     if is_admin:
@@ -510,18 +583,6 @@ def normalize_report_reason(raw: Optional[str]) -> str:
     return reason if reason in COMMUNITY_REPORT_REASONS else "other"
 
 
-def post_matches_search(post: Dict[str, Any], keyword: str) -> bool:
-    if not keyword:
-        return True
-    haystack = " ".join([
-        str(post.get("title") or ""),
-        str(post.get("content") or ""),
-        str(post.get("author") or ""),
-        str(post.get("category") or ""),
-    ])
-    return normalize_text_search(haystack).find(keyword) >= 0
-
-
 def extract_riasec_letters(raw: Optional[str]) -> List[str]:
     return [ch for ch in str(raw or "").upper() if ch in "RIASEC"]
 
@@ -562,30 +623,92 @@ def raise_for_db_write_result(result: Optional[Dict[str, Any]], action: str = "d
     raise HTTPException(status_code=500, detail=detail)
 
 
-def _post_exists(post_id: str) -> bool:
-    return any(str(p.get("id") or "") == str(post_id) for p in db.get_posts())
+def stored_counter(item: Dict[str, Any], counter_field: str, list_field: str) -> int:
+    """Denormalized counter kept by Database, falling back to the embedded list's length."""
+    stored = item.get(counter_field)
+    if isinstance(stored, int):
+        return stored
+    items = item.get(list_field)
+    return len(items) if isinstance(items, list) else 0
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison (RFC 9110 13.1.2) against every tag listed in If-None-Match."""
+    if not if_none_match:
+        return False
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == wanted:
+            return True
+    return False
 
 
-def _comment_exists(post_id: str, comment_id: str) -> bool:
-    for post in db.get_posts():
-        if str(post.get("id") or "") != str(post_id):
-            continue
-        comments = post.get("comments") or []
-        return any(str(c.get("id") or "") == str(comment_id) for c in comments)
-    return False
+async def conditional_get(
+    request: Request,
+    response: Response,
+    collections: List[str],
+    extra: Any = None,
+) -> Optional[Response]:
+    """
+    Weak ETag from the write versions of `collections` plus the request's path and query
+    (and `extra`, for bodies that also depend on something else, such as today's date).
+    Returns a 304 response when the client's If-None-Match already matches (before any real
+    storage query runs); otherwise sets the ETag header on `response` and returns None.
+    """
+    versions = await adb.get_collection_versions(collections)
+    if versions is None:
+        return None
+    fingerprint = json.dumps(
+        [request.url.path, versions, sorted(request.query_params.multi_items()), extra],
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    etag = f'W/"{hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:24]}"'
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return None
 
 
-STOPWORDS_VI = {
-    "va", "la", "cua", "cho", "voi", "nhung", "mot", "nhieu", "nay", "kia",
-    "toi", "ban", "minh", "em", "anh", "chi", "neu", "thi", "ma", "do", "duoc",
-    "khong", "co", "cac", "trong", "tren", "duoi", "ve", "tai", "tu", "den",
-}
+def decorate_comment(comment: Dict[str, Any], helpful_comment_id: Optional[str], roles: Dict[str, str]) -> Dict[str, Any]:
+    comment_id = str(comment.get("id") or "").strip()
+    if not comment_id:
+        comment_id = str(uuid.uuid4())
+        comment["id"] = comment_id
+    comment["helpful"] = bool(helpful_comment_id and comment_id == helpful_comment_id)
+    comment["author_role"] = "user"
+    derived_comment_role = roles.get(str(comment.get("author_username") or "").strip(), "user")
+    if derived_comment_role in {"admin", "mentor"}:
+        comment["author_role"] = derived_comment_role
+    comment["reports_count"] = stored_counter(comment, "reports_count", "reports")
+    return comment
+
+
+def parse_comments_cursor(cursor: Optional[str]) -> Optional[int]:
+    """Comment cursors are the stored index of the oldest comment already served."""
+    raw = str(cursor or "").strip()
+    if not raw:
+        return None
+    if not raw.isdigit():
+        raise HTTPException(status_code=400, detail="Cursor không hợp lệ")
+    return int(raw)
 
 
-def extract_semantic_tokens(text: Optional[str]) -> List[str]:
-    normalized = normalize_text_search(text)
-    tokens = re.findall(r"[a-z0-9]{2,}", normalized)
-    return [tok for tok in tokens if tok not in STOPWORDS_VI]
+async def _post_exists(post_id: str) -> bool:
+    return await adb.get_post(post_id, projection=["id"]) is not None
+
+
+async def _comment_exists(post_id: str, comment_id: str) -> bool:
+    return await adb.get_comment(post_id, comment_id) is not None
+
+
+# Posts /api/community/rag/ask takes from text retrieval before applying the community boosts.
+RAG_CANDIDATE_POOL = 50
+# What ranking reads from a retrieved post: text for snippets plus the boost inputs.
+RETRIEVAL_FIELDS = ["title", "content", "author", "category", "timestamp", "likes_count", "comments_count", "is_pinned"]
 
 
 def semantic_overlap_score(a_tokens: List[str], b_tokens: List[str]) -> float:
@@ -738,12 +861,19 @@ def normalize_vr_job_record(job: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
-def get_normalized_vr_jobs() -> List[Dict[str, Any]]:
-    raw_jobs = db.get_vr_jobs(DEFAULT_VR_JOBS)
+def _normalize_vr_jobs(raw_jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     normalized_jobs = [normalize_vr_job_record(job) for job in raw_jobs]
     return [job for job in normalized_jobs if job.get("videoId")]
 
 
+def get_normalized_vr_jobs() -> List[Dict[str, Any]]:
+    return _normalize_vr_jobs(db.get_vr_jobs(DEFAULT_VR_JOBS))
+
+
+async def load_normalized_vr_jobs() -> List[Dict[str, Any]]:
+    return _normalize_vr_jobs(await adb.get_vr_jobs(DEFAULT_VR_JOBS))
+
+
 def build_recommendation_bundle(scores: Dict[str, int], jobs: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
     jobs = jobs if jobs is not None else get_normalized_vr_jobs()
     return get_recommendations_3_plus_1(scores=scores, all_jobs=jobs)
@@ -862,7 +992,7 @@ class RecommendationRequest(BaseModel):
 # ================== AUTH API ==================
 @app.post("/api/auth/register", response_model=Token)
 async def register(user: UserCreate):
-    db_user = db.get_user(user.username)
+    db_user = await adb.get_user(user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
     
@@ -875,10 +1005,10 @@ async def register(user: UserCreate):
         "hashed_password": hashed_password,
         "created_at": datetime.now().isoformat()
     }
-    create_result = db.create_user(user_data)
+    create_result = await adb.create_user(user_data)
     raise_for_db_write_result(create_result, action="register_user")
     # Read-after-write check to prevent false-success token issuance.
-    verify_user = db.get_user(user.username)
+    verify_user = await adb.get_user(user.username)
     if not verify_user:
         raise HTTPException(status_code=503, detail="Persistence check failed after registration")
     
@@ -890,7 +1020,7 @@ async def register(user: UserCreate):
 
 @app.post("/api/auth/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = db.get_user(form_data.username)
+    user = await adb.get_user(form_data.username)
     if not user or not verify_password(form_data.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -909,7 +1039,7 @@ async def read_users_me(current_user: dict = Depends(get_current_active_user)):
 
 @app.post("/api/user/data")
 async def update_user_data(data: UserDataUpdate, current_user: dict = Depends(get_current_active_user)):
-    db.update_user_history(current_user["username"], data.key, data.value)
+    await adb.update_user_history(current_user["username"], data.key, data.value)
     return {"status": "success"}
 
 @app.get("/api/user/data")
@@ -923,20 +1053,23 @@ async def get_user_data(current_user: dict = Depends(get_current_active_user)):
 # ===== API ROUTES =====
 
 @app.get("/api/vr-jobs", response_model=List[VRJob])
-async def get_vr_jobs():
-    return get_normalized_vr_jobs()
+async def get_vr_jobs(request: Request, response: Response):
+    not_modified = await conditional_get(request, response, ["vr_jobs"])
+    if not_modified is not None:
+        return not_modified
+    return await load_normalized_vr_jobs()
 
 @app.post("/api/vr-jobs")
 async def update_vr_jobs(jobs: List[VRJob], current_user: dict = Depends(get_admin_user)):
     normalized_jobs = [normalize_vr_job_record(job.model_dump(by_alias=True)) for job in jobs]
-    write_result = db.update_vr_jobs(normalized_jobs)
+    write_result = await adb.update_vr_jobs(normalized_jobs)
     raise_for_db_write_result(write_result, action="update_vr_jobs")
     return {"status": "success", "count": len(jobs)}
 
 
 @app.post("/api/recommendations")
 async def get_recommendations(payload: RecommendationRequest):
-    recommendations = build_recommendation_bundle(payload.scores)
+    recommendations = build_recommendation_bundle(payload.scores, jobs=await load_normalized_vr_jobs())
     return {"recommendations": trim_recommendation_for_response(recommendations)}
 
 
@@ -978,7 +1111,7 @@ async def import_vr_jobs(file: UploadFile = File(...), current_user: dict = Depe
     if missing_columns:
         raise HTTPException(status_code=400, detail=f"Missing required columns: {', '.join(missing_columns)}")
 
-    jobs = get_normalized_vr_jobs()
+    jobs = await load_normalized_vr_jobs()
     jobs_by_title = {job["title"].strip().lower(): job for job in jobs}
     # DB payload requires non-empty videoId; use a safe placeholder when Excel URL is missing.
     fallback_video_id = DEFAULT_VIDEO_ID
@@ -1033,11 +1166,12 @@ async def import_vr_jobs(file: UploadFile = File(...), current_user: dict = Depe
             jobs_by_title[title.lower()] = row_job
             result["created"] += 1
 
-    write_result = db.update_vr_jobs(list(jobs_by_title.values()))
+    write_result = await adb.update_vr_jobs(list(jobs_by_title.values()))
     raise_for_db_write_result(write_result, action="import_vr_jobs")
     return {
         "status": "success",
         **result,
+        "removed": int(write_result.get("removed") or 0),
         "warnings_count": len(result["warnings"]),
         "errors_count": len(result["errors"]),
         "import_runtime_version": IMPORT_RUNTIME_VERSION,
@@ -1045,10 +1179,10 @@ async def import_vr_jobs(file: UploadFile = File(...), current_user: dict = Depe
 
 @app.get("/api/submissions", response_model=List[Submission])
 async def get_submissions(current_user: dict = Depends(get_current_active_user)):
-    rows = db.get_submissions()
+    rows = await adb.get_submissions()
     role = str(current_user.get("role") or "").strip().lower()
     if role == "admin":
-        return rows
+        return trusted_response(rows, Submission)
 
     sanitized: List[Dict[str, Any]] = []
     for row in rows:
@@ -1065,26 +1199,29 @@ async def get_submissions(current_user: dict = Depends(get_current_active_user))
             "suggestedMajors": row.get("suggestedMajors") or "",
             "combinations": row.get("combinations") or "",
         })
-    return sanitized
+    return trusted_response(sanitized, Submission)
 
 
 @app.post("/api/submissions")
 async def add_submission(sub: Submission):
-    write_result = db.add_submission(sub.model_dump(by_alias=True))
+    write_result = await adb.add_submission(sub.model_dump(by_alias=True))
     raise_for_db_write_result(write_result, action="add_submission")
     return {"status": "success"}
 
 @app.get("/api/health")
 async def api_health_check():
-    write_mode = "mongo" if db.is_mongo else ("local" if not os.getenv("VERCEL") else "disabled")
+    local_mode = "sqlite" if getattr(db, "is_sqlite", False) else "local"
+    write_mode = "mongo" if db.is_mongo else (local_mode if not os.getenv("VERCEL") else "disabled")
+    db_type = "MongoDB Atlas" if db.is_mongo else ("SQLite" if local_mode == "sqlite" else "Local File")
     return {
         "status": "ok",
-        "db_type": "MongoDB Atlas" if db.is_mongo else "Local File",
+        "db_type": db_type,
         "db_connected": db.is_mongo,
         "database_name": getattr(db, "db_name", "N/A"),
         "write_mode": write_mode,
         "write_enabled": write_mode != "disabled",
         "degraded": write_mode == "disabled",
+        "indexes": await adb.get_index_state(),
         "app_runtime_version": APP_RUNTIME_VERSION,
         "import_runtime_version": IMPORT_RUNTIME_VERSION,
     }
@@ -1092,15 +1229,52 @@ async def api_health_check():
 # ================== COMMUNITY API ==================
 @app.get("/api/community/posts", response_model=List[Post])
 async def get_posts(
+    request: Request,
+    response: Response,
     search: Optional[str] = None,
     category: str = "all",
     sort: str = "newest",
     limit: int = 100,
     offset: int = 0,
     actor_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    comments_preview: Optional[int] = None,
 ):
-    posts = db.get_posts()
+    # Author roles are resolved from users, so their version is part of the feed's ETag.
+    not_modified = await conditional_get(request, response, ["posts", "users"])
+    if not_modified is not None:
+        return not_modified
+    safe_limit = max(1, min(int(limit), 200))
+    safe_offset = max(0, int(offset))
+    # comments_preview=N: each post carries only its newest N comments (older ones come from
+    # GET /api/community/posts/{post_id}/comments starting at comments_next_cursor).
+    preview = None if comments_preview is None else max(0, min(int(comments_preview), 50))
+    feed_query = {
+        "category": str(category or "all").strip().lower(),
+        "keyword": normalize_text_search(search),
+        "sort": str(sort or "newest").strip().lower(),
+        "comments_limit": preview,
+    }
+    if cursor is not None:
+        # Keyset paging: `cursor=` (empty) asks for the first page; the next one is in X-Next-Cursor.
+        try:
+            posts, next_cursor = await adb.query_feed_page(**feed_query, limit=safe_limit, cursor=cursor.strip())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor không hợp lệ")
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+    else:
+        posts = await adb.query_posts(**feed_query, pinned_first=True, limit=safe_limit, offset=safe_offset)
     actor = normalize_actor_id(actor_id)
+    usernames = [post.get("author_username") for post in posts]
+    for post in posts:
+        for comment in post.get("comments") or []:
+            if isinstance(comment, dict):
+                usernames.append(comment.get("author_username"))
+    if actor_username(actor):
+        # The per-post delete-permission check below reads the actor's role from here.
+        usernames.append(actor_username(actor))
+    roles = await resolve_user_roles(usernames)
 
     for post in posts:
         if not post.get("title"):
@@ -1108,7 +1282,7 @@ async def get_posts(
             post["title"] = (content[:80] + "...") if len(content) > 80 else (content or "Bài viết cộng đồng")
         post["category"] = normalize_community_category(post.get("category"))
         post["author_role"] = "user"
-        derived_post_role = resolve_user_role(post.get("author_username"))
+        derived_post_role = roles.get(str(post.get("author_username") or "").strip(), "user")
         if derived_post_role in {"admin", "mentor"}:
             post["author_role"] = derived_post_role
         if "comments" not in post or not isinstance(post.get("comments"), list):
@@ -1117,60 +1291,25 @@ async def get_posts(
             post["liked_by"] = []
         if "likes_count" not in post or not isinstance(post.get("likes_count"), int):
             post["likes_count"] = len(post.get("liked_by") or [])
-        post_reports = post.get("reports") or []
-        if not isinstance(post_reports, list):
-            post_reports = []
-        post["reports_count"] = len(post_reports)
+        post["comments_count"] = stored_counter(post, "comments_count", "comments")
+        post["reports_count"] = stored_counter(post, "reports_count", "reports")
+        if preview is not None and post["comments_count"] > len(post["comments"]):
+            post["comments_next_cursor"] = str(post["comments_count"] - len(post["comments"]))
         post["is_pinned"] = bool(post.get("is_pinned", False))
         post["pinned_at"] = post.get("pinned_at")
         helpful_comment_id = str(post.get("helpful_comment_id") or "").strip() or None
         post["helpful_comment_id"] = helpful_comment_id
         for comment in post["comments"]:
-            comment_id = str(comment.get("id") or "").strip()
-            if not comment_id:
-                comment_id = str(uuid.uuid4())
-                comment["id"] = comment_id
-            comment["helpful"] = bool(helpful_comment_id and comment_id == helpful_comment_id)
-            comment["author_role"] = "user"
-            derived_comment_role = resolve_user_role(comment.get("author_username"))
-            if derived_comment_role in {"admin", "mentor"}:
-                comment["author_role"] = derived_comment_role
-            comment_reports = comment.get("reports") or []
-            if not isinstance(comment_reports, list):
-                comment_reports = []
-            comment["reports_count"] = len(comment_reports)
-        delete_eval = evaluate_post_delete_permission(post, actor, current_user=None)
+            decorate_comment(comment, helpful_comment_id, roles)
+        delete_eval = evaluate_post_delete_permission(post, actor, current_user=None, roles=roles)
         post["owner_actor"] = delete_eval["owner_actor"]
         post["can_mark_helpful"] = bool(actor and actor == str(post.get("owner_actor") or ""))
         post["liked_by_me"] = bool(actor and actor in (post.get("liked_by") or []))
         post["can_delete"] = bool(delete_eval["allowed"])
         post["can_delete_reason"] = str(delete_eval["reason"])
 
-    category_filter = str(category or "all").strip().lower()
-    if category_filter != "all":
-        posts = [p for p in posts if p.get("category") == category_filter]
-
-    keyword = normalize_text_search(search)
-    if keyword:
-        posts = [p for p in posts if post_matches_search(p, keyword)]
-
-    sort_mode = str(sort or "newest").strip().lower()
-    if sort_mode == "oldest":
-        posts.sort(key=lambda p: p.get("timestamp", ""))
-    elif sort_mode == "most_commented":
-        posts.sort(
-            key=lambda p: (
-                -len(p.get("comments") or []),
-                p.get("timestamp", "")
-            )
-        )
-    else:
-        posts.sort(key=lambda p: p.get("timestamp", ""), reverse=True)
-    posts.sort(key=lambda p: 0 if bool(p.get("is_pinned")) else 1)
-
-    safe_limit = max(1, min(int(limit), 200))
-    safe_offset = max(0, int(offset))
-    return posts[safe_offset:safe_offset + safe_limit]
+    # Posts are fully normalized above: skip response_model re-validation.
+    return trusted_response(posts, Post, response)
 
 @app.post("/api/community/posts")
 async def create_post(req: CreatePostRequest, current_user: Optional[dict] = Depends(get_optional_current_user)):
@@ -1189,7 +1328,7 @@ async def create_post(req: CreatePostRequest, current_user: Optional[dict] = Dep
     if not owner_actor:
         owner_actor = fallback_owner_actor_from_author(author)
     author_username = str((current_user or {}).get("username") or "").strip() or None
-    author_role = resolve_user_role(author_username)
+    author_role = await resolve_user_role_async(author_username)
 
     new_post = {
         "id": str(uuid.uuid4()),
@@ -1208,9 +1347,39 @@ async def create_post(req: CreatePostRequest, current_user: Optional[dict] = Dep
         "is_pinned": False,
         "pinned_at": None
     }
-    write_result = db.add_post(new_post)
+    # Tokenized once here; search and retrieval indexes read it instead of the raw text.
+    new_post["token_vector"] = token_vector(new_post)
+    possible_duplicates = await adb.find_near_duplicates(list(new_post["token_vector"]["terms"]))
+    write_result = await adb.add_post(new_post)
     raise_for_db_write_result(write_result, action="create_post")
-    return new_post
+    community_events.publish("post_created", {
+        "id": new_post["id"],
+        "title": new_post["title"],
+        "category": new_post["category"],
+        "author": new_post["author"],
+        "author_role": new_post["author_role"],
+        "timestamp": new_post["timestamp"],
+    })
+    created = {k: v for k, v in new_post.items() if k not in INTERNAL_POST_FIELDS}
+    created["possible_duplicates"] = possible_duplicates
+    return created
+
+@app.get("/api/community/posts/{post_id}/comments", response_model=CommentsPageResponse)
+async def get_post_comments(post_id: str, cursor: Optional[str] = None, limit: int = 20):
+    before = parse_comments_cursor(cursor)
+    page = await adb.get_comments_page(post_id, before=before, limit=max(1, min(int(limit), 100)))
+    if page is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    comments = [c for c in page["comments"] if isinstance(c, dict)]
+    roles = await resolve_user_roles([c.get("author_username") for c in comments])
+    helpful_comment_id = str(page.get("helpful_comment_id") or "").strip() or None
+    for comment in comments:
+        decorate_comment(comment, helpful_comment_id, roles)
+    return {
+        "comments": comments,
+        "comments_count": page["comments_count"],
+        "next_cursor": str(page["start"]) if comments and page["start"] > 0 else None,
+    }
 
 @app.post("/api/community/posts/{post_id}/comments")
 async def add_comment(post_id: str, req: CreateCommentRequest, current_user: Optional[dict] = Depends(get_optional_current_user)):
@@ -1222,40 +1391,45 @@ async def add_comment(post_id: str, req: CreateCommentRequest, current_user: Opt
     new_comment = {
         "id": str(uuid.uuid4()),
         "author": req.author.strip() or "Ẩn danh",
-        "author_role": resolve_user_role(author_username),
+        "author_role": await resolve_user_role_async(author_username),
         "author_username": author_username,
         "content": content,
         "timestamp": datetime.now().isoformat(),
         "helpful": False,
         "author_actor": actor
     }
-    write_result = db.add_comment(post_id, new_comment)
+    write_result = await adb.add_comment(post_id, new_comment)
     raise_for_db_write_result(write_result, action="add_comment")
+    community_events.publish("comment_added", {
+        "post_id": post_id,
+        "comment": {key: new_comment[key] for key in ("id", "author", "author_role", "content", "timestamp")},
+    })
     return new_comment
 
 
 @app.post("/api/community/posts/{post_id}/like")
 async def toggle_post_like(post_id: str, req: ToggleLikeRequest, current_user: Optional[dict] = Depends(get_optional_current_user)):
     actor = resolve_bound_actor_id(req.actor_id, current_user=current_user, allow_guest=True)
-    result = db.toggle_post_like(post_id=post_id, actor_id=actor, liked=req.liked)
+    result = await adb.toggle_post_like(post_id=post_id, actor_id=actor, liked=req.liked)
     if result is None:
-        if _post_exists(post_id):
+        if await _post_exists(post_id):
             raise HTTPException(status_code=500, detail="toggle_like failed due to persistence error")
         raise HTTPException(status_code=404, detail="Post not found")
+    community_events.publish("like_changed", {"post_id": post_id, "likes_count": result.get("likes_count", 0)})
     return {"status": "success", **result}
 
 
 @app.post("/api/community/posts/{post_id}/comments/{comment_id}/helpful")
 async def mark_helpful_comment(post_id: str, comment_id: str, req: MarkHelpfulCommentRequest, current_user: dict = Depends(get_current_active_user)):
     actor = resolve_bound_actor_id(req.actor_id, current_user=current_user, allow_guest=False)
-    result = db.set_helpful_comment(
+    result = await adb.set_helpful_comment(
         post_id=post_id,
         comment_id=comment_id,
         actor_id=actor,
         helpful=req.helpful
     )
     if result is None:
-        if _comment_exists(post_id, comment_id):
+        if await _comment_exists(post_id, comment_id):
             raise HTTPException(status_code=500, detail="mark_helpful failed due to persistence error")
         raise HTTPException(status_code=404, detail="Post or comment not found")
     if result.get("error") == "forbidden":
@@ -1266,14 +1440,14 @@ async def mark_helpful_comment(post_id: str, comment_id: str, req: MarkHelpfulCo
 @app.post("/api/community/posts/{post_id}/report")
 async def report_post(post_id: str, req: ReportContentRequest, current_user: Optional[dict] = Depends(get_optional_current_user)):
     actor = resolve_bound_actor_id(req.actor_id, current_user=current_user, allow_guest=True)
-    result = db.report_post(
+    result = await adb.report_post(
         post_id=post_id,
         actor_id=actor,
         reason=normalize_report_reason(req.reason),
         detail=(req.detail or "").strip()
     )
     if result is None:
-        if _post_exists(post_id):
+        if await _post_exists(post_id):
             raise HTTPException(status_code=500, detail="report_post failed due to persistence error")
         raise HTTPException(status_code=404, detail="Post not found")
     return {"status": "success", **result}
@@ -1282,7 +1456,7 @@ async def report_post(post_id: str, req: ReportContentRequest, current_user: Opt
 @app.post("/api/community/posts/{post_id}/comments/{comment_id}/report")
 async def report_comment(post_id: str, comment_id: str, req: ReportContentRequest, current_user: Optional[dict] = Depends(get_optional_current_user)):
     actor = resolve_bound_actor_id(req.actor_id, current_user=current_user, allow_guest=True)
-    result = db.report_comment(
+    result = await adb.report_comment(
         post_id=post_id,
         comment_id=comment_id,
         actor_id=actor,
@@ -1290,7 +1464,7 @@ async def report_comment(post_id: str, comment_id: str, req: ReportContentReques
         detail=(req.detail or "").strip()
     )
     if result is None:
-        if _comment_exists(post_id, comment_id):
+        if await _comment_exists(post_id, comment_id):
             raise HTTPException(status_code=500, detail="report_comment failed due to persistence error")
         raise HTTPException(status_code=404, detail="Post or comment not found")
     return {"status": "success", **result}
@@ -1299,12 +1473,13 @@ async def report_comment(post_id: str, comment_id: str, req: ReportContentReques
 @app.delete("/api/community/posts/{post_id}")
 async def delete_post(post_id: str, req: DeletePostRequest, current_user: Optional[dict] = Depends(get_optional_current_user)):
     actor = resolve_bound_actor_id(req.actor_id, current_user=current_user, allow_guest=True)
-    posts = db.get_posts()
-    target_post = next((p for p in posts if str(p.get("id") or "") == str(post_id)), None)
+    target_post = await adb.get_post(post_id, projection=["owner_actor", "author", "author_username"])
     if not target_post:
         logger.info("community_delete denied: post_not_found post_id=%s actor=%s", post_id, actor)
         raise HTTPException(status_code=404, detail="Post not found")
-    delete_eval = evaluate_post_delete_permission(target_post, actor, current_user=current_user)
+    needs_role = actor_username(actor) and not (current_user or {}).get("role")
+    roles = await resolve_user_roles([actor_username(actor)]) if needs_role else {}
+    delete_eval = evaluate_post_delete_permission(target_post, actor, current_user=current_user, roles=roles)
     if not delete_eval["allowed"]:
         logger.info(
             "community_delete denied: actor=%s role=%s owner_actor=%s post_author_username=%s post_author=%s reason=%s",
@@ -1325,49 +1500,100 @@ async def delete_post(post_id: str, req: DeletePostRequest, current_user: Option
         delete_eval.get("owner_actor") or "",
         delete_eval.get("reason") or "owner_actor_match",
     )
-    write_result = db.delete_post(post_id)
+    write_result = await adb.delete_post(post_id)
     raise_for_db_write_result(write_result, action="delete_post")
+    community_events.publish("post_deleted", {"post_id": post_id})
     return {"status": "success", "post_id": post_id}
 
 
+@app.get("/api/community/stream")
+async def community_stream(request: Request):
+    """
+    Server-Sent Events: post_created, comment_added, like_changed, post_pinned, post_deleted.
+    A `resync` event means events were dropped (slow client or stale Last-Event-ID) and the
+    feed should be refetched.
+    """
+    subscriber = community_events.subscribe(str(request.headers.get("last-event-id") or "").strip() or None)
+    return StreamingResponse(
+        community_events.stream(subscriber, is_disconnected=request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/api/community/reports")
-async def get_community_reports(current_user: dict = Depends(get_admin_user)):
-    return {"reports": db.get_community_reports()}
+async def get_community_reports(
+    status: str = "open",
+    reason: Optional[str] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_admin_user),
+):
+    # Newest first from the moderation queue; status=all lists every report, next_cursor pages on.
+    try:
+        reports, next_cursor = await adb.query_community_reports(
+            status=status,
+            reason=reason or "",
+            limit=max(1, min(int(limit), 200)),
+            cursor=str(cursor or "").strip(),
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor không hợp lệ")
+    for entry in reports:
+        entry.pop("actor_id", None)
+    return {"reports": reports, "next_cursor": next_cursor}
 
 @app.post("/api/community/admin/repair-ownership")
 async def repair_community_ownership(
     req: CommunityOwnershipRepairRequest,
     current_user: dict = Depends(get_admin_user),
 ):
-    result = db.repair_post_ownership(dry_run=bool(req.dry_run), limit=int(req.limit))
+    result = await adb.repair_post_ownership(dry_run=bool(req.dry_run), limit=int(req.limit))
     if not result.get("ok"):
         raise HTTPException(status_code=500, detail=f"Ownership repair failed: {result.get('reason', 'unknown_error')}")
     return result
 
 
+@app.post("/api/community/admin/rebuild-indexes")
+async def rebuild_community_indexes(current_user: dict = Depends(get_admin_user)):
+    # Rebuilds this worker's in-memory indexes; returns post counts and TF-IDF memory use.
+    return await adb.rebuild_search_index()
+
+
+@app.get("/api/community/admin/index-stats")
+async def get_community_index_stats(current_user: dict = Depends(get_admin_user)):
+    return await adb.community_index_stats()
+
+
 @app.get("/api/community/metrics")
-async def get_community_metrics():
-    return db.get_community_metrics()
+async def get_community_metrics(request: Request, response: Response):
+    # The 7/30-day windows move with the clock, not only with writes.
+    not_modified = await conditional_get(request, response, ["posts"], extra=datetime.now().date().isoformat())
+    if not_modified is not None:
+        return not_modified
+    return await adb.get_community_metrics()
 
 
 @app.get("/api/community/suggestions", response_model=List[CommunitySuggestionsResponse])
 async def get_community_suggestions(
+    request: Request,
+    response: Response,
     riasec: Optional[str] = None,
     limit: int = 4
 ):
-    posts = db.get_posts()
+    not_modified = await conditional_get(request, response, ["posts", "users"])
+    if not_modified is not None:
+        return not_modified
+    posts = await adb.get_posts()
     preferred_categories = derive_suggestion_categories_from_riasec(riasec)
     preferred_set = set(preferred_categories)
 
     scored = []
     for post in posts:
         category = normalize_community_category(post.get("category"))
-        comments = post.get("comments") or []
-        comments_count = len(comments) if isinstance(comments, list) else 0
+        comments_count = stored_counter(post, "comments_count", "comments")
         likes_count = int(post.get("likes_count") or 0)
         is_pinned = bool(post.get("is_pinned"))
-        derived_role = resolve_user_role(post.get("author_username"))
-        author_role = derived_role if derived_role in {"admin", "mentor"} else "user"
         score = 0.0
         if category in preferred_set:
             score += 8.0
@@ -1380,18 +1606,24 @@ async def get_community_suggestions(
             "id": str(post.get("id") or ""),
             "title": str(post.get("title") or "Bài viết cộng đồng"),
             "author": str(post.get("author") or "Ẩn danh"),
-            "author_role": author_role,
+            "author_role": "user",
             "category": category,
             "timestamp": str(post.get("timestamp") or ""),
             "comments_count": comments_count,
             "likes_count": likes_count,
             "is_pinned": is_pinned,
             "_score": score,
+            "_author_username": post.get("author_username"),
         })
 
     scored.sort(key=lambda p: (p["_score"], p["timestamp"]), reverse=True)
     safe_limit = max(1, min(int(limit), 8))
-    return [{k: v for k, v in item.items() if k != "_score"} for item in scored[:safe_limit]]
+    top = scored[:safe_limit]
+    # Roles are only needed for the posts actually returned.
+    roles = await resolve_user_roles([item["_author_username"] for item in top])
+    for item in top:
+        item["author_role"] = roles.get(str(item["_author_username"] or "").strip(), "user")
+    return [{k: v for k, v in item.items() if not k.startswith("_")} for item in top]
 
 
 @app.get("/api/community/related", response_model=List[RelatedPostResponse])
@@ -1402,13 +1634,7 @@ async def get_related_posts(
     riasec: Optional[str] = None,
     limit: int = 5,
 ):
-    posts = db.get_posts()
-    base_post = None
-    if post_id:
-        for post in posts:
-            if str(post.get("id") or "") == post_id:
-                base_post = post
-                break
+    base_post = await adb.get_post(post_id, projection=["title", "content", "category"]) if post_id else None
 
     base_title = str((base_post or {}).get("title") or "")
     base_content = str((base_post or {}).get("content") or "")
@@ -1417,32 +1643,30 @@ async def get_related_posts(
     query_tokens = extract_semantic_tokens(query_text)
     preferred_categories = set(derive_suggestion_categories_from_riasec(riasec))
 
+    base_id = str((base_post or {}).get("id") or "")
+    if query_tokens:
+        # LSH narrows the field to near neighbours of the query; BM25 re-ranks just those.
+        candidates = await adb.retrieve_similar_posts(query_tokens, exclude_id=base_id, projection=RETRIEVAL_FIELDS)
+    else:
+        candidates = [(post, 0.0) for post in await adb.get_posts() if str(post.get("id") or "") != base_id]
+
     scored = []
-    for post in posts:
+    for post, semantic in candidates:
         pid = str(post.get("id") or "")
-        if base_post and pid == str(base_post.get("id") or ""):
-            continue
         p_title = str(post.get("title") or "")
-        p_content = str(post.get("content") or "")
         p_category = normalize_community_category(post.get("category"))
-        p_tokens = extract_semantic_tokens(f"{p_title} {p_content}")
-        semantic = semantic_overlap_score(query_tokens, p_tokens)
-        comments = post.get("comments") or []
-        comments_count = len(comments) if isinstance(comments, list) else 0
+        comments_count = stored_counter(post, "comments_count", "comments")
         likes_count = int(post.get("likes_count") or 0)
-
-        score = semantic * 10.0
-        if base_category and p_category == base_category:
-            score += 2.0
-        if p_category in preferred_categories:
-            score += 1.5
-        score += min(2.0, comments_count * 0.2)
-        score += min(1.5, likes_count * 0.1)
-        if bool(post.get("is_pinned")):
-            score += 1.0
-
-        if query_tokens and semantic <= 0:
-            continue
+        score = retrieval_score(
+            semantic,
+            10.0,
+            p_category,
+            comments_count,
+            likes_count,
+            bool(post.get("is_pinned")),
+            preferred_categories,
+            base_category,
+        )
         scored.append({
             "id": pid,
             "title": p_title or "Bài viết cộng đồng",
@@ -1465,28 +1689,27 @@ async def ask_community_rag(req: CommunityRagAskRequest):
     if len(question) < 4:
         raise HTTPException(status_code=400, detail="Question is too short")
 
-    posts = db.get_posts()
     q_tokens = extract_semantic_tokens(question)
     preferred_categories = set(derive_suggestion_categories_from_riasec(req.riasec))
+    if q_tokens:
+        # Text relevance picks a candidate pool; the community boosts below re-rank it.
+        candidates = await adb.retrieve_top_posts(q_tokens, RAG_CANDIDATE_POOL, projection=RETRIEVAL_FIELDS)
+    else:
+        candidates = [(post, 0.0) for post in await adb.get_posts()]
     scored = []
-    for post in posts:
+    for post, semantic in candidates:
         title = str(post.get("title") or "")
         content = str(post.get("content") or "")
         category = normalize_community_category(post.get("category"))
-        base_tokens = extract_semantic_tokens(f"{title} {content}")
-        semantic = semantic_overlap_score(q_tokens, base_tokens)
-        if q_tokens and semantic <= 0:
-            continue
-        comments = post.get("comments") or []
-        comments_count = len(comments) if isinstance(comments, list) else 0
-        likes_count = int(post.get("likes_count") or 0)
-        score = semantic * 12.0
-        if category in preferred_categories:
-            score += 1.5
-        score += min(2.0, comments_count * 0.2)
-        score += min(1.5, likes_count * 0.1)
-        if bool(post.get("is_pinned")):
-            score += 1.0
+        score = retrieval_score(
+            semantic,
+            12.0,
+            category,
+            stored_counter(post, "comments_count", "comments"),
+            int(post.get("likes_count") or 0),
+            bool(post.get("is_pinned")),
+            preferred_categories,
+        )
         scored.append({
             "post_id": str(post.get("id") or ""),
             "title": title or "Bài viết cộng đồng",
@@ -1527,11 +1750,12 @@ async def ask_community_rag(req: CommunityRagAskRequest):
 
 @app.post("/api/community/posts/{post_id}/pin")
 async def toggle_post_pin(post_id: str, req: TogglePinRequest, current_user: dict = Depends(get_admin_user)):
-    result = db.set_post_pin(post_id=post_id, pinned=req.pinned)
+    result = await adb.set_post_pin(post_id=post_id, pinned=req.pinned)
     if result is None:
-        if _post_exists(post_id):
+        if await _post_exists(post_id):
             raise HTTPException(status_code=500, detail="set_post_pin failed due to persistence error")
         raise HTTPException(status_code=404, detail="Post not found")
+    community_events.publish("post_pinned", {"post_id": post_id, **result})
     return {"status": "success", **result}
 
 # ================== HELPERS ==================
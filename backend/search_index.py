@@ -0,0 +1,273 @@
+import bisect
+import threading
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+try:
+    from .text_search import post_search_tokens, search_tokens, stored_token_vector
+except ImportError:
+    from text_search import post_search_tokens, search_tokens, stored_token_vector
+
+
+class ReconciledPostIndex:
+    """
+    Base of the in-memory, per-process indexes over community posts. Posts are added/removed as
+    they are created/deleted in this process; PostIndexSync replays what other processes wrote
+    whenever the posts collection version moves. invalidate() forces a full rebuild (bulk
+    rewrites that change post text in place).
+
+    Subclasses implement _prepare (post -> (post_id, entry), the expensive text work, done
+    outside the lock), _reset, _insert and _delete.
+    """
+
+    def __init__(self, load_posts: Callable[[], Iterable[Dict[str, Any]]]):
+        self.load_posts = load_posts
+        self._lock = threading.RLock()
+        self._built = False
+        # Every indexed post id, whether or not its entry had anything to index.
+        self._ids: Set[str] = set()
+        # Adds/removes made while a rebuild reads the store, replayed once it finishes.
+        self._pending: Optional[List[Tuple[str, Any]]] = None
+
+    def _prepare(self, post: Dict[str, Any]) -> Tuple[str, Any]:
+        raise NotImplementedError
+
+    def _reset(self, entries: Dict[str, Any]):
+        """Replace the whole index with `entries` (post_id -> prepared entry)."""
+        raise NotImplementedError
+
+    def _insert(self, post_id: str, entry: Any):
+        raise NotImplementedError
+
+    def _delete(self, post_id: str):
+        raise NotImplementedError
+
+    def is_stale(self) -> bool:
+        with self._lock:
+            return not self._built
+
+    def invalidate(self):
+        with self._lock:
+            self._built = False
+
+    def ensure_built(self):
+        if self.is_stale():
+            self.rebuild()
+
+    def indexed_ids(self) -> Set[str]:
+        with self._lock:
+            return set(self._ids)
+
+    def rebuild(self, posts: Optional[Iterable[Dict[str, Any]]] = None):
+        """Rebuild from `posts`, or from load_posts() when not given."""
+        with self._lock:
+            self._pending = []
+        try:
+            posts = self.load_posts() if posts is None else posts
+            entries = dict(
+                self._prepare(post) for post in posts if isinstance(post, dict) and post.get("id")
+            )
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            pending, self._pending = self._pending or [], None
+            self._reset(entries)
+            self._ids = set(entries)
+            self._built = True
+            for post_id, entry in pending:
+                self._apply(post_id, entry)
+
+    def _apply(self, post_id: str, entry: Any):
+        self._delete(post_id)
+        if entry is None:
+            self._ids.discard(post_id)
+        else:
+            self._insert(post_id, entry)
+            self._ids.add(post_id)
+
+    def add(self, post: Dict[str, Any]):
+        if not post.get("id"):
+            return
+        post_id, entry = self._prepare(post)
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((post_id, entry))
+            if self._built:
+                self._apply(post_id, entry)
+
+    def remove(self, post_id: str):
+        post_id = str(post_id or "")
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((post_id, None))
+            if self._built:
+                self._apply(post_id, None)
+
+
+class PostIndexSync:
+    """
+    Keeps a set of ReconciledPostIndex in step with the posts collection across processes.
+    sync() compares the collection version with the one the indexes were last brought up to;
+    when it moved, the stored post ids are diffed against each index and only the posts that
+    appeared or disappeared are loaded or dropped. Post text is immutable after creation
+    (likes, comments and reports move the version without touching it), so the id diff is
+    a complete replay; bulk rewrites of post text invalidate the indexes instead.
+    """
+
+    def __init__(
+        self,
+        indexes: Callable[[], Iterable[ReconciledPostIndex]],
+        load_version: Callable[[], Optional[str]],
+        load_posts: Callable[[], Iterable[Dict[str, Any]]],
+        load_ids: Callable[[], Iterable[str]],
+        load_posts_by_ids: Callable[[List[str]], Iterable[Dict[str, Any]]],
+    ):
+        self.indexes = indexes
+        self.load_version = load_version
+        self.load_posts = load_posts
+        self.load_ids = load_ids
+        self.load_posts_by_ids = load_posts_by_ids
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+
+    def sync(self):
+        # Read before the ids, so a write landing in between only causes one more sync later.
+        version = self.load_version()
+        with self._lock:
+            indexes = list(self.indexes())
+            stale = [index for index in indexes if index.is_stale()]
+            moved = version is None or version != self._version
+            if stale:
+                # One read of the store for every index that needs a full build.
+                posts = list(self.load_posts())
+                for index in stale:
+                    index.rebuild(posts)
+            current = [index for index in indexes if index not in stale]
+            if moved and current:
+                self._replay(current)
+            self._version = version
+
+    def _replay(self, indexes: List[ReconciledPostIndex]):
+        stored = {str(post_id) for post_id in self.load_ids() if post_id}
+        missing: Dict[ReconciledPostIndex, Set[str]] = {}
+        for index in indexes:
+            indexed = index.indexed_ids()
+            for post_id in indexed - stored:
+                index.remove(post_id)
+            missing[index] = stored - indexed
+        wanted = sorted(set().union(*missing.values()))
+        if not wanted:
+            return
+        for post in self.load_posts_by_ids(wanted):
+            post_id = str(post.get("id") or "")
+            for index in indexes:
+                if post_id in missing[index]:
+                    index.add(post)
+
+    def rebuild(self):
+        """Full rebuild of every index, recorded as in sync with the version read beforehand."""
+        version = self.load_version()
+        with self._lock:
+            posts = list(self.load_posts())
+            for index in self.indexes():
+                index.rebuild(posts)
+            self._version = version
+
+    def written(self, version: Optional[str]):
+        """
+        After a posts write made by this process (and already applied to the indexes), with the
+        counter value that write produced: when that is exactly one step past the synced
+        version, it was the only change since and the next sync() has nothing to replay.
+        """
+        with self._lock:
+            if self._version is not None and version is not None and int(version) == int(self._version) + 1:
+                self._version = version
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+            for index in self.indexes():
+                index.invalidate()
+
+
+class PostSearchIndex(ReconciledPostIndex):
+    """
+    Inverted index for community keyword search: diacritic-folded word -> ids of the posts
+    containing it, plus the sorted vocabulary so a query word can be expanded to every indexed
+    word it prefixes with two bisects. A query matches the posts that contain, for each of its
+    words, some word starting with it. Cost follows the matching postings, not the corpus.
+    """
+
+    def __init__(self, load_posts: Callable[[], Iterable[Dict[str, Any]]]):
+        super().__init__(load_posts)
+        self._postings: Dict[str, Set[str]] = {}
+        self._doc_tokens: Dict[str, FrozenSet[str]] = {}
+        self._vocabulary: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._doc_tokens)
+
+    def _prepare(self, post: Dict[str, Any]) -> Tuple[str, FrozenSet[str]]:
+        vector = stored_token_vector(post)
+        words = vector["words"] if vector is not None else post_search_tokens(post)
+        return str(post.get("id") or ""), frozenset(words)
+
+    def _reset(self, entries: Dict[str, FrozenSet[str]]):
+        postings: Dict[str, Set[str]] = {}
+        for post_id, tokens in entries.items():
+            for token in tokens:
+                postings.setdefault(token, set()).add(post_id)
+        self._postings, self._doc_tokens = postings, entries
+        self._vocabulary = sorted(postings)
+
+    def _insert(self, post_id: str, tokens: FrozenSet[str]):
+        self._doc_tokens[post_id] = tokens
+        for token in tokens:
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = set()
+                bisect.insort(self._vocabulary, token)
+            posting.add(post_id)
+
+    def _delete(self, post_id: str):
+        for token in self._doc_tokens.pop(post_id, ()):
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            posting.discard(post_id)
+            if not posting:
+                del self._postings[token]
+                idx = bisect.bisect_left(self._vocabulary, token)
+                if idx < len(self._vocabulary) and self._vocabulary[idx] == token:
+                    del self._vocabulary[idx]
+
+    def _prefix_matches(self, prefix: str) -> Set[str]:
+        vocabulary = self._vocabulary
+        lo = bisect.bisect_left(vocabulary, prefix)
+        # Every word starting with `prefix` sorts before prefix + the highest code point.
+        hi = bisect.bisect_left(vocabulary, prefix + "\U0010ffff", lo)
+        if hi - lo == 1:
+            return set(self._postings[vocabulary[lo]])
+        matched: Set[str] = set()
+        for word in vocabulary[lo:hi]:
+            matched.update(self._postings[word])
+        return matched
+
+    def search(self, keyword: str) -> Optional[Set[str]]:
+        """
+        Ids of the posts matching an already-folded keyword (see normalize_text_search), or None
+        when it has no words to look up (punctuation only), which the caller answers by scanning.
+        """
+        words = sorted(set(search_tokens(keyword)), key=len, reverse=True)
+        if not words:
+            return None
+        self.ensure_built()
+        with self._lock:
+            # Longest words first: usually the fewest postings, so the intersection shrinks fast.
+            matched = self._prefix_matches(words[0])
+            for word in words[1:]:
+                if not matched:
+                    break
+                matched &= self._prefix_matches(word)
+            return matched
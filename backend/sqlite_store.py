@@ -0,0 +1,421 @@
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Each collection keeps the full record as JSON in `doc`; the other columns exist to be indexed.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    timestamp TEXT NOT NULL DEFAULT '',
+    category TEXT NOT NULL DEFAULT 'general',
+    is_pinned INTEGER NOT NULL DEFAULT 0,
+    comments_count INTEGER NOT NULL DEFAULT 0,
+    doc TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS users (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL UNIQUE,
+    doc TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS submissions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    time TEXT NOT NULL DEFAULT '',
+    doc TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS vr_jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    doc TEXT NOT NULL
+);
+
+-- Moderation queue: one row per (post, comment, reporter), kept in step with the reports on posts.
+CREATE TABLE IF NOT EXISTS community_reports (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    status TEXT NOT NULL DEFAULT 'open',
+    reason TEXT NOT NULL DEFAULT '',
+    post_id TEXT NOT NULL DEFAULT '',
+    timestamp TEXT NOT NULL DEFAULT '',
+    doc TEXT NOT NULL
+);
+
+-- Per-table write counters, bumped in the same transaction as the write (used for ETags).
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# Columns added after a table was first shipped: (table, column, definition, backfill expression).
+COLUMN_MIGRATIONS = [
+    (
+        "posts",
+        "comments_count",
+        "INTEGER NOT NULL DEFAULT 0",
+        "COALESCE(json_extract(doc, '$.comments_count'), json_array_length(doc, '$.comments'), 0)",
+    ),
+]
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_posts_timestamp ON posts (timestamp);
+CREATE INDEX IF NOT EXISTS idx_posts_category_timestamp ON posts (category, timestamp);
+CREATE INDEX IF NOT EXISTS idx_posts_feed_order ON posts (is_pinned, timestamp);
+CREATE INDEX IF NOT EXISTS idx_posts_category_feed_order ON posts (category, is_pinned, timestamp);
+CREATE INDEX IF NOT EXISTS idx_posts_most_commented ON posts (is_pinned, comments_count, timestamp);
+CREATE INDEX IF NOT EXISTS idx_submissions_time ON submissions (time);
+CREATE INDEX IF NOT EXISTS idx_reports_queue ON community_reports (timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_reports_status_queue ON community_reports (status, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_reports_status_reason_queue ON community_reports (status, reason, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_reports_post ON community_reports (post_id);
+"""
+
+
+def _text(value: Any) -> str:
+    return str(value or "")
+
+
+def _keyset_clause(order: List[Tuple[str, Any]], after: List[Any]) -> Tuple[str, List[Any]]:
+    """WHERE fragment for the rows strictly after `after` in `order`: one OR branch per sort key."""
+    values = [int(v) if isinstance(v, bool) else v for v in after]
+    branches, params = [], []
+    for idx, (column, direction) in enumerate(order):
+        terms = [f"{prev} = ?" for prev, _ in order[:idx]]
+        terms.append(f"{column} {'>' if direction > 0 else '<'} ?")
+        branches.append(f"({' AND '.join(terms)})")
+        params.extend(values[: idx + 1])
+    return f"({' OR '.join(branches)})", params
+
+
+def _order_by(order: List[Tuple[str, int]]) -> str:
+    return ", ".join(f"{column} {'ASC' if direction > 0 else 'DESC'}" for column, direction in order)
+
+
+def _comments_count(record: Dict[str, Any]) -> int:
+    stored = record.get("comments_count")
+    if isinstance(stored, int):
+        return stored
+    comments = record.get("comments")
+    return len(comments) if isinstance(comments, list) else 0
+
+
+class SQLiteCollection:
+    """
+    One table behind the same interface as local_store.JournalCollection
+    (all/get/insert/update/delete/replace_all), so Database's local code paths work unchanged.
+    """
+
+    def __init__(
+        self,
+        store: "SQLiteStore",
+        table: str,
+        key_field: Optional[str],
+        columns: Dict[str, Callable[[Dict[str, Any]], Any]],
+    ):
+        self.store = store
+        self.table = table
+        self.key_field = key_field
+        # column name -> extractor from the record; the key column is always part of it.
+        self.columns = columns
+        self._cache_lock = threading.Lock()
+        self._cache_version: Optional[int] = None
+        self._cache: List[Dict[str, Any]] = []
+        self._last_write = threading.local()
+
+    def _row_values(self, record: Dict[str, Any]) -> List[Any]:
+        return [extract(record) for extract in self.columns.values()] + [json.dumps(record, ensure_ascii=False)]
+
+    def all(self) -> List[Dict[str, Any]]:
+        # Every write bumps the table's meta version in its own transaction, whichever process or
+        # connection made it. Reading that version and the rows in one read transaction keeps the
+        # cached rows and the version they are tagged with from the same snapshot.
+        with self._cache_lock:
+            conn = self.store.connection()
+            conn.execute("BEGIN")
+            try:
+                version = self.version()
+                if version != self._cache_version:
+                    rows = conn.execute(f"SELECT doc FROM {self.table} ORDER BY seq").fetchall()
+                    self._cache = [json.loads(row[0]) for row in rows]
+                    self._cache_version = version
+            finally:
+                conn.execute("COMMIT")
+            return self._cache
+
+    def version(self) -> int:
+        row = self.store.connection().execute("SELECT version FROM meta WHERE name = ?", (self.table,)).fetchone()
+        return int(row[0]) if row else 0
+
+    def change_version(self) -> int:
+        """Same counter as version(): bumped by one in every write transaction, from any process."""
+        return self.version()
+
+    def last_write_version(self) -> Optional[int]:
+        """The version this thread's last write committed, if it changed anything; then cleared."""
+        version, self._last_write.version = getattr(self._last_write, "version", None), None
+        return version
+
+    def _bump_version(self, conn: sqlite3.Connection) -> int:
+        conn.execute(
+            "INSERT INTO meta (name, version) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET version = version + 1",
+            (self.table,),
+        )
+        row = conn.execute("SELECT version FROM meta WHERE name = ?", (self.table,)).fetchone()
+        return int(row[0])
+
+    def get(self, key: Any) -> Optional[Dict[str, Any]]:
+        row = self.store.connection().execute(
+            f"SELECT doc FROM {self.table} WHERE {self.key_field} = ?", (_text(key),)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def insert(self, record: Dict[str, Any]) -> bool:
+        names = list(self.columns.keys()) + ["doc"]
+        placeholders = ", ".join("?" for _ in names)
+        verb = "INSERT OR IGNORE" if self.key_field else "INSERT"
+        self._last_write.version = None
+        bumped = None
+        with self.store.transaction() as conn:
+            cursor = conn.execute(
+                f"{verb} INTO {self.table} ({', '.join(names)}) VALUES ({placeholders})",
+                self._row_values(record),
+            )
+            if cursor.rowcount > 0:
+                bumped = self._bump_version(conn)
+        # Recorded once committed: a rolled-back version may be reused by the next writer.
+        self._last_write.version = bumped
+        return bumped is not None
+
+    def update(self, key: Any, mutate: Callable[[Dict[str, Any]], Tuple[Optional[Dict[str, Any]], Any]]) -> Any:
+        self._last_write.version = None
+        bumped = None
+        with self.store.transaction() as conn:
+            row = conn.execute(
+                f"SELECT doc FROM {self.table} WHERE {self.key_field} = ?", (_text(key),)
+            ).fetchone()
+            if row is None:
+                return None
+            current = json.loads(row[0])
+            changes, result = mutate(current)
+            if changes:
+                record = {**current, **changes}
+                assignments = ", ".join(f"{name} = ?" for name in list(self.columns.keys()) + ["doc"])
+                conn.execute(
+                    f"UPDATE {self.table} SET {assignments} WHERE {self.key_field} = ?",
+                    self._row_values(record) + [_text(key)],
+                )
+                bumped = self._bump_version(conn)
+        self._last_write.version = bumped
+        return result
+
+    def delete(self, key: Any) -> bool:
+        self._last_write.version = None
+        bumped = None
+        with self.store.transaction() as conn:
+            cursor = conn.execute(f"DELETE FROM {self.table} WHERE {self.key_field} = ?", (_text(key),))
+            if cursor.rowcount > 0:
+                bumped = self._bump_version(conn)
+        self._last_write.version = bumped
+        return bumped is not None
+
+    def replace_all(self, records: List[Dict[str, Any]]):
+        names = list(self.columns.keys()) + ["doc"]
+        placeholders = ", ".join("?" for _ in names)
+        verb = "INSERT OR IGNORE" if self.key_field else "INSERT"
+        with self.store.transaction() as conn:
+            conn.execute(f"DELETE FROM {self.table}")
+            conn.executemany(
+                f"{verb} INTO {self.table} ({', '.join(names)}) VALUES ({placeholders})",
+                [self._row_values(record) for record in records if isinstance(record, dict)],
+            )
+            self._bump_version(conn)
+
+    def count(self) -> int:
+        return int(self.store.connection().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0])
+
+
+class SQLiteStore:
+    """SQLite database in WAL mode: one writer at a time, readers never blocked. One connection per thread."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self.connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        self._migrate_columns(conn)
+        conn.executescript(INDEXES)
+
+        self.posts = SQLiteCollection(self, "posts", "id", {
+            "id": lambda r: _text(r.get("id")),
+            "timestamp": lambda r: _text(r.get("timestamp")),
+            "category": lambda r: _text(r.get("category")).strip().lower() or "general",
+            "is_pinned": lambda r: 1 if r.get("is_pinned") else 0,
+            "comments_count": _comments_count,
+        })
+        self.users = SQLiteCollection(self, "users", "username", {
+            "username": lambda r: _text(r.get("username")),
+        })
+        self.submissions = SQLiteCollection(self, "submissions", None, {
+            "time": lambda r: _text(r.get("time")),
+        })
+        self.vr_jobs = SQLiteCollection(self, "vr_jobs", "id", {
+            "id": lambda r: _text(r.get("id")),
+        })
+        self.community_reports = SQLiteCollection(self, "community_reports", "id", {
+            "id": lambda r: _text(r.get("id")),
+            "status": lambda r: _text(r.get("status")) or "open",
+            "reason": lambda r: _text(r.get("reason")),
+            "post_id": lambda r: _text(r.get("post_id")),
+            "timestamp": lambda r: _text(r.get("timestamp")),
+        })
+
+    @staticmethod
+    def _migrate_columns(conn: sqlite3.Connection):
+        for table, column, definition, backfill in COLUMN_MIGRATIONS:
+            existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+            if column in existing:
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+                conn.execute(f"UPDATE {table} SET {column} = {backfill}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            logger.info(f"SQLite: added {table}.{column}")
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=10, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    def post_ids(self) -> List[str]:
+        return [str(row[0]) for row in self.connection().execute("SELECT id FROM posts").fetchall()]
+
+    def query_posts(
+        self,
+        category: str,
+        order: List[Tuple[str, int]],
+        limit: int,
+        offset: int,
+        after: Optional[List[Any]] = None,
+        ids: Optional[Iterable[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        One feed page straight from the feed-order indexes; only the page's documents are parsed.
+        `order` is a list of (column, 1 | -1); `after` holds the order values of the last post
+        already served, turning the page into a keyset range instead of an OFFSET scan. `ids`
+        restricts the page to those posts (keyword search matches), passed as one JSON parameter.
+        """
+        clauses, params = (["category = ?"], [category]) if category else ([], [])
+        if ids is not None:
+            clauses.append("id IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps(sorted(ids)))
+        if after is not None:
+            clause, clause_params = _keyset_clause(order, after)
+            clauses.append(clause)
+            params.extend(clause_params)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self.connection().execute(
+            f"SELECT doc FROM posts {where} ORDER BY {_order_by(order)} LIMIT ? OFFSET ?",
+            params + [int(limit), int(offset)],
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def query_reports(
+        self,
+        status: str,
+        reason: str,
+        order: List[Tuple[str, int]],
+        limit: int,
+        after: Optional[List[Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """One moderation-queue page from the (status, reason, timestamp, id) indexes."""
+        clauses, params = [], []
+        for column, value in (("status", status), ("reason", reason)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if after is not None:
+            clause, clause_params = _keyset_clause(order, after)
+            clauses.append(clause)
+            params.extend(clause_params)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self.connection().execute(
+            f"SELECT doc FROM community_reports {where} ORDER BY {_order_by(order)} LIMIT ?",
+            params + [int(limit)],
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def delete_reports_for_post(self, post_id: str) -> int:
+        with self.transaction() as conn:
+            cursor = conn.execute("DELETE FROM community_reports WHERE post_id = ?", (_text(post_id),))
+            if cursor.rowcount > 0:
+                self.community_reports._bump_version(conn)
+            return cursor.rowcount
+
+    def comments_slice(self, post_id: str, before: Optional[int], limit: int) -> Optional[Dict[str, Any]]:
+        """A window of one post's comments via json_each, without parsing the rest of the document."""
+        conn = self.connection()
+        row = conn.execute(
+            "SELECT json_array_length(doc, '$.comments'), json_extract(doc, '$.helpful_comment_id') FROM posts WHERE id = ?",
+            (_text(post_id),),
+        ).fetchone()
+        if row is None:
+            return None
+        total = int(row[0] or 0)
+        stop = total if before is None else min(int(before), total)
+        start = max(0, stop - int(limit))
+        rows = conn.execute(
+            "SELECT c.value FROM posts, json_each(posts.doc, '$.comments') AS c "
+            "WHERE posts.id = ? AND c.key >= ? AND c.key < ? ORDER BY c.key",
+            (_text(post_id), start, stop),
+        ).fetchall()
+        comments = [json.loads(r[0]) for r in rows]
+        return {
+            "comments": [c for c in comments if isinstance(c, dict)],
+            "comments_count": total,
+            "helpful_comment_id": row[1],
+            "start": start,
+        }
+
+    def transaction(self) -> "_Transaction":
+        return _Transaction(self)
+
+    def index_names(self, table: str) -> List[str]:
+        rows = self.connection().execute(f"PRAGMA index_list({table})").fetchall()
+        return sorted(str(row[1]) for row in rows)
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT: takes the write lock up front so read-modify-write cannot race."""
+
+    def __init__(self, store: SQLiteStore):
+        self.store = store
+        self.conn = store.connection()
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        return False
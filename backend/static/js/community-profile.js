@@ -19,7 +19,13 @@ let COMMUNITY_PENDING_DELETE_TIMER = null;
 let COMMUNITY_DELETE_DEBUG = false;
 const COMMUNITY_POST_DELETE_STATUS = {};
 const COMMUNITY_PAGE_SIZE = 12;
+// The feed carries only the newest comments of each post; older ones are fetched on demand.
+const COMMUNITY_COMMENTS_PREVIEW = 3;
+const COMMUNITY_COMMENTS_PAGE_SIZE = 20;
 let COMMUNITY_PAGE_OFFSET = 0;
+// Keyset cursors of the pages visited so far: index i opens page i ('' = first page).
+let COMMUNITY_PAGE_CURSORS = [''];
+let COMMUNITY_NEXT_CURSOR = '';
 let COMMUNITY_HAS_MORE = false;
 let COMMUNITY_PAGE_COUNT = 0;
 let COMMUNITY_PAGE_BUSY = false;
@@ -159,13 +165,15 @@ function goCommunityPrevPage() {
     if (COMMUNITY_PAGE_BUSY) return;
     if (COMMUNITY_PAGE_OFFSET <= 0) return;
     COMMUNITY_PAGE_OFFSET = Math.max(0, COMMUNITY_PAGE_OFFSET - COMMUNITY_PAGE_SIZE);
+    COMMUNITY_PAGE_CURSORS.pop();
     loadPosts();
 }
 
 function goCommunityNextPage() {
     if (COMMUNITY_PAGE_BUSY) return;
-    if (!COMMUNITY_HAS_MORE) return;
+    if (!COMMUNITY_HAS_MORE || !COMMUNITY_NEXT_CURSOR) return;
     COMMUNITY_PAGE_OFFSET += COMMUNITY_PAGE_SIZE;
+    COMMUNITY_PAGE_CURSORS.push(COMMUNITY_NEXT_CURSOR);
     loadPosts();
 }
 
@@ -591,7 +599,7 @@ function renderCommunityPostDetail(post) {
     const isAdmin = String(currentUser?.role || '').toLowerCase() === 'admin';
     const category = String(post.category || 'general').toLowerCase();
     const categoryLabel = COMMUNITY_CATEGORY_LABELS[category] || COMMUNITY_CATEGORY_LABELS.general;
-    const commentsCount = Array.isArray(post.comments) ? post.comments.length : 0;
+    const commentsCount = Number(post.comments_count || (Array.isArray(post.comments) ? post.comments.length : 0));
     const canDelete = Boolean(post.can_delete) || isAdmin || (String(post.owner_actor || '') === getCommunityActorId());
     const commentsHtml = (post.comments || []).map(c => `
         <div class="comment-item">
@@ -670,6 +678,11 @@ function renderCommunityPostDetail(post) {
         </div>
         <div class="post-content">${escapeHtml(post.content)}</div>
         <div class="comment-section">
+          ${post.comments_next_cursor ? `
+            <button class="btn btn-secondary btn-small" onclick="loadOlderComments('${post.id}')">
+              Xem bình luận cũ hơn
+            </button>
+          ` : ''}
           <div class="comment-list" id="comments-${post.id}">
             ${commentsHtml || '<div class="muted">Chưa có bình luận nào.</div>'}
           </div>
@@ -695,6 +708,29 @@ function openCommunityPostDetailModal(postId) {
     updateCommunityProfileLock();
 }
 
+async function loadOlderComments(postId) {
+    const post = getCommunityPostById(postId);
+    if (!post || !post.comments_next_cursor) return;
+    try {
+        const params = new URLSearchParams();
+        params.set('cursor', post.comments_next_cursor);
+        params.set('limit', String(COMMUNITY_COMMENTS_PAGE_SIZE));
+        const res = await fetch(`${API_BASE}/api/community/posts/${postId}/comments?${params.toString()}`);
+        if (!res.ok) throw new Error('Failed to load comments');
+        const page = await res.json();
+        const older = Array.isArray(page?.comments) ? page.comments : [];
+        post.comments = older.concat(Array.isArray(post.comments) ? post.comments : []);
+        post.comments_next_cursor = page?.next_cursor || null;
+        if (COMMUNITY_DETAIL_TARGET_POST_ID === String(post.id)) {
+            const body = $('communityPostDetailBody');
+            if (body) body.innerHTML = renderCommunityPostDetail(post);
+        }
+    } catch (e) {
+        console.error(e);
+        setStatus('communityPostDetailStatus', 'error', 'Không thể tải thêm bình luận.');
+    }
+}
+
 function closeCommunityPostDetailModal() {
     const modal = $('communityPostDetailModal');
     if (!modal) return;
@@ -802,7 +838,26 @@ async function submitCommunityReport() {
     }
 }
 
-async function loadCommunityReportsForAdmin() {
+// Moderation queue paging: cursor of the next page and how many open reports are shown.
+let COMMUNITY_REPORTS_CURSOR = null;
+let COMMUNITY_REPORTS_SHOWN = 0;
+
+function renderCommunityReportItem(r, idx) {
+    return `
+            <div class="community-report-item">
+                <div class="community-report-head">
+                    <strong>#${idx + 1} ${r.type === 'comment' ? 'Bình luận' : 'Bài viết'}</strong>
+                    <span class="muted">${timeAgo(r.timestamp)}</span>
+                </div>
+                <div class="community-report-line">Tiêu đề: ${escapeHtml(r.post_title || 'Không có tiêu đề')}</div>
+                <div class="community-report-line">Tác giả nội dung: ${escapeHtml(r.target_author || 'Ẩn danh')}</div>
+                <div class="community-report-line">Lý do: ${escapeHtml(r.reason || 'other')}</div>
+                <div class="community-report-line">Chi tiết: ${escapeHtml(r.detail || '-')}</div>
+            </div>
+        `;
+}
+
+async function loadCommunityReportsForAdmin(append = false) {
     const role = String(currentUser?.role || '').toLowerCase();
     const listEl = $('communityAdminReportsList');
     if (!listEl) return;
@@ -810,43 +865,165 @@ async function loadCommunityReportsForAdmin() {
         listEl.innerHTML = 'Chỉ Admin mới xem được danh sách báo cáo.';
         return;
     }
+    if (!append) {
+        COMMUNITY_REPORTS_CURSOR = null;
+        COMMUNITY_REPORTS_SHOWN = 0;
+    }
     try {
         setStatus('communityAdminReportsStatus', 'info', 'Đang tải báo cáo...');
-        const res = await fetch(`${API_BASE}/api/community/reports`, {
+        const params = new URLSearchParams({ status: 'open', limit: '30' });
+        if (append && COMMUNITY_REPORTS_CURSOR) params.set('cursor', COMMUNITY_REPORTS_CURSOR);
+        const res = await fetch(`${API_BASE}/api/community/reports?${params.toString()}`, {
             headers: { 'Authorization': `Bearer ${token}` }
         });
         if (!res.ok) throw new Error(`HTTP ${res.status}`);
         const data = await res.json();
         const reports = Array.isArray(data.reports) ? data.reports : [];
-        if (!reports.length) {
+        COMMUNITY_REPORTS_CURSOR = data.next_cursor || null;
+        if (!reports.length && !COMMUNITY_REPORTS_SHOWN) {
             listEl.innerHTML = 'Chưa có báo cáo nào.';
             setStatus('communityAdminReportsStatus', 'success', 'Không có báo cáo mở.');
             return;
         }
-        listEl.innerHTML = reports.slice(0, 30).map((r, idx) => `
-            <div class="community-report-item">
-                <div class="community-report-head">
-                    <strong>#${idx + 1} ${r.type === 'comment' ? 'Bình luận' : 'Bài viết'}</strong>
-                    <span class="muted">${timeAgo(r.timestamp)}</span>
-                </div>
-                <div class="community-report-line">Tiêu đề: ${escapeHtml(r.post_title || 'Không có tiêu đề')}</div>
-                <div class="community-report-line">Tác giả nội dung: ${escapeHtml(r.target_author || 'Ẩn danh')}</div>
-                <div class="community-report-line">Lý do: ${escapeHtml(r.reason || 'other')}</div>
-                <div class="community-report-line">Chi tiết: ${escapeHtml(r.detail || '-')}</div>
-            </div>
-        `).join('');
-        setStatus('communityAdminReportsStatus', 'success', `Đã tải ${reports.length} báo cáo.`);
+        const html = reports.map((r, idx) => renderCommunityReportItem(r, COMMUNITY_REPORTS_SHOWN + idx)).join('');
+        const moreBtn = $('communityAdminReportsMore');
+        if (moreBtn) moreBtn.remove();
+        listEl.innerHTML = (append ? listEl.innerHTML : '') + html;
+        COMMUNITY_REPORTS_SHOWN += reports.length;
+        if (COMMUNITY_REPORTS_CURSOR) {
+            listEl.insertAdjacentHTML('beforeend', `
+            <button id="communityAdminReportsMore" class="btn btn-secondary btn-small" onclick="loadCommunityReportsForAdmin(true)">Tải thêm</button>
+        `);
+        }
+        setStatus('communityAdminReportsStatus', 'success', `Đã tải ${COMMUNITY_REPORTS_SHOWN} báo cáo mở.`);
     } catch (e) {
         setStatus('communityAdminReportsStatus', 'error', 'Không thể tải danh sách báo cáo.');
     }
 }
 
+let COMMUNITY_STREAM = null;
+
+function patchCommunityPost(postId, patch) {
+    const post = getCommunityPostById(postId);
+    if (!post) return false;
+    patch(post);
+    renderCommunityFeedCards();
+    return true;
+}
+
+function handleCommunityStreamEvent(type, data) {
+    if (type === 'like_changed') {
+        patchCommunityPost(data.post_id, (post) => { post.likes_count = Number(data.likes_count || 0); });
+    } else if (type === 'comment_added') {
+        patchCommunityPost(data.post_id, (post) => {
+            const comments = Array.isArray(post.comments) ? post.comments : [];
+            if (comments.some(c => String(c.id) === String(data.comment?.id))) return;
+            post.comments = comments.concat([{ ...data.comment, helpful: false, reports_count: 0 }]);
+            post.comments_count = Number(post.comments_count || 0) + 1;
+        });
+    } else if (type === 'post_pinned') {
+        // Pinning moves the post within the feed order: refetch the current page.
+        if (getCommunityPostById(data.post_id)) loadPosts();
+    } else if (type === 'post_deleted') {
+        const before = COMMUNITY_POST_CACHE.length;
+        COMMUNITY_POST_CACHE = COMMUNITY_POST_CACHE.filter(p => String(p.id) !== String(data.post_id));
+        if (COMMUNITY_POST_CACHE.length !== before) renderCommunityFeedCards();
+    } else if (type === 'post_created' || type === 'resync') {
+        // New posts only show up on the first page; a resync means events were missed.
+        if (type === 'resync' || COMMUNITY_PAGE_CURSORS.length === 1) loadPosts();
+    }
+}
+
+function initCommunityStream() {
+    if (COMMUNITY_STREAM || typeof EventSource === 'undefined') return;
+    COMMUNITY_STREAM = new EventSource(`${API_BASE}/api/community/stream`);
+    ['post_created', 'comment_added', 'like_changed', 'post_pinned', 'post_deleted', 'resync'].forEach((type) => {
+        COMMUNITY_STREAM.addEventListener(type, (event) => {
+            let data = {};
+            try {
+                data = JSON.parse(event.data || '{}');
+            } catch (_) { }
+            handleCommunityStreamEvent(type, data);
+        });
+    });
+}
+
+function renderCommunityFeedCards(container = $('postsContainer')) {
+    if (!container) return;
+    container.innerHTML = COMMUNITY_POST_CACHE.map(post => {
+        const isAdmin = String(currentUser?.role || '').toLowerCase() === 'admin';
+        const category = String(post.category || 'general').toLowerCase();
+        const categoryLabel = COMMUNITY_CATEGORY_LABELS[category] || COMMUNITY_CATEGORY_LABELS.general;
+        const commentsCount = Number(post.comments_count || 0);
+        const excerpt = truncateCommunityText(post.content, 200);
+        const canDelete = Boolean(post.can_delete) || isAdmin || (String(post.owner_actor || '') === getCommunityActorId());
+        const isDeleteConfirm = COMMUNITY_DELETE_STATE === COMMUNITY_DELETE_STATES.ARMED
+            && COMMUNITY_DELETE_TARGET_POST_ID === String(post.id);
+
+        return `
+    <div class="post-card post-card-summary" id="post-${post.id}">
+      <div class="post-header">
+        <div>
+          <div class="post-title">${escapeHtml(post.title || 'Bài viết cộng đồng')}</div>
+          <div class="post-author">${escapeHtml(post.author)} ${renderAuthorBadge(post.author_role)}</div>
+        </div>
+        <div class="post-time">${timeAgo(post.timestamp)}</div>
+      </div>
+      <div class="post-meta-row">
+        <div class="post-badges">
+          ${post.is_pinned ? '<span class="community-pinned-badge">Ghim</span>' : ''}
+        <span class="community-category-badge">${escapeHtml(categoryLabel)}</span>
+      </div>
+        <div class="post-actions-right post-summary-actions">
+          <button class="btn btn-secondary btn-small"
+            onclick="loadViewingRelatedPosts('${post.id}')">
+            Liên quan
+          </button>
+          ${canDelete ? `
+            <button class="post-delete-btn ${isDeleteConfirm ? 'confirm' : ''}"
+              data-post-id="${post.id}"
+              ${COMMUNITY_DELETE_STATE === COMMUNITY_DELETE_STATES.DELETING ? 'disabled' : ''}
+              onclick="requestDeletePost('${post.id}')">
+              ${isDeleteConfirm ? 'Xác nhận xoá' : 'Xoá'}
+            </button>
+          ` : ''}
+          <button class="btn btn-primary btn-small"
+            onclick="openCommunityPostDetailModal('${post.id}')">
+            Xem chi tiết
+          </button>
+        </div>
+      </div>
+      ${canDelete ? renderPostDeleteStatusSlot(post.id) : ''}
+      <div class="post-engagement-row">
+        <span class="post-engagement-item">💬 ${commentsCount} bình luận</span>
+        <span class="post-engagement-item">👍 ${Number(post.likes_count || 0)} hữu ích</span>
+      </div>
+      <div class="post-summary-excerpt">${escapeHtml(excerpt || 'Chưa có nội dung.')}</div>
+    </div>
+  `;
+    }).join('');
+    renderPendingDeleteButtons();
+
+    if (COMMUNITY_DETAIL_TARGET_POST_ID) {
+        const current = getCommunityPostById(COMMUNITY_DETAIL_TARGET_POST_ID);
+        if (current) {
+            const body = $('communityPostDetailBody');
+            if (body) body.innerHTML = renderCommunityPostDetail(current);
+            renderPendingDeleteButtons();
+            updateCommunityProfileLock();
+        } else {
+            closeCommunityPostDetailModal();
+        }
+    }
+}
+
 async function loadPosts(options = {}) {
     const container = $('postsContainer');
     if (!container) return; // Not on community page
     const resetPagination = !!options?.resetPagination;
     if (resetPagination) {
         COMMUNITY_PAGE_OFFSET = 0;
+        COMMUNITY_PAGE_CURSORS = [''];
     }
     if (COMMUNITY_PAGE_BUSY) return;
     COMMUNITY_PAGE_BUSY = true;
@@ -871,14 +1048,16 @@ async function loadPosts(options = {}) {
         params.set('category', COMMUNITY_CATEGORY_FILTER || 'all');
         if ((COMMUNITY_SEARCH || '').trim()) params.set('search', COMMUNITY_SEARCH.trim());
         params.set('actor_id', getCommunityActorId());
-        params.set('limit', String(COMMUNITY_PAGE_SIZE + 1));
-        params.set('offset', String(COMMUNITY_PAGE_OFFSET));
+        params.set('limit', String(COMMUNITY_PAGE_SIZE));
+        params.set('comments_preview', String(COMMUNITY_COMMENTS_PREVIEW));
+        params.set('cursor', COMMUNITY_PAGE_CURSORS[COMMUNITY_PAGE_CURSORS.length - 1] || '');
 
         const res = await fetch(`${API_BASE}/api/community/posts?${params.toString()}`);
         if (!res.ok) throw new Error("Failed to load posts");
         const posts = await res.json();
         const allFetched = Array.isArray(posts) ? posts : [];
-        COMMUNITY_HAS_MORE = allFetched.length > COMMUNITY_PAGE_SIZE;
+        COMMUNITY_NEXT_CURSOR = res.headers.get('X-Next-Cursor') || '';
+        COMMUNITY_HAS_MORE = !!COMMUNITY_NEXT_CURSOR;
         COMMUNITY_POST_CACHE = allFetched.slice(0, COMMUNITY_PAGE_SIZE);
         COMMUNITY_PAGE_COUNT = COMMUNITY_POST_CACHE.length;
         updateCommunityFeedSummary(COMMUNITY_POST_CACHE.length, COMMUNITY_POST_CACHE.length);
@@ -886,6 +1065,7 @@ async function loadPosts(options = {}) {
         if (COMMUNITY_POST_CACHE.length === 0) {
             if (COMMUNITY_PAGE_OFFSET > 0) {
                 COMMUNITY_PAGE_OFFSET = Math.max(0, COMMUNITY_PAGE_OFFSET - COMMUNITY_PAGE_SIZE);
+                if (COMMUNITY_PAGE_CURSORS.length > 1) COMMUNITY_PAGE_CURSORS.pop();
                 COMMUNITY_PAGE_BUSY = false;
                 return loadPosts();
             }
@@ -911,71 +1091,7 @@ async function loadPosts(options = {}) {
             return;
         }
 
-        container.innerHTML = COMMUNITY_POST_CACHE.map(post => {
-            const isAdmin = String(currentUser?.role || '').toLowerCase() === 'admin';
-            const category = String(post.category || 'general').toLowerCase();
-            const categoryLabel = COMMUNITY_CATEGORY_LABELS[category] || COMMUNITY_CATEGORY_LABELS.general;
-            const commentsCount = Array.isArray(post.comments) ? post.comments.length : 0;
-            const excerpt = truncateCommunityText(post.content, 200);
-            const canDelete = Boolean(post.can_delete) || isAdmin || (String(post.owner_actor || '') === getCommunityActorId());
-            const isDeleteConfirm = COMMUNITY_DELETE_STATE === COMMUNITY_DELETE_STATES.ARMED
-                && COMMUNITY_DELETE_TARGET_POST_ID === String(post.id);
-
-            return `
-        <div class="post-card post-card-summary" id="post-${post.id}">
-          <div class="post-header">
-            <div>
-              <div class="post-title">${escapeHtml(post.title || 'Bài viết cộng đồng')}</div>
-              <div class="post-author">${escapeHtml(post.author)} ${renderAuthorBadge(post.author_role)}</div>
-            </div>
-            <div class="post-time">${timeAgo(post.timestamp)}</div>
-          </div>
-          <div class="post-meta-row">
-            <div class="post-badges">
-              ${post.is_pinned ? '<span class="community-pinned-badge">Ghim</span>' : ''}
-            <span class="community-category-badge">${escapeHtml(categoryLabel)}</span>
-          </div>
-            <div class="post-actions-right post-summary-actions">
-              <button class="btn btn-secondary btn-small"
-                onclick="loadViewingRelatedPosts('${post.id}')">
-                Liên quan
-              </button>
-              ${canDelete ? `
-                <button class="post-delete-btn ${isDeleteConfirm ? 'confirm' : ''}"
-                  data-post-id="${post.id}"
-                  ${COMMUNITY_DELETE_STATE === COMMUNITY_DELETE_STATES.DELETING ? 'disabled' : ''}
-                  onclick="requestDeletePost('${post.id}')">
-                  ${isDeleteConfirm ? 'Xác nhận xoá' : 'Xoá'}
-                </button>
-              ` : ''}
-              <button class="btn btn-primary btn-small"
-                onclick="openCommunityPostDetailModal('${post.id}')">
-                Xem chi tiết
-              </button>
-            </div>
-          </div>
-          ${canDelete ? renderPostDeleteStatusSlot(post.id) : ''}
-          <div class="post-engagement-row">
-            <span class="post-engagement-item">💬 ${commentsCount} bình luận</span>
-            <span class="post-engagement-item">👍 ${Number(post.likes_count || 0)} hữu ích</span>
-          </div>
-          <div class="post-summary-excerpt">${escapeHtml(excerpt || 'Chưa có nội dung.')}</div>
-        </div>
-      `;
-        }).join('');
-        renderPendingDeleteButtons();
-
-        if (COMMUNITY_DETAIL_TARGET_POST_ID) {
-            const current = getCommunityPostById(COMMUNITY_DETAIL_TARGET_POST_ID);
-            if (current) {
-                const body = $('communityPostDetailBody');
-                if (body) body.innerHTML = renderCommunityPostDetail(current);
-                renderPendingDeleteButtons();
-                updateCommunityProfileLock();
-            } else {
-                closeCommunityPostDetailModal();
-            }
-        }
+        renderCommunityFeedCards(container);
 
     } catch (err) {
         console.error(err);
@@ -1072,6 +1188,8 @@ async function createPost() {
         });
 
         if (res.ok) {
+            const created = await res.json().catch(() => ({}));
+            const duplicates = Array.isArray(created.possible_duplicates) ? created.possible_duplicates : [];
             // Clear inputs
             titleInput.value = '';
             contentInput.value = '';
@@ -1079,7 +1197,10 @@ async function createPost() {
             loadDraftRelatedPosts();
             // Reload posts
             await loadPosts({ resetPagination: true });
-            setStatus('communityStatus', 'success', 'Đăng bài thành công.');
+            const duplicateNote = duplicates.length
+                ? ` Có ${duplicates.length} bài viết tương tự: ${duplicates.map((d) => `"${d.title}"`).join(', ')}.`
+                : '';
+            setStatus('communityStatus', 'success', `Đăng bài thành công.${duplicateNote}`);
             setStatus('communityComposerQuickStatus', 'success', 'Đăng bài thành công.');
             closeCommunityComposerModal();
         } else {
@@ -21,6 +21,7 @@ window.addEventListener('load', async () => {
         const defName = getDefaultName();
         if (defName && $('postAuthor')) $('postAuthor').value = defName;
         loadPosts();
+        initCommunityStream();
     }
 });
 
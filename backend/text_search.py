@@ -0,0 +1,79 @@
+import re
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set
+
+
+def normalize_text_search(value: Optional[str]) -> str:
+    raw = str(value or "").strip().lower()
+    normalized = "".join(
+        ch for ch in unicodedata.normalize("NFD", raw)
+        if unicodedata.category(ch) != "Mn"
+    )
+    return normalized
+
+
+def post_matches_search(post: Dict[str, Any], keyword: str) -> bool:
+    if not keyword:
+        return True
+    haystack = " ".join([
+        str(post.get("title") or ""),
+        str(post.get("content") or ""),
+        str(post.get("author") or ""),
+        str(post.get("category") or ""),
+    ])
+    return normalize_text_search(haystack).find(keyword) >= 0
+
+
+STOPWORDS_VI = {
+    "va", "la", "cua", "cho", "voi", "nhung", "mot", "nhieu", "nay", "kia",
+    "toi", "ban", "minh", "em", "anh", "chi", "neu", "thi", "ma", "do", "duoc",
+    "khong", "co", "cac", "trong", "tren", "duoi", "ve", "tai", "tu", "den",
+}
+
+# Fields a community keyword search looks at.
+POST_TEXT_FIELDS = ("title", "content", "author", "category")
+_WORD_RE = re.compile(r"\w+")
+
+
+def search_tokens(folded: str) -> List[str]:
+    """Words of an already-folded string (see normalize_text_search); đ, which NFD keeps, reads as d."""
+    return _WORD_RE.findall(folded.replace("đ", "d"))
+
+
+def post_search_tokens(post: Dict[str, Any]) -> Set[str]:
+    return set(search_tokens(normalize_text_search(" ".join(str(post.get(f) or "") for f in POST_TEXT_FIELDS))))
+
+
+def extract_semantic_tokens(text: Optional[str]) -> List[str]:
+    normalized = normalize_text_search(text)
+    tokens = re.findall(r"[a-z0-9]{2,}", normalized)
+    return [tok for tok in tokens if tok not in STOPWORDS_VI]
+
+
+def post_semantic_tokens(post: Dict[str, Any]) -> List[str]:
+    return extract_semantic_tokens(f"{post.get('title') or ''} {post.get('content') or ''}")
+
+
+# Bump when tokenization changes: stored token vectors of another version are recomputed.
+TOKEN_VECTOR_VERSION = 1
+
+
+def token_vector(post: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    A post's text, tokenized once at write time and stored on it as `token_vector`: the
+    retrieval term counts of title + content and the folded keyword-search words.
+    """
+    return {
+        "v": TOKEN_VECTOR_VERSION,
+        "terms": dict(Counter(post_semantic_tokens(post))),
+        "words": sorted(post_search_tokens(post)),
+    }
+
+
+def stored_token_vector(post: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The post's stored token_vector when it is current, else None."""
+    vector = post.get("token_vector")
+    if isinstance(vector, dict) and vector.get("v") == TOKEN_VECTOR_VERSION:
+        return vector
+    return None
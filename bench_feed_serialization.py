@@ -0,0 +1,122 @@
+"""
+Benchmark: serialization share of a 200-post /api/community/posts page.
+
+Mounts three routes on a throwaway FastAPI app that return the same pre-built, normalized
+page: through response_model=List[Post] (validation + serialization), through the trusted
+fast path (fast_json.trusted_response), and as pre-encoded bytes of the same size, which is
+the framework/transport baseline. What is left above the baseline is serialization.
+
+    python bench_feed_serialization.py [--posts 200] [--comments 10] [--rounds 30]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+
+import fast_json
+from fast_json import trusted_response
+from main import Post
+
+
+def build_page(posts: int, comments: int) -> List[dict]:
+    page = []
+    for idx in range(posts):
+        page.append({
+            "id": f"post-{idx}",
+            "title": f"Bài viết số {idx} về ngành công nghệ thông tin",
+            "category": "major",
+            "author": "Nguyễn Văn A",
+            "author_role": "user",
+            "author_username": "nguyenvana",
+            "content": "Mình muốn hỏi về cơ hội việc làm và lộ trình học. " * 8,
+            "timestamp": "2026-01-01T10:00:00",
+            "comments": [
+                {
+                    "id": f"c-{idx}-{c}",
+                    "author": "Trần Thị B",
+                    "author_role": "mentor",
+                    "content": "Bạn nên bắt đầu từ nền tảng toán và lập trình cơ bản.",
+                    "timestamp": "2026-01-02T10:00:00",
+                    "helpful": c == 0,
+                    "reports_count": 0,
+                    "reports": [],
+                }
+                for c in range(comments)
+            ],
+            "comments_count": comments,
+            "likes_count": 12,
+            "liked_by": [f"guest:{n}" for n in range(12)],
+            "liked_by_me": False,
+            "owner_actor": "user:nguyenvana",
+            "helpful_comment_id": f"c-{idx}-0",
+            "can_mark_helpful": False,
+            "reports_count": 0,
+            "reports": [],
+            "is_pinned": idx < 2,
+            "pinned_at": None,
+            "can_delete": False,
+            "can_delete_reason": "owner_mismatch",
+        })
+    return page
+
+
+def timed(client: TestClient, path: str, rounds: int) -> float:
+    client.get(path)  # warm-up
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        response = client.get(path)
+        samples.append(time.perf_counter() - started)
+        assert response.status_code == 200
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--comments", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=30)
+    args = parser.parse_args()
+
+    page = build_page(args.posts, args.comments)
+    app = FastAPI()
+
+    @app.get("/validated", response_model=List[Post])
+    async def validated():
+        return page
+
+    @app.get("/trusted", response_model=List[Post])
+    async def trusted():
+        return trusted_response(page, Post)
+
+    encoded = fast_json.dumps([fast_json.project(item, Post) for item in page])
+
+    @app.get("/baseline")
+    async def baseline():
+        return Response(encoded, media_type="application/json")
+
+    client = TestClient(app)
+    assert json.loads(client.get("/trusted").content) == client.get("/validated").json()
+
+    base = timed(client, "/baseline", args.rounds)
+    encoder = "orjson" if fast_json.orjson is not None else "json (stdlib)"
+    print(f"{args.posts} posts x {args.comments} comments ({len(encoded) // 1024} KiB), "
+          f"median of {args.rounds} requests, encoder: {encoder}")
+    print(f"{'path':<12}{'total ms':>10}{'serialize ms':>14}{'share':>8}")
+    for name in ("validated", "trusted"):
+        total = timed(client, f"/{name}", args.rounds)
+        serialize = max(0.0, total - base)
+        print(f"{name:<12}{total:>10.2f}{serialize:>14.2f}{serialize / total:>8.0%}")
+    print(f"{'baseline':<12}{base:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import sys
+import os
+import time
+
+# Add current directory to path so we can import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from backend.database import db
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def rebuild_community_index():
+    # Indexes live in each server process: this builds them from the store to check the
+    # build time and memory footprint. Use POST /api/community/admin/rebuild-indexes to
+    # rebuild a running server's copy.
+    print(f"Storage: {'mongo' if db.is_mongo else ('sqlite' if getattr(db, 'is_sqlite', False) else 'local')}")
+    started = time.perf_counter()
+    stats = db.rebuild_search_index()
+    elapsed = time.perf_counter() - started
+    print(f"✅ Rebuilt community indexes over {stats['posts']} posts in {elapsed:.2f}s")
+
+    tfidf = stats.get("tfidf")
+    if tfidf is None:
+        print("⚠️ numpy is not installed: community Q&A uses BM25, no TF-IDF matrix was built.")
+        return
+    print(f"TF-IDF: {tfidf['posts']} posts, {tfidf['entries']} entries, {tfidf['features']} hashed features")
+    print(f"  matrix:  {format_bytes(tfidf['matrix_bytes'])}")
+    print(f"  vectors: {format_bytes(tfidf['vector_bytes'])}")
+    print(f"  ids:     {format_bytes(tfidf['id_bytes'])}")
+    print(f"  total:   {format_bytes(tfidf['total_bytes'])}")
+
+
+if __name__ == "__main__":
+    rebuild_community_index()
@@ -179,6 +179,37 @@ def test_community_posts(test_db):
     res = client.get("/api/community/posts")
     assert len(res.json()[0]["comments"]) == 1
 
+def test_community_comments_preview_longer_than_the_thread(test_db):
+    assert test_db.add_post({
+        "id": "preview-post", "title": "Preview", "author": "Tester", "content": "Hi",
+        "category": "general", "timestamp": "2999-01-01T00:00:00", "comments": [],
+    })["ok"]
+    for idx in range(2):
+        assert test_db.add_comment("preview-post", {"id": f"pc{idx}", "author": "A", "content": str(idx), "timestamp": f"t{idx}"})["ok"]
+
+    res = client.get("/api/community/posts", params={"comments_preview": 3})
+    assert res.status_code == 200
+    post = next(p for p in res.json() if p["id"] == "preview-post")
+    assert [c["id"] for c in post["comments"]] == ["pc0", "pc1"]
+    assert post.get("comments_next_cursor") is None
+
+def test_community_reports_do_not_reveal_the_reporter(test_db):
+    from backend.main import get_admin_user
+
+    assert test_db.add_post({
+        "id": "reported-post", "title": "Reported", "author": "Tester", "content": "Hi",
+        "category": "general", "timestamp": "2999-01-01T00:00:00", "comments": [],
+    })["ok"]
+    assert test_db.report_post("reported-post", "guest:secret-reporter", "spam")
+    app.dependency_overrides[get_admin_user] = lambda: {"username": "admin", "role": "admin"}
+    try:
+        res = client.get("/api/community/reports")
+    finally:
+        app.dependency_overrides.pop(get_admin_user, None)
+    assert res.status_code == 200
+    assert any(entry["post_id"] == "reported-post" for entry in res.json()["reports"])
+    assert "secret-reporter" not in res.text
+
 def test_submissions(test_db):
     # 1. Add Submission
     # "class" is a reserved keyword in python parameters but pydantic alias should handle it
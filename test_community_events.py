@@ -0,0 +1,94 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from backend.community_events import CommunityEventBroker
+
+
+def _drain(subscriber):
+    items = []
+    while not subscriber.queue.empty():
+        items.append(subscriber.queue.get_nowait())
+    return items
+
+
+def test_events_fan_out_to_every_subscriber():
+    async def scenario():
+        broker = CommunityEventBroker()
+        first, second = broker.subscribe(), broker.subscribe()
+        broker.publish("like_changed", {"post_id": "p1", "likes_count": 2})
+        return _drain(first), _drain(second)
+
+    first, second = asyncio.run(scenario())
+    assert first == second == [(1, "like_changed", {"post_id": "p1", "likes_count": 2})]
+
+
+def test_slow_subscriber_is_bounded_and_told_to_resync():
+    async def scenario():
+        broker = CommunityEventBroker(max_queue=3)
+        slow = broker.subscribe()
+        for idx in range(10):
+            broker.publish("post_deleted", {"post_id": f"p{idx}"})
+        return _drain(slow), slow.dropped
+
+    items, dropped = asyncio.run(scenario())
+    assert len(items) <= 3
+    assert (None, "resync", {}) in items
+    assert dropped > 0
+
+
+def test_reconnect_replays_missed_events_or_resyncs():
+    async def scenario():
+        broker = CommunityEventBroker(history=3)
+        for idx in range(5):
+            broker.publish("post_created", {"id": f"p{idx}"})
+        replayed = _drain(broker.subscribe(last_event_id=broker.event_id(3)))
+        too_old = _drain(broker.subscribe(last_event_id=broker.event_id(0)))
+        return replayed, too_old
+
+    replayed, too_old = asyncio.run(scenario())
+    assert [item[0] for item in replayed] == [4, 5]
+    assert too_old == [(None, "resync", {})]
+
+
+def test_reconnect_after_a_restart_or_from_another_worker_resyncs():
+    async def scenario():
+        before_restart = CommunityEventBroker()
+        for idx in range(5):
+            before_restart.publish("post_created", {"id": f"p{idx}"})
+        stale_id = before_restart.event_id(5)
+
+        restarted = CommunityEventBroker()
+        empty_history = _drain(restarted.subscribe(last_event_id=stale_id))
+        restarted.publish("post_deleted", {"post_id": "p0"})
+        restarted.publish("post_deleted", {"post_id": "p1"})
+        other_epoch = _drain(restarted.subscribe(last_event_id=stale_id))
+        ahead = _drain(restarted.subscribe(last_event_id=restarted.event_id(9)))
+        legacy = _drain(restarted.subscribe(last_event_id="1"))
+        current = _drain(restarted.subscribe(last_event_id=restarted.event_id(1)))
+        return empty_history, other_epoch, ahead, legacy, current
+
+    empty_history, other_epoch, ahead, legacy, current = asyncio.run(scenario())
+    assert empty_history == other_epoch == ahead == legacy == [(None, "resync", {})]
+    assert [item[0] for item in current] == [2]
+
+
+def test_stream_formats_events_and_heartbeats():
+    async def scenario():
+        broker = CommunityEventBroker(heartbeat_seconds=0.05)
+        subscriber = broker.subscribe()
+        frames = broker.stream(subscriber)
+        retry = await frames.__anext__()
+        heartbeat = await frames.__anext__()
+        broker.publish("comment_added", {"post_id": "p1", "comment": {"id": "c1"}})
+        event = await frames.__anext__()
+        await frames.aclose()
+        return retry, heartbeat, event, broker.subscriber_count, broker.epoch
+
+    retry, heartbeat, event, remaining, epoch = asyncio.run(scenario())
+    assert retry.startswith("retry: ")
+    assert heartbeat == ": heartbeat\n\n"
+    assert event == f"id: {epoch}-1\n" + 'event: comment_added\ndata: {"post_id":"p1","comment":{"id":"c1"}}\n\n'
+    assert remaining == 0
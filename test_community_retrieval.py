@@ -0,0 +1,192 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import backend.community_retrieval as community_retrieval
+from backend.community_retrieval import BM25Index, MinHashLSHIndex, TfidfIndex, minhash_signature, retrieval_score
+from backend.database import Database
+from backend.text_search import extract_semantic_tokens
+from test_database_local_store import local_db, make_post  # noqa: F401  (fixture)
+
+
+POSTS = [
+    {"id": "p1", "title": "Ngành công nghệ thông tin", "content": "Lập trình web và lập trình game"},
+    {"id": "p2", "title": "Học y khoa", "content": "Bác sĩ cần học sinh học và hóa học"},
+    {"id": "p3", "title": "Lập trình", "content": "Nên học ngôn ngữ lập trình nào trước?"},
+]
+
+
+def test_bm25_scores_only_matching_posts_scaled_to_the_best():
+    index = BM25Index(lambda: POSTS)
+    scores = index.scores(extract_semantic_tokens("lập trình game"))
+
+    assert set(scores) == {"p1", "p3"}
+    assert max(scores.values()) == 1.0
+    assert scores["p1"] > scores["p3"]  # "game" is rarer than "lap"/"trinh"
+    assert index.scores(extract_semantic_tokens("kinh tế")) == {}
+    assert set(index.scores(extract_semantic_tokens("lập trình"), exclude_id="p3")) == {"p1"}
+
+
+def test_bm25_incremental_updates_match_a_rebuild():
+    posts = list(POSTS)
+    index = BM25Index(lambda: posts)
+    index.ensure_built()
+    index.add({"id": "p4", "title": "Game designer", "content": "Thiết kế game cần lập trình"})
+    index.remove("p2")
+    incremental = index.scores(extract_semantic_tokens("game lập trình học"))
+
+    posts = [p for p in POSTS if p["id"] != "p2"] + [{"id": "p4", "title": "Game designer", "content": "Thiết kế game cần lập trình"}]
+    rebuilt = BM25Index(lambda: posts).scores(extract_semantic_tokens("game lập trình học"))
+    assert incremental.keys() == rebuilt.keys()
+    assert all(abs(incremental[k] - rebuilt[k]) < 1e-9 for k in rebuilt)
+
+
+def test_retrieval_score_keeps_the_community_boosts():
+    assert retrieval_score(0.5, 10.0, "major", 3, 4, True, {"major"}, "major") == 5.0 + 2.0 + 1.5 + 0.6 + 0.4 + 1.0
+    assert retrieval_score(1.0, 12.0, "study", 50, 50, False) == 12.0 + 2.0 + 1.5
+
+
+def test_retrieve_posts_fetches_only_the_matches(local_db):
+    for post in POSTS:
+        local_db.add_post(make_post(post["id"], title=post["title"], content=post["content"], likes_count=2))
+    fetched = []
+    store = local_db._posts_store()
+    original_get = store.get
+    store.get = lambda key: fetched.append(key) or original_get(key)
+
+    results = local_db.retrieve_posts(extract_semantic_tokens("lập trình"), projection=["title", "likes_count"])
+
+    assert sorted(fetched) == ["p1", "p3"]
+    assert {post["id"]: set(post) for post, _ in results} == {"p1": {"id", "title", "likes_count"}, "p3": {"id", "title", "likes_count"}}
+    local_db.delete_post("p3")
+    assert [post["id"] for post, _ in local_db.retrieve_posts(extract_semantic_tokens("lập trình"))] == ["p1"]
+
+
+def test_retrieve_posts_sees_posts_written_by_another_process(local_db):
+    local_db.add_post(make_post("p1", title=POSTS[0]["title"], content=POSTS[0]["content"]))
+    query = extract_semantic_tokens("lập trình")
+    assert [post["id"] for post, _ in local_db.retrieve_posts(query)] == ["p1"]
+
+    other = Database()
+    other.posts_file = local_db.posts_file
+    other.add_post(make_post("p3", title=POSTS[2]["title"], content=POSTS[2]["content"]))
+    other.delete_post("p1")
+    assert [post["id"] for post, _ in local_db.retrieve_posts(query)] == ["p3"]
+
+
+def test_minhash_signature_is_the_same_without_numpy(monkeypatch):
+    terms = extract_semantic_tokens("Lập trình web và lập trình game")
+    vectorized = minhash_signature(terms)
+    monkeypatch.setattr(community_retrieval, "np", None)
+    assert minhash_signature(terms) == vectorized
+    assert minhash_signature([]) is None
+
+
+def test_lsh_finds_near_neighbours_and_follows_removals():
+    posts = list(POSTS) + [{"id": "p4", "title": "Ngành công nghệ thông tin", "content": "Lập trình web và lập trình game nhé"}]
+    index = MinHashLSHIndex(lambda: posts)
+    query = extract_semantic_tokens("Ngành công nghệ thông tin Lập trình web và lập trình game")
+
+    similar = dict(index.similar(query))
+    assert similar["p1"] == 1.0
+    assert similar["p4"] >= 0.5
+    assert "p2" not in similar
+    assert "p1" not in dict(index.similar(query, exclude_id="p1"))
+
+    index.remove("p4")
+    assert "p4" not in dict(index.similar(query))
+    assert len(index) == 3
+
+
+def test_bm25_scores_can_be_restricted_to_candidates():
+    index = BM25Index(lambda: POSTS)
+    assert set(index.scores(extract_semantic_tokens("lập trình"), only=["p3", "p2"])) == {"p3"}
+
+
+def test_create_time_duplicates_and_similar_retrieval(local_db):
+    for post in POSTS:
+        local_db.add_post(make_post(post["id"], title=post["title"], content=post["content"]))
+    terms = extract_semantic_tokens(f"{POSTS[0]['title']} {POSTS[0]['content']}")
+
+    assert local_db.find_near_duplicates(terms) == [{"id": "p1", "title": POSTS[0]["title"], "similarity": 1.0}]
+    assert local_db.find_near_duplicates(extract_semantic_tokens("kinh tế tài chính")) == []
+
+    # Few LSH candidates: falls back to the full BM25 walk, so p3 is still found.
+    results = local_db.retrieve_similar_posts(terms, exclude_id="p1", projection=["title"])
+    assert [post["id"] for post, _ in results] == ["p3"]
+    results = local_db.retrieve_similar_posts(terms, exclude_id="p3", min_candidates=1)
+    assert [post["id"] for post, _ in results] == ["p1"]
+
+
+def test_duplicates_and_similar_posts_written_by_another_process(local_db):
+    local_db.add_post(make_post("p2", title=POSTS[1]["title"], content=POSTS[1]["content"]))
+    terms = extract_semantic_tokens(f"{POSTS[0]['title']} {POSTS[0]['content']}")
+    assert local_db.find_near_duplicates(terms) == []
+
+    # Another worker took the same question a moment ago: it is still flagged here.
+    other = Database()
+    other.posts_file = local_db.posts_file
+    other.add_post(make_post("p1", title=POSTS[0]["title"], content=POSTS[0]["content"]))
+    assert local_db.find_near_duplicates(terms) == [{"id": "p1", "title": POSTS[0]["title"], "similarity": 1.0}]
+    assert [post["id"] for post, _ in local_db.retrieve_similar_posts(terms, min_candidates=1)] == ["p1"]
+
+
+def test_tfidf_top_k_ranks_matches_and_follows_updates():
+    posts = list(POSTS)
+    index = TfidfIndex(lambda: posts, features=1 << 12)
+    query = extract_semantic_tokens("lập trình game")
+
+    ranked = index.top(query, 5)
+    assert [post_id for post_id, _ in ranked] == ["p1", "p3"]
+    assert ranked[0][1] == 1.0 and 0 < ranked[1][1] < 1.0
+    assert [post_id for post_id, _ in index.top(query, 1)] == ["p1"]
+    assert [post_id for post_id, _ in index.top(query, 5, exclude_id="p1")] == ["p3"]
+    assert index.top(extract_semantic_tokens("kinh tế"), 5) == []
+
+    index.add({"id": "p4", "title": "Game designer", "content": "Thiết kế game cần lập trình"})
+    index.remove("p1")
+    posts = [p for p in POSTS if p["id"] != "p1"] + [{"id": "p4", "title": "Game designer", "content": "Thiết kế game cần lập trình"}]
+    rebuilt = TfidfIndex(lambda: posts, features=1 << 12).top(query, 5)
+    incremental = index.top(query, 5)
+    assert [post_id for post_id, _ in incremental] == [post_id for post_id, _ in rebuilt] == ["p4", "p3"]
+    assert all(abs(a[1] - b[1]) < 1e-6 for a, b in zip(incremental, rebuilt))
+
+
+def test_tfidf_compacts_removed_rows_and_reports_memory():
+    posts = [{"id": f"p{i}", "title": f"Bài {i}", "content": "lập trình" if i % 2 else "y khoa"} for i in range(3000)]
+    index = TfidfIndex(lambda: posts, features=1 << 12)
+    index.ensure_built()
+    for i in range(0, 2500):
+        index.remove(f"p{i}")
+
+    usage = index.memory_usage()
+    assert usage["posts"] == len(index) == 500
+    assert usage["rows"] < 3000  # dead rows were compacted away
+    assert usage["total_bytes"] == usage["matrix_bytes"] + usage["vector_bytes"] + usage["id_bytes"]
+    top = index.top(extract_semantic_tokens("lập trình"), 1000)
+    assert len(top) == 250 and all(int(post_id[1:]) % 2 for post_id, _ in top)
+
+
+def test_retrieve_top_posts_with_and_without_tfidf(local_db):
+    for post in POSTS:
+        local_db.add_post(make_post(post["id"], title=post["title"], content=post["content"]))
+    query = extract_semantic_tokens("lập trình game")
+
+    assert [post["id"] for post, _ in local_db.retrieve_top_posts(query, 1, projection=["title"])] == ["p1"]
+    assert local_db.community_index_stats()["tfidf"]["posts"] == 3
+    local_db.tfidf_index = None  # numpy missing: the best BM25 matches instead
+    assert [post["id"] for post, _ in local_db.retrieve_top_posts(query, 1)] == ["p1"]
+    assert local_db.community_index_stats()["tfidf"] is None
+
+
+def test_retrieve_top_posts_sees_posts_written_by_another_process(local_db):
+    local_db.add_post(make_post("p2", title=POSTS[1]["title"], content=POSTS[1]["content"]))
+    query = extract_semantic_tokens("lập trình game")
+    assert local_db.retrieve_top_posts(query, 3) == []
+
+    other = Database()
+    other.posts_file = local_db.posts_file
+    other.add_post(make_post("p1", title=POSTS[0]["title"], content=POSTS[0]["content"]))
+    assert [post["id"] for post, _ in local_db.retrieve_top_posts(query, 3)] == ["p1"]
+    assert local_db.community_index_stats()["tfidf"]["posts"] == 2
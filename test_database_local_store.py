@@ -0,0 +1,544 @@
+import json
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from backend.database import Database
+
+
+@pytest.fixture
+def local_db(tmp_path, monkeypatch):
+    monkeypatch.delenv("MONGODB_URI", raising=False)
+    monkeypatch.delenv("VERCEL", raising=False)
+    instance = Database()
+    instance.data_dir = tmp_path
+    instance.vr_jobs_file = tmp_path / "vr_jobs.json"
+    instance.submissions_file = tmp_path / "submissions.json"
+    instance.posts_file = tmp_path / "posts.json"
+    instance.users_file = tmp_path / "users.json"
+    return instance
+
+
+def make_post(post_id, timestamp="2026-01-01T10:00:00", **extra):
+    post = {
+        "id": post_id,
+        "title": f"Post {post_id}",
+        "category": "general",
+        "author": "Tester",
+        "content": "Hello",
+        "timestamp": timestamp,
+        "comments": [],
+        "likes_count": 0,
+        "liked_by": [],
+    }
+    post.update(extra)
+    return post
+
+
+def test_local_reads_are_served_from_cache(local_db):
+    assert local_db.add_post(make_post("p1"))["ok"]
+
+    first = local_db.get_posts()
+    first[0]["title"] = "mutated by caller"
+    first[0]["comments"].append({"id": "ghost"})
+
+    again = local_db.get_posts()
+    assert again[0]["title"] == "Post p1"
+    assert again[0]["comments"] == []
+
+
+def test_local_cache_reloads_when_file_changes(local_db):
+    assert local_db.create_user({"username": "alice", "role": "user"})["ok"]
+    assert local_db.get_user("alice")["role"] == "user"
+
+    # Simulate another worker writing behind our back.
+    other = Database()
+    other.users_file = local_db.users_file
+    assert other.update_user_profile("alice", {"role": "mentor"})["ok"]
+    assert other.create_user({"username": "bob", "role": "user"})["ok"]
+
+    assert local_db.get_user("alice")["role"] == "mentor"
+    assert local_db.get_user("bob") is not None
+
+
+def test_local_snapshot_rewrite_is_picked_up(local_db):
+    time.sleep(0.01)
+    with open(local_db.vr_jobs_file, "w", encoding="utf-8") as f:
+        json.dump([{"id": "j1", "title": "Job"}], f)
+    assert local_db.get_vr_jobs([])[0]["title"] == "Job"
+
+    time.sleep(0.01)
+    with open(local_db.vr_jobs_file, "w", encoding="utf-8") as f:
+        json.dump([{"id": "j1", "title": "Renamed job"}], f)
+    assert local_db.get_vr_jobs([])[0]["title"] == "Renamed job"
+
+
+def test_local_writes_append_to_journal_and_replay(local_db, tmp_path):
+    assert local_db.add_post(make_post("p1"))["ok"]
+    assert local_db.add_post(make_post("p2", timestamp="2026-01-02T10:00:00"))["ok"]
+    assert local_db.add_comment("p1", {"id": "c1", "author": "A", "content": "hi", "timestamp": "t"})["ok"]
+    assert local_db.toggle_post_like("p1", "guest:1") == {"likes_count": 1, "liked": True}
+    assert local_db.delete_post("p2")["ok"]
+    assert local_db.add_submission({"name": "S", "time": "2026-01-01"})["ok"]
+
+    # Nothing rewrote the snapshot; every write is one journal line.
+    assert not local_db.posts_file.exists()
+    journal_lines = local_db.posts_file.with_name("posts.json.journal").read_text(encoding="utf-8").splitlines()
+    assert len(journal_lines) == 1 + 5
+
+    fresh = Database()
+    fresh.posts_file = local_db.posts_file
+    fresh.submissions_file = local_db.submissions_file
+    posts = fresh.get_posts()
+    assert [p["id"] for p in posts] == ["p1"]
+    assert posts[0]["comments"][0]["id"] == "c1"
+    assert posts[0]["liked_by"] == ["guest:1"]
+    assert len(fresh.get_submissions()) == 1
+
+
+def test_local_journal_compaction_folds_into_snapshot(local_db):
+    from backend.local_store import JournalCollection
+
+    store = JournalCollection(local_db.posts_file, key_field="id", compact_threshold=1000)
+    for idx in range(5):
+        assert store.insert(make_post(f"p{idx}"))
+    store.update("p0", lambda post: ({"likes_count": 7}, True))
+    store.compact()
+
+    with open(local_db.posts_file, "r", encoding="utf-8") as f:
+        snapshot = json.load(f)
+    assert len(snapshot) == 5
+    assert snapshot[0]["likes_count"] == 7
+    journal = local_db.posts_file.with_name("posts.json.journal")
+    assert journal.read_text(encoding="utf-8") == ""
+
+    store.delete("p1")
+    reopened = JournalCollection(local_db.posts_file, key_field="id")
+    assert sorted(r["id"] for r in reopened.all()) == ["p0", "p2", "p3", "p4"]
+
+
+def test_local_journal_skips_inserts_already_in_snapshot(local_db):
+    from backend.local_store import JournalCollection
+
+    store = JournalCollection(local_db.submissions_file)
+    store.insert({"name": "A"})
+    store.insert({"name": "B"})
+    journal = local_db.submissions_file.with_name("submissions.json.journal")
+    stale_journal = journal.read_bytes()
+    store.compact()
+    # Crash between the snapshot swap and the journal reset: the old journal survives.
+    journal.write_bytes(stale_journal)
+
+    reopened = JournalCollection(local_db.submissions_file)
+    assert [r["name"] for r in reopened.all()] == ["A", "B"]
+
+
+def _comment_worker(posts_path, worker_id, count):
+    from backend.local_store import JournalCollection
+
+    store = JournalCollection(posts_path, key_field="id")
+    for idx in range(count):
+        comment = {"id": f"w{worker_id}-{idx}", "author": "W", "content": "x", "timestamp": "t"}
+        store.update("p1", lambda post: ({"comments": list(post.get("comments") or []) + [comment]}, True))
+
+
+def test_local_store_concurrent_processes_do_not_lose_writes(local_db):
+    import multiprocessing
+
+    assert local_db.add_post(make_post("p1"))["ok"]
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_comment_worker, args=(local_db.posts_file, worker_id, 20)) for worker_id in range(4)]
+    for proc in workers:
+        proc.start()
+    for proc in workers:
+        proc.join(timeout=60)
+        assert proc.exitcode == 0
+
+    comments = local_db.get_posts()[0]["comments"]
+    assert len(comments) == 80
+    assert len({c["id"] for c in comments}) == 80
+
+
+def test_local_store_group_commit_keeps_every_thread_write(local_db):
+    import threading
+
+    assert local_db.add_post(make_post("p1"))["ok"]
+    threads = [
+        threading.Thread(target=local_db.toggle_post_like, args=("p1", f"guest:{idx}"), kwargs={"liked": True})
+        for idx in range(30)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    post = local_db.get_posts()[0]
+    assert post["likes_count"] == 30
+    assert len(set(post["liked_by"])) == 30
+
+
+def test_async_facade_runs_storage_off_the_event_loop(local_db):
+    import asyncio
+    import threading
+
+    from backend.database import AsyncDatabase
+
+    adb = AsyncDatabase(local_db)
+    seen_threads = []
+    original_get_posts = local_db.get_posts
+
+    def get_posts():
+        seen_threads.append(threading.get_ident())
+        return original_get_posts()
+
+    local_db.get_posts = get_posts
+
+    async def scenario():
+        assert (await adb.add_post(make_post("p1")))["ok"]
+        return await adb.get_posts(), threading.get_ident()
+
+    posts, loop_thread = asyncio.run(scenario())
+    assert [p["id"] for p in posts] == ["p1"]
+    assert seen_threads and loop_thread not in seen_threads
+    assert adb.posts_file == local_db.posts_file
+
+
+def _seed_feed(db):
+    db.add_post(make_post("a", timestamp="2026-01-01T10:00:00", category="major", content="Lập trình"))
+    db.add_post(make_post("b", timestamp="2026-01-03T10:00:00", category="study"))
+    db.add_post(make_post("c", timestamp="2026-01-02T10:00:00", category="major", comments=[{"id": "x"}, {"id": "y"}]))
+    db.add_post(make_post("d", timestamp="2025-12-31T10:00:00", category="major", is_pinned=True))
+
+
+def test_query_posts_filters_sorts_and_pages(local_db):
+    _seed_feed(local_db)
+
+    assert [p["id"] for p in local_db.query_posts()] == ["d", "b", "c", "a"]
+    assert [p["id"] for p in local_db.query_posts(sort="oldest")] == ["d", "a", "c", "b"]
+    assert [p["id"] for p in local_db.query_posts(sort="most_commented", pinned_first=False)][0] == "c"
+    assert [p["id"] for p in local_db.query_posts(category="major", limit=2, offset=1)] == ["c", "a"]
+    assert [p["id"] for p in local_db.query_posts(keyword="lap trinh")] == ["a"]
+
+    page = local_db.query_posts(limit=1)
+    page[0]["title"] = "mutated"
+    assert local_db.query_posts(limit=1)[0]["title"] == "Post d"
+
+
+def test_query_posts_view_follows_writes(local_db):
+    _seed_feed(local_db)
+    assert [p["id"] for p in local_db.query_posts(category="study")] == ["b"]
+
+    local_db.add_post(make_post("e", timestamp="2026-02-01T10:00:00", category="study"))
+    local_db.delete_post("b")
+    assert [p["id"] for p in local_db.query_posts(category="study")] == ["e"]
+
+
+def test_query_posts_view_skips_the_sort_when_order_is_unchanged(local_db, monkeypatch):
+    _seed_feed(local_db)
+    assert [p["id"] for p in local_db.query_posts()] == ["d", "b", "c", "a"]
+    sorts = []
+    original = Database._sort_by_feed
+    monkeypatch.setattr(Database, "_sort_by_feed", staticmethod(lambda keyed, order: sorts.append(1) or original(keyed, order)))
+
+    local_db.toggle_post_like("c", "guest:1", liked=True)
+    posts = local_db.query_posts()
+    assert [p["id"] for p in posts] == ["d", "b", "c", "a"] and not sorts
+    assert posts[2]["likes_count"] == 1  # the view holds the current post objects
+
+    local_db.add_comment("a", {"id": "z", "author": "A", "content": "hi", "timestamp": "t"})
+    assert [p["id"] for p in local_db.query_posts(sort="most_commented", pinned_first=False)] == ["c", "a", "d", "b"]
+    assert sorts
+
+
+def _walk_feed(db, **query):
+    ids, cursor, pages = [], "", 0
+    while True:
+        posts, cursor = db.query_feed_page(limit=2, cursor=cursor, **query)
+        ids += [p["id"] for p in posts]
+        pages += 1
+        if not cursor:
+            return ids, pages
+
+
+def test_feed_cursor_pages_match_the_full_feed(local_db):
+    _seed_feed(local_db)
+    local_db.add_post(make_post("e", timestamp="2026-01-02T10:00:00", category="major"))
+
+    for sort in ("newest", "oldest", "most_commented"):
+        expected = [p["id"] for p in local_db.query_posts(sort=sort)]
+        assert _walk_feed(local_db, sort=sort) == (expected, 3)
+    assert _walk_feed(local_db, category="major")[0] == ["d", "c", "e", "a"]
+
+    posts, cursor = local_db.query_feed_page(limit=2)
+    local_db.add_post(make_post("f", timestamp="2027-01-01T10:00:00"))
+    # A post written above the cursor does not shift the next page.
+    assert [p["id"] for p in local_db.query_feed_page(limit=2, cursor=cursor)[0]] == ["c", "e"]
+
+    with pytest.raises(ValueError):
+        local_db.query_feed_page(cursor="not-a-cursor")
+    with pytest.raises(ValueError):
+        local_db.query_feed_page(sort="most_commented", cursor=cursor)
+
+
+def _seed_thread(db, count=5):
+    db.add_post(make_post("p1", helpful_comment_id="c1"))
+    for idx in range(count):
+        db.add_comment("p1", {"id": f"c{idx}", "author": "A", "content": str(idx), "timestamp": f"t{idx}"})
+
+
+def test_feed_comment_preview_and_comment_pages(local_db):
+    _seed_thread(local_db)
+
+    post = local_db.query_posts(comments_limit=2)[0]
+    assert [c["id"] for c in post["comments"]] == ["c3", "c4"]
+    assert post["comments_count"] == 5
+    assert local_db.query_posts(comments_limit=0)[0]["comments"] == []
+    assert len(local_db.query_posts()[0]["comments"]) == 5
+    # A preview longer than the thread keeps every comment; comments_count == len: no next page.
+    post = local_db.query_posts(comments_limit=8)[0]
+    assert [c["id"] for c in post["comments"]] == ["c0", "c1", "c2", "c3", "c4"]
+    assert post["comments_count"] == len(post["comments"])
+
+    page = local_db.get_comments_page("p1", limit=2)
+    assert ([c["id"] for c in page["comments"]], page["start"], page["comments_count"]) == (["c3", "c4"], 3, 5)
+    page = local_db.get_comments_page("p1", before=page["start"], limit=2)
+    assert ([c["id"] for c in page["comments"]], page["start"]) == (["c1", "c2"], 1)
+    assert [c["id"] for c in local_db.get_comments_page("p1", before=1, limit=2)["comments"]] == ["c0"]
+    assert page["helpful_comment_id"] == "c1"
+    assert local_db.get_comments_page("missing") is None
+
+
+def test_collection_versions_move_with_every_write(local_db):
+    before = local_db.get_collection_versions(["posts", "users", "vr_jobs"])
+    assert local_db.get_collection_versions(["posts", "users", "vr_jobs"]) == before
+
+    local_db.add_post(make_post("p1"))
+    after_post = local_db.get_collection_versions(["posts", "users", "vr_jobs"])
+    assert after_post["posts"] != before["posts"]
+    assert after_post["users"] == before["users"]
+
+    local_db.toggle_post_like("p1", "guest:1")
+    local_db.update_vr_jobs([{"id": "j1", "title": "Job", "videoId": "v", "riasec_code": "R"}])
+    latest = local_db.get_collection_versions(["posts", "vr_jobs"])
+    assert latest["posts"] != after_post["posts"]
+    assert latest["vr_jobs"] != before["vr_jobs"]
+
+    # Another process writing the same files is visible too.
+    other = Database()
+    other.posts_file = local_db.posts_file
+    other.add_comment("p1", {"id": "c1", "author": "A", "content": "hi", "timestamp": "t"})
+    assert local_db.get_collection_versions(["posts"])["posts"] != latest["posts"]
+
+
+def test_get_post_and_comment_by_id(local_db):
+    _seed_thread(local_db, count=2)
+    local_db.add_post(make_post("p2"))
+    all_posts = local_db._posts_store().all
+    local_db._posts_store().all = lambda: pytest.fail("single-post lookups must not scan the store")
+
+    post = local_db.get_post("p1")
+    assert [c["id"] for c in post["comments"]] == ["c0", "c1"]
+    post["comments"][0]["content"] = "mutated"
+    assert local_db.get_comment("p1", "c0")["content"] == "0"
+    assert local_db.get_post("p1", projection=["author"]) == {"id": "p1", "author": "Tester"}
+    assert local_db.get_post("missing") is None
+    assert local_db.get_comment("p1", "missing") is None
+    assert local_db.get_comment("p2", "c0") is None
+    local_db._posts_store().all = all_posts
+
+
+def test_user_roles_are_bulk_cached_and_invalidated(local_db):
+    local_db.create_user({"username": "alice", "role": "user"})
+    local_db.create_user({"username": "bob", "role": "Mentor"})
+    assert local_db.get_user_roles(["alice", "bob", "ghost", None, ""]) == {"alice": "user", "bob": "mentor", "ghost": ""}
+
+    lookups = []
+    store = local_db._users_store()
+    original_get = store.get
+    store.get = lambda key: lookups.append(key) or original_get(key)
+    assert local_db.get_user_roles(["alice", "bob"]) == {"alice": "user", "bob": "mentor"}
+    assert lookups == []
+
+    assert local_db.update_user_profile("alice", {"role": "admin"})["ok"]
+    assert local_db.get_user_roles(["alice", "bob"]) == {"alice": "admin", "bob": "mentor"}
+    assert sorted(lookups) == ["alice", "bob"]  # our own write moved the users version too
+
+    # A role changed by another worker moves the users version, which the feed ETag follows too.
+    other = Database()
+    other.users_file = local_db.users_file
+    assert other.update_user_profile("bob", {"role": "user"})["ok"]
+    assert local_db.get_user_roles(["alice", "bob"]) == {"alice": "admin", "bob": "user"}
+
+
+def test_post_counters_follow_writes_and_backfill(local_db):
+    assert local_db.add_post(make_post("p1", comments=[{"id": "c0", "reports": [{"actor_id": "x", "status": "closed"}]}]))["ok"]
+    post = local_db.get_posts()[0]
+    assert (post["comments_count"], post["reports_count"], post["open_reports_count"]) == (1, 0, 0)
+    assert (post["comments"][0]["reports_count"], post["comments"][0]["open_reports_count"]) == (1, 0)
+
+    local_db.add_comment("p1", {"id": "c1", "author": "A", "content": "hi", "timestamp": "t"})
+    local_db.report_post("p1", "a", "spam")
+    local_db.report_post("p1", "a", "spam")
+    local_db.report_comment("p1", "c0", "x", "spam")
+    post = local_db.get_posts()[0]
+    assert (post["comments_count"], post["reports_count"], post["open_reports_count"]) == (2, 1, 1)
+    assert (post["comments"][0]["reports_count"], post["comments"][0]["open_reports_count"]) == (1, 1)
+
+    # Legacy rows without counters are backfilled by the startup migration.
+    local_db._posts_store().replace_all([make_post("legacy", comments=[{"id": "c"}, {"id": "d"}])])
+    local_db.normalize_community_posts_schema()
+    legacy = local_db.get_posts()[0]
+    assert legacy["comments_count"] == 2
+    assert legacy["comments"][0]["reports_count"] == 0
+
+
+def test_community_metrics_follow_writes_without_rescanning(local_db):
+    from datetime import datetime, timedelta
+
+    now = datetime.now()
+    recent, old = (now - timedelta(days=2)).isoformat(), (now - timedelta(days=40)).isoformat()
+    local_db.add_post(make_post("p1", timestamp=recent, author="Alice"))
+    local_db.add_post(make_post("p2", timestamp=old, author="Bob"))
+    assert local_db.get_community_metrics()["total_posts"] == 2
+
+    local_db.get_posts = lambda: pytest.fail("metrics must not rescan after they are built")
+    local_db.add_comment("p2", {"id": "c1", "author": "carol", "content": "hi", "timestamp": now.isoformat()})
+    local_db.toggle_post_like("p1", "guest:1", liked=True)
+    local_db.set_post_pin("p1", True)
+    local_db.set_helpful_comment("p2", "c1", "user:bob", helpful=True)
+    local_db.report_post("p2", "guest:2", "spam")
+    local_db.add_post(make_post("p3", timestamp=now.isoformat(), author="alice"))
+    local_db.delete_post("p3")
+    metrics = local_db.get_community_metrics()
+    del local_db.get_posts
+
+    assert metrics == {
+        "total_posts": 2,
+        "total_comments": 1,
+        "total_likes": 1,
+        "total_reports": 1,
+        "pinned_posts": 1,
+        "helpful_marked_posts": 0,
+        "active_authors_30d": 2,
+        "posts_7d": 1,
+        "comments_7d": 1,
+        "engagement_actions": 2,
+        "engagement_per_post": 1.0,
+        "generated_at": metrics["generated_at"],
+    }
+
+    # A bulk rewrite outside the per-post writes moves the posts version: the next read rebuilds.
+    local_db._posts_store().replace_all([make_post("p9", timestamp=recent)])
+    assert local_db.get_community_metrics()["total_posts"] == 1
+
+
+def test_community_metrics_follow_writes_of_another_process(local_db):
+    local_db.add_post(make_post("p1"))
+    assert local_db.get_community_metrics()["total_posts"] == 1
+
+    other = Database()
+    other.posts_file = local_db.posts_file
+    other.add_post(make_post("p2"))
+    other.add_comment("p1", {"id": "c1", "author": "A", "content": "hi", "timestamp": "t"})
+    metrics = local_db.get_community_metrics()
+    assert (metrics["total_posts"], metrics["total_comments"]) == (2, 1)
+
+
+def test_reports_queue_pages_filters_and_follows_deletes(local_db):
+    local_db.add_post(make_post("p1", reports=[{"actor_id": "old", "reason": "spam", "timestamp": "2026-01-01T00:00:00", "status": "closed"}]))
+    local_db.add_post(make_post("p2", comments=[{"id": "c1", "author": "Bob"}]))
+    assert local_db.backfill_community_reports() == {"scanned": 1, "added": 1, "removed": 0}
+    for idx in range(5):
+        local_db.report_post("p1", f"guest:{idx}", "spam" if idx % 2 else "abuse")
+    local_db.report_comment("p2", "c1", "guest:9", "spam", "rude")
+
+    seen, cursor = [], ""
+    while True:
+        page, cursor = local_db.query_community_reports(limit=2, cursor=cursor)
+        seen.extend(page)
+        if cursor is None:
+            break
+    assert len(seen) == 6
+    assert [e["timestamp"] for e in seen] == sorted((e["timestamp"] for e in seen), reverse=True)
+    assert "guest:9" not in seen[0]["id"]
+    assert seen[0] == {
+        "id": seen[0]["id"], "type": "comment", "post_id": "p2", "comment_id": "c1", "post_title": "Post p2",
+        "target_author": "Bob", "actor_id": "guest:9", "reason": "spam", "detail": "rude",
+        "timestamp": seen[0]["timestamp"], "status": "open",
+    }
+    assert len(local_db.query_community_reports(reason="spam")[0]) == 3
+    assert len(local_db.query_community_reports(status="all")[0]) == 7
+    with pytest.raises(ValueError):
+        local_db.query_community_reports(cursor="garbage")
+
+    local_db.delete_post("p1")
+    assert [e["post_id"] for e in local_db.query_community_reports(status="all")[0]] == ["p2"]
+    assert local_db.backfill_community_reports() == {"scanned": 1, "added": 0, "removed": 0}
+
+    # Entries keyed by the old reporter-revealing ids are replaced by the backfill.
+    local_db._reports_store().insert({**seen[0], "id": "p2|c1|guest:9"})
+    assert local_db.backfill_community_reports() == {"scanned": 1, "added": 0, "removed": 1}
+    assert [e["id"] for e in local_db.query_community_reports(status="all")[0]] == [seen[0]["id"]]
+
+
+def test_keyword_search_uses_the_inverted_index(local_db):
+    local_db.add_post(make_post("a", title="Học lập trình", category="major", timestamp="2026-01-01T10:00:00"))
+    local_db.add_post(make_post("b", title="Lập trình game", content="Unity", timestamp="2026-01-02T10:00:00"))
+    local_db.add_post(make_post("c", title="Đại học", author="Trình", timestamp="2026-01-03T10:00:00"))
+    assert [p["id"] for p in local_db.query_posts(keyword="lap trinh")] == ["b", "a"]
+
+    store = local_db._posts_store()
+    all_posts = store.all
+    store.all = lambda: pytest.fail("an indexed keyword query must not scan the posts")
+    # Every query word must prefix some word of the post (title, content, author or category).
+    assert [p["id"] for p in local_db.query_posts(keyword="tri")] == ["c", "b", "a"]
+    assert [p["id"] for p in local_db.query_posts(keyword="trinh uni")] == ["b"]
+    assert [p["id"] for p in local_db.query_posts(keyword="dai")] == ["c"]
+    assert [p["id"] for p in local_db.query_posts(keyword="lap", category="major")] == ["a"]
+    assert local_db.query_posts(keyword="rinh") == []
+
+    local_db.add_post(make_post("d", title="Lập kế hoạch", timestamp="2026-01-04T10:00:00"))
+    local_db.delete_post("b")
+    assert [p["id"] for p in local_db.query_posts(keyword="lap")] == ["d", "a"]
+    assert [p["id"] for p in local_db.query_posts(keyword="lap", limit=1, offset=1)] == ["a"]
+    store.all = all_posts
+
+
+def test_keyword_search_sees_posts_written_by_another_process(local_db):
+    local_db.add_post(make_post("a", title="Lập trình web"))
+    assert [p["id"] for p in local_db.query_posts(keyword="lap")] == ["a"]
+
+    # Another worker on the same file: our index follows the posts version, not a timer.
+    other = Database()
+    other.posts_file = local_db.posts_file
+    other.add_post(make_post("b", title="Lập kế hoạch", timestamp="2026-01-02T10:00:00"))
+    assert [p["id"] for p in local_db.query_posts(keyword="lap")] == ["b", "a"]
+    other.delete_post("a")
+    assert [p["id"] for p in local_db.query_posts(keyword="lap")] == ["b"]
+    assert local_db.query_posts(keyword="web") == []
+
+
+def test_token_vectors_are_backfilled_and_read_by_the_indexes(local_db):
+    from backend.text_search import TOKEN_VECTOR_VERSION, token_vector
+
+    local_db._posts_store().replace_all([
+        make_post("legacy", title="Lập trình web", content="Học HTML"),
+        make_post("stale", title="Y khoa", token_vector={"v": 0, "terms": {}, "words": []}),
+    ])
+    assert local_db.normalize_community_posts_schema()["updated"] == 2
+    by_id = {p["id"]: p for p in local_db.get_posts()}
+    assert by_id["legacy"]["token_vector"] == token_vector(by_id["legacy"])
+    assert by_id["legacy"]["token_vector"]["terms"] == {"lap": 1, "trinh": 1, "web": 1, "hoc": 1, "html": 1}
+    assert by_id["stale"]["token_vector"]["v"] == TOKEN_VECTOR_VERSION
+    assert local_db.normalize_community_posts_schema()["updated"] == 0
+
+    # The indexes take the stored vector as is; the text itself is not tokenized again.
+    vector = {"v": TOKEN_VECTOR_VERSION, "terms": {"robot": 2}, "words": ["robot"]}
+    local_db.add_post(make_post("stored", title="Lập trình", token_vector=vector))
+    assert [p["id"] for p in local_db.query_posts(keyword="robot")] == ["stored"]
+    assert local_db.query_posts(keyword="lap trinh", category="general")[0]["id"] == "legacy"
+    assert [post["id"] for post, _ in local_db.retrieve_posts(["robot"])] == ["stored"]
@@ -0,0 +1,349 @@
+import os
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from backend.database import MONGO_INDEXES, Database
+
+
+@pytest.fixture
+def mongo_db(monkeypatch):
+    monkeypatch.delenv("MONGODB_URI", raising=False)
+    monkeypatch.delenv("STORAGE_BACKEND", raising=False)
+    instance = Database()
+    instance.db = MagicMock()
+    instance.is_mongo = True
+    return instance
+
+
+def test_ensure_indexes_creates_every_index(mongo_db):
+    state = mongo_db.ensure_indexes()
+
+    assert state["status"] == "ok"
+    assert set(state["indexes"]) == {options["name"] for _, _, options in MONGO_INDEXES}
+    posts = mongo_db.db["posts"]
+    posts.create_index.assert_any_call([("id", 1)], name="posts_id_unique", unique=True)
+    posts.create_index.assert_any_call([("category", 1), ("timestamp", -1)], name="posts_category_timestamp")
+    mongo_db.db["users"].create_index.assert_any_call([("username", 1)], name="users_username_unique", unique=True)
+    assert mongo_db.get_index_state() is state
+
+
+def test_ensure_indexes_reports_failures_without_raising(mongo_db):
+    def create_index(keys, **options):
+        if options["name"] == "posts_id_unique":
+            raise OperationFailure("E11000 duplicate key error", code=11000)
+        if options["name"] == "posts_timestamp":
+            raise OperationFailure("Index already exists with a different name", code=85)
+        return options["name"]
+
+    mongo_db.db.__getitem__.return_value.create_index.side_effect = create_index
+    state = mongo_db.ensure_indexes()
+
+    assert state["status"] == "partial"
+    assert state["indexes"]["posts_id_unique"].startswith("error")
+    assert state["indexes"]["posts_timestamp"] == "exists_with_other_options"
+    assert state["indexes"]["users_username_unique"] == "ok"
+
+
+def test_toggle_like_is_one_conditional_update(mongo_db):
+    posts = mongo_db.db.posts
+    posts.find_one_and_update.return_value = {"likes_count": 4}
+
+    assert mongo_db.toggle_post_like("p1", "guest:1", liked=True) == {"likes_count": 4, "liked": True}
+
+    query, update = posts.find_one_and_update.call_args.args
+    assert query == {"id": "p1", "liked_by": {"$ne": "guest:1"}}
+    assert update == {"$addToSet": {"liked_by": "guest:1"}, "$inc": {"likes_count": 1}}
+    assert posts.find_one_and_update.call_args.kwargs["projection"] == {"_id": 0, "likes_count": 1}
+    posts.update_one.assert_not_called()
+    posts.find_one.assert_not_called()
+
+
+def test_toggle_like_without_flag_unlikes_when_already_liked(mongo_db):
+    posts = mongo_db.db.posts
+    # The like attempt matches nothing (already liked), the unlike attempt succeeds.
+    posts.find_one_and_update.side_effect = [None, {"likes_count": 2}]
+
+    assert mongo_db.toggle_post_like("p1", "guest:1") == {"likes_count": 2, "liked": False}
+    query, update = posts.find_one_and_update.call_args.args
+    assert query == {"id": "p1", "liked_by": "guest:1"}
+    assert update == {"$pull": {"liked_by": "guest:1"}, "$inc": {"likes_count": -1}}
+
+
+def test_toggle_like_repeated_like_keeps_count(mongo_db):
+    posts = mongo_db.db.posts
+    posts.find_one_and_update.return_value = None
+    posts.find_one.return_value = {"likes_count": 3}
+    assert mongo_db.toggle_post_like("p1", "guest:1", liked=True) == {"likes_count": 3, "liked": True}
+
+    posts.find_one.return_value = None
+    assert mongo_db.toggle_post_like("missing", "guest:1", liked=True) is None
+
+
+def test_report_comment_updates_only_the_target_comment(mongo_db):
+    posts = mongo_db.db.posts
+    # No report by this actor yet: the refresh and reopen attempts match nothing, the $push runs.
+    posts.find_one_and_update.side_effect = [None, None, {"comments": [{"id": "c1", "reports_count": 2}]}]
+
+    assert mongo_db.report_comment("p1", "c1", "b", "spam", "detail") == {"reports_count": 2}
+
+    refresh, reopen, push = posts.find_one_and_update.call_args_list
+    assert refresh.args[0] == {
+        "id": "p1",
+        "comments": {"$elemMatch": {"id": "c1", "reports": {"$elemMatch": {"actor_id": "b", "status": "open"}}}},
+    }
+    assert set(refresh.args[1]["$set"]) == {
+        "comments.$[c].reports.$[r].reason",
+        "comments.$[c].reports.$[r].detail",
+        "comments.$[c].reports.$[r].timestamp",
+        "comments.$[c].reports.$[r].status",
+    }
+    assert "$inc" not in refresh.args[1]
+    assert refresh.kwargs["array_filters"] == [{"c.id": "c1"}, {"r.actor_id": "b"}]
+    assert reopen.args[1]["$inc"] == {"comments.$[c].open_reports_count": 1}
+    assert push.args[1]["$push"]["comments.$.reports"]["actor_id"] == "b"
+    assert push.args[1]["$inc"] == {"comments.$.reports_count": 1, "comments.$.open_reports_count": 1}
+    assert "array_filters" not in push.kwargs
+    posts.update_one.assert_not_called()
+
+
+def test_add_comment_increments_comments_count(mongo_db):
+    mongo_db.db.posts.update_one.return_value.matched_count = 1
+    mongo_db.db.posts.update_one.return_value.modified_count = 1
+
+    assert mongo_db.add_comment("p1", {"id": "c1", "content": "hi"})["ok"]
+    query, update = mongo_db.db.posts.update_one.call_args.args
+    assert update["$inc"] == {"comments_count": 1}
+    assert update["$push"]["comments"] == {"id": "c1", "content": "hi", "reports_count": 0, "open_reports_count": 0}
+
+
+def test_set_helpful_comment_clears_previous_mark_server_side(mongo_db):
+    posts = mongo_db.db.posts
+    posts.find_one.return_value = {
+        "owner_actor": "user:owner",
+        "helpful_comment_id": "c0",
+        "comments": [{"id": "c1"}],
+    }
+    posts.update_one.return_value.matched_count = 1
+
+    result = mongo_db.set_helpful_comment("p1", "c1", "user:owner")
+
+    assert result == {"helpful_comment_id": "c1", "helpful": True}
+    query, update = posts.update_one.call_args.args
+    assert query == {"id": "p1", "comments.id": "c1"}
+    assert update == {"$set": {
+        "helpful_comment_id": "c1",
+        "comments.$[target].helpful": True,
+        "comments.$[previous].helpful": False,
+    }}
+    assert posts.update_one.call_args.kwargs["array_filters"][1] == {"previous.helpful": True, "previous.id": {"$ne": "c1"}}
+
+
+def test_set_helpful_comment_rejects_non_owner(mongo_db):
+    mongo_db.db.posts.find_one.return_value = {"owner_actor": "user:owner", "comments": [{"id": "c1"}]}
+    assert mongo_db.set_helpful_comment("p1", "c1", "user:other") == {"error": "forbidden"}
+    mongo_db.db.posts.update_one.assert_not_called()
+
+
+def _job(job_id):
+    return {"id": job_id, "title": f"Job {job_id}", "videoId": "v", "riasec_code": "R"}
+
+
+def test_update_vr_jobs_uses_chunked_unordered_bulk_writes(mongo_db):
+    vr_jobs = mongo_db.db.vr_jobs
+    vr_jobs.bulk_write.return_value.bulk_api_result = {"nUpserted": 1, "nMatched": 1}
+    vr_jobs.delete_many.return_value.deleted_count = 3
+
+    result = mongo_db.update_vr_jobs([_job(f"j{idx}") for idx in range(5)], chunk_size=2)
+
+    assert result["ok"]
+    assert vr_jobs.bulk_write.call_count == 3
+    assert all(call.kwargs["ordered"] is False for call in vr_jobs.bulk_write.call_args_list)
+    assert [len(call.args[0]) for call in vr_jobs.bulk_write.call_args_list] == [2, 2, 1]
+    assert (result["created"], result["updated"], result["removed"]) == (3, 3, 3)
+    vr_jobs.replace_one.assert_not_called()
+
+
+def test_update_vr_jobs_reports_failed_chunks_and_keeps_old_jobs(mongo_db):
+    from pymongo.errors import BulkWriteError
+
+    vr_jobs = mongo_db.db.vr_jobs
+    ok = MagicMock()
+    ok.bulk_api_result = {"nUpserted": 2, "nMatched": 0}
+    failure = BulkWriteError({"writeErrors": [{"index": 0, "errmsg": "boom"}], "nUpserted": 1, "nMatched": 0})
+    vr_jobs.bulk_write.side_effect = [ok, failure]
+
+    result = mongo_db.update_vr_jobs([_job(f"j{idx}") for idx in range(4)], chunk_size=2)
+
+    assert not result["ok"]
+    assert result["reason"] == "mongo_bulk_write_error"
+    assert result["chunk_errors"] == [{"chunk": 1, "offset": 2, "failed": 1, "error": "boom"}]
+    assert result["created"] == 3
+    vr_jobs.delete_many.assert_not_called()
+
+
+def test_query_posts_runs_as_one_sorted_mongo_query(mongo_db):
+    cursor = mongo_db.db.posts.find.return_value
+    cursor.sort.return_value.skip.return_value.limit.return_value = [{"id": "p1"}]
+
+    assert mongo_db.query_posts(category="major", limit=10, offset=20) == [{"id": "p1"}]
+    mongo_db.db.posts.find.assert_called_once_with({"category": "major"}, {"_id": 0, "token_vector": 0})
+    cursor.sort.assert_called_once_with([("is_pinned", -1), ("timestamp", -1), ("id", 1)])
+    cursor.sort.return_value.skip.assert_called_once_with(20)
+    cursor.sort.return_value.skip.return_value.limit.assert_called_once_with(10)
+
+
+def test_feed_cursor_becomes_a_keyset_range(mongo_db):
+    cursor = mongo_db.db.posts.find.return_value
+    cursor.sort.return_value.skip.return_value.limit.return_value = [
+        {"id": "p2", "timestamp": "2026-01-02", "is_pinned": False},
+        {"id": "p3", "timestamp": "2026-01-01", "is_pinned": False},
+    ]
+    order = mongo_db._feed_order("newest", True)
+    after = [False, "2026-01-03", "p1"]
+
+    posts, next_cursor = mongo_db.query_feed_page(limit=1, cursor=mongo_db.encode_feed_cursor(order, after))
+
+    assert [p["id"] for p in posts] == ["p2"]
+    assert mongo_db.decode_feed_cursor(next_cursor, order) == [False, "2026-01-02", "p2"]
+    query = mongo_db.db.posts.find.call_args.args[0]
+    assert query["$or"] == [
+        {"is_pinned": {"$lt": False}},
+        {"is_pinned": False, "timestamp": {"$lt": "2026-01-03"}},
+        {"is_pinned": False, "timestamp": "2026-01-03", "id": {"$gt": "p1"}},
+    ]
+    cursor.sort.return_value.skip.assert_called_once_with(0)
+    cursor.sort.return_value.skip.return_value.limit.assert_called_once_with(2)
+
+
+def test_comment_preview_and_pages_use_slice_projections(mongo_db):
+    posts = mongo_db.db.posts
+    mongo_db.query_posts(comments_limit=3)
+    assert posts.find.call_args.args[1] == {"_id": 0, "token_vector": 0, "comments": {"$slice": -3}}
+    mongo_db.query_posts(comments_limit=0)
+    assert posts.find.call_args.args[1] == {"_id": 0, "token_vector": 0, "comments": 0}
+
+    posts.find_one.return_value = {"comments_count": 7, "comments": [{"id": "c5"}, {"id": "c6"}]}
+    page = mongo_db.get_comments_page("p1", limit=2)
+    assert (page["start"], page["comments_count"]) == (5, 7)
+    assert posts.find_one.call_args.args[1]["comments"] == {"$slice": -2}
+
+    posts.find_one.return_value = {"comments_count": 7, "comments": [{"id": "c3"}, {"id": "c4"}]}
+    page = mongo_db.get_comments_page("p1", before=5, limit=2)
+    assert page["start"] == 3
+    assert posts.find_one.call_args.args[1]["comments"] == {"$slice": [3, 2]}
+
+
+def test_query_posts_keyword_pages_over_the_index_matches(mongo_db):
+    posts = mongo_db.db.posts
+    documents = [
+        {"id": "p1", "title": "Học lập trình"},
+        {"id": "p2", "title": "Khác"},
+        {"id": "p3", "title": "lap trinh web"},
+        {"id": "p4", "title": "Lập trình game", "content": "unity"},
+    ]
+    page_cursor = MagicMock()
+    page_cursor.sort.return_value.skip.return_value.limit.return_value = [{"id": "p3"}, {"id": "p4"}]
+    posts.find.side_effect = [documents, page_cursor]
+
+    result = mongo_db.query_posts(category="major", keyword="lap tri", limit=2, offset=1)
+
+    assert [p["id"] for p in result] == ["p3", "p4"]
+    index_query, index_projection = posts.find.call_args_list[0].args
+    assert index_query == {} and "comments" not in index_projection
+    page_query = posts.find.call_args_list[1].args[0]
+    assert page_query == {"category": "major", "id": {"$in": ["p1", "p3", "p4"]}}
+    page_cursor.sort.return_value.skip.assert_called_once_with(1)
+
+    # Later queries hit the in-memory index; deleting a post drops it from the postings.
+    posts.delete_one.return_value.deleted_count = 1
+    mongo_db.delete_post("p1")
+    assert mongo_db.search_index.search("lap trinh") == {"p3", "p4"}
+    assert mongo_db.search_index.search("unity") == {"p4"}
+
+
+def test_query_posts_keyword_without_words_scans_only_the_page(mongo_db):
+    mongo_db.db.posts.find.return_value.sort.return_value = iter([
+        {"id": "p1", "title": "Học C++"},
+        {"id": "p2", "title": "Khác"},
+        {"id": "p3", "title": "C++ web"},
+        {"id": "p4", "title": "C++ game"},
+    ])
+    page_cursor = [{"id": "p4"}, {"id": "p3"}]
+    scan_cursor = mongo_db.db.posts.find.return_value
+    mongo_db.db.posts.find.side_effect = [scan_cursor, page_cursor]
+
+    result = mongo_db.query_posts(keyword="++", limit=2, offset=1)
+
+    assert [p["id"] for p in result] == ["p3", "p4"]
+    scan_projection = mongo_db.db.posts.find.call_args_list[0].args[1]
+    assert "comments" not in scan_projection
+    assert mongo_db.db.posts.find.call_args_list[1].args == ({"id": {"$in": ["p3", "p4"]}}, {"_id": 0, "token_vector": 0})
+
+
+def test_writes_bump_the_mongo_version_counter(mongo_db):
+    mongo_db.db.posts.update_one.return_value.matched_count = 1
+    mongo_db.add_comment("p1", {"id": "c1", "content": "hi"})
+    mongo_db.db.meta.find_one_and_update.assert_called_once_with(
+        {"_id": "version:posts"}, {"$inc": {"version": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+
+    mongo_db.db.meta.find.return_value = [{"_id": "version:posts", "version": 4}]
+    assert mongo_db.get_collection_versions(["posts", "users"]) == {"posts": "4", "users": "0"}
+    assert mongo_db.db.meta.find.call_args.args[0] == {"_id": {"$in": ["version:posts", "version:users"]}}
+
+
+def test_single_post_and_comment_lookups_use_find_one(mongo_db):
+    posts = mongo_db.db.posts
+    posts.find_one.return_value = {"id": "p1", "author": "A"}
+    assert mongo_db.get_post("p1", projection=["author"]) == {"id": "p1", "author": "A"}
+    posts.find_one.assert_called_with({"id": "p1"}, {"_id": 0, "id": 1, "author": 1})
+
+    posts.find_one.return_value = {"comments": [{"id": "c1", "content": "hi"}]}
+    assert mongo_db.get_comment("p1", "c1") == {"id": "c1", "content": "hi"}
+    posts.find_one.assert_called_with({"id": "p1", "comments.id": "c1"}, {"_id": 0, "comments.$": 1})
+    posts.find_one.return_value = None
+    assert mongo_db.get_comment("p1", "c9") is None
+    posts.find.assert_not_called()
+
+
+def test_user_roles_use_one_in_query(mongo_db):
+    mongo_db.db.users.find.return_value = [{"username": "alice", "role": "admin"}]
+
+    assert mongo_db.get_user_roles(["alice", "bob", "alice"]) == {"alice": "admin", "bob": ""}
+    query, projection = mongo_db.db.users.find.call_args.args
+    assert sorted(query["username"]["$in"]) == ["alice", "bob"]
+    assert projection == {"_id": 0, "username": 1, "role": 1}
+
+    mongo_db.get_user_roles(["alice", "bob"])
+    assert mongo_db.db.users.find.call_count == 1
+
+
+def test_reports_queue_is_a_keyset_query_on_the_reports_collection(mongo_db):
+    reports = mongo_db.db.community_reports
+    cursor = mongo_db.encode_feed_cursor([("timestamp", -1), ("id", -1)], ["2026-01-02", "p1||guest:1"])
+    reports.find.return_value.sort.return_value.limit.return_value = [{"id": "a"}, {"id": "b"}]
+
+    page, next_cursor = mongo_db.query_community_reports(status="open", reason="spam", limit=5, cursor=cursor)
+
+    assert page == [{"id": "a"}, {"id": "b"}] and next_cursor is None
+    query, projection = reports.find.call_args.args
+    assert query == {
+        "status": "open",
+        "reason": "spam",
+        "$or": [{"timestamp": {"$lt": "2026-01-02"}}, {"timestamp": "2026-01-02", "id": {"$lt": "p1||guest:1"}}],
+    }
+    assert projection == {"_id": 0}
+    reports.find.return_value.sort.assert_called_once_with([("timestamp", -1), ("id", -1)])
+    reports.find.return_value.sort.return_value.limit.assert_called_once_with(6)
+
+
+def test_delete_post_drops_its_reports(mongo_db):
+    mongo_db.db.posts.delete_one.return_value.deleted_count = 1
+    assert mongo_db.delete_post("p1")["ok"]
+    mongo_db.db.community_reports.delete_many.assert_called_once_with({"post_id": "p1"})
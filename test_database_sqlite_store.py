@@ -0,0 +1,270 @@
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from backend.database import Database
+from backend.sqlite_store import SQLiteStore
+from test_database_local_store import _seed_feed, _seed_thread, _walk_feed, make_post
+
+import_local_files_into_sqlite = Database._import_local_files_into_sqlite
+
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    monkeypatch.delenv("MONGODB_URI", raising=False)
+    monkeypatch.delenv("VERCEL", raising=False)
+    monkeypatch.setenv("STORAGE_BACKEND", "sqlite")
+    monkeypatch.setenv("SQLITE_PATH", str(tmp_path / "careervr.sqlite3"))
+    # Keep the repo's backend/data files out of the test database.
+    monkeypatch.setattr(Database, "_import_local_files_into_sqlite", lambda self: None)
+    instance = Database()
+    assert instance.is_sqlite
+    return instance
+
+
+def test_sqlite_store_creates_indexes(sqlite_db):
+    store = sqlite_db.sqlite
+    assert store.connection().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert {"idx_posts_timestamp", "idx_posts_category_timestamp"} <= set(store.index_names("posts"))
+    assert "idx_submissions_time" in store.index_names("submissions")
+    # UNIQUE columns are backed by automatic indexes.
+    assert any(name.startswith("sqlite_autoindex_posts") for name in store.index_names("posts"))
+    assert any(name.startswith("sqlite_autoindex_users") for name in store.index_names("users"))
+
+
+def test_sqlite_community_flow(sqlite_db):
+    assert sqlite_db.add_post(make_post("p1"))["ok"]
+    assert sqlite_db.add_post(make_post("p2", timestamp="2026-01-02T10:00:00"))["ok"]
+    assert sqlite_db.add_post(make_post("p1"))["reason"] == "duplicate_post_id"
+    assert sqlite_db.add_comment("p1", {"id": "c1", "author": "A", "content": "hi", "timestamp": "t"})["ok"]
+    assert sqlite_db.toggle_post_like("p1", "guest:1") == {"likes_count": 1, "liked": True}
+    assert sqlite_db.set_post_pin("p1", True)["is_pinned"] is True
+    assert sqlite_db.delete_post("p2")["ok"]
+
+    other = Database()
+    posts = other.get_posts()
+    assert [p["id"] for p in posts] == ["p1"]
+    assert posts[0]["comments"][0]["id"] == "c1"
+    assert posts[0]["liked_by"] == ["guest:1"]
+    assert posts[0]["is_pinned"] is True
+
+
+def test_sqlite_users_submissions_and_jobs(sqlite_db):
+    assert sqlite_db.create_user({"username": "alice", "role": "user"})["ok"]
+    assert sqlite_db.create_user({"username": "alice", "role": "user"})["reason"] == "username_exists"
+    assert sqlite_db.update_user_profile("alice", {"role": "mentor"})["ok"]
+    assert sqlite_db.get_user("alice")["role"] == "mentor"
+
+    assert sqlite_db.add_submission({"name": "S", "time": "2026-01-01"})["ok"]
+    assert len(sqlite_db.get_submissions()) == 1
+
+    defaults = [{"id": "d1", "title": "Default"}]
+    assert sqlite_db.get_vr_jobs(defaults) == defaults
+    jobs = [{"id": "j1", "title": "Job", "videoId": "v", "riasec_code": "R"}]
+    assert sqlite_db.update_vr_jobs(jobs)["ok"]
+    assert sqlite_db.get_vr_jobs(defaults) == jobs
+
+
+def test_sqlite_imports_existing_json_files(sqlite_db, tmp_path, monkeypatch):
+    monkeypatch.delenv("STORAGE_BACKEND")
+    json_db = Database()
+    json_db.posts_file = tmp_path / "posts.json"
+    json_db.users_file = tmp_path / "users.json"
+    json_db.submissions_file = tmp_path / "submissions.json"
+    json_db.vr_jobs_file = tmp_path / "vr_jobs.json"
+    assert json_db.add_post(make_post("p1"))["ok"]
+    assert json_db.create_user({"username": "alice", "role": "user"})["ok"]
+    with open(json_db.vr_jobs_file, "w", encoding="utf-8") as f:
+        json.dump([{"id": "j1", "title": "Job"}], f)
+
+    for name in ("posts_file", "users_file", "submissions_file", "vr_jobs_file"):
+        setattr(sqlite_db, name, getattr(json_db, name))
+    import_local_files_into_sqlite(sqlite_db)
+
+    assert [p["id"] for p in sqlite_db.get_posts()] == ["p1"]
+    assert sqlite_db.get_user("alice")["role"] == "user"
+    assert sqlite_db.get_vr_jobs([])[0]["title"] == "Job"
+
+
+def test_sqlite_concurrent_likes_are_not_lost(sqlite_db):
+    assert sqlite_db.add_post(make_post("p1"))["ok"]
+    threads = [
+        threading.Thread(target=sqlite_db.toggle_post_like, args=("p1", f"guest:{idx}"), kwargs={"liked": True})
+        for idx in range(30)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    post = sqlite_db.get_posts()[0]
+    assert post["likes_count"] == 30
+    assert len(set(post["liked_by"])) == 30
+
+
+def test_sqlite_query_posts_uses_feed_order(sqlite_db):
+    sqlite_db.add_post(make_post("a", timestamp="2026-01-01T10:00:00", category="major"))
+    sqlite_db.add_post(make_post("b", timestamp="2026-01-03T10:00:00", category="study"))
+    sqlite_db.add_post(make_post("c", timestamp="2026-01-02T10:00:00", category="major", is_pinned=True))
+
+    assert [p["id"] for p in sqlite_db.query_posts()] == ["c", "b", "a"]
+    assert [p["id"] for p in sqlite_db.query_posts(sort="oldest", pinned_first=False)] == ["a", "c", "b"]
+    assert [p["id"] for p in sqlite_db.query_posts(category="major", offset=1)] == ["a"]
+    sqlite_db.add_comment("a", {"id": "c1", "author": "A", "content": "hi", "timestamp": "t"})
+    assert [p["id"] for p in sqlite_db.query_posts(sort="most_commented", pinned_first=False)] == ["a", "c", "b"]
+
+    plan = sqlite_db.sqlite.connection().execute(
+        "EXPLAIN QUERY PLAN SELECT doc FROM posts WHERE category = ? ORDER BY is_pinned DESC, timestamp DESC, id ASC",
+        ("major",),
+    ).fetchall()
+    assert any("idx_posts_category" in str(row) for row in plan)
+
+
+def test_sqlite_feed_cursor_is_a_range_query(sqlite_db):
+    _seed_feed(sqlite_db)
+    sqlite_db.add_post(make_post("e", timestamp="2026-01-02T10:00:00", category="major"))
+
+    for sort in ("newest", "oldest", "most_commented"):
+        expected = [p["id"] for p in sqlite_db.query_posts(sort=sort)]
+        assert _walk_feed(sqlite_db, sort=sort) == (expected, 3)
+    assert _walk_feed(sqlite_db, category="major")[0] == ["d", "c", "e", "a"]
+
+
+def test_sqlite_comment_pages_read_only_the_slice(sqlite_db):
+    _seed_thread(sqlite_db)
+
+    assert [c["id"] for c in sqlite_db.query_posts(comments_limit=2)[0]["comments"]] == ["c3", "c4"]
+    post = sqlite_db.query_posts(comments_limit=8)[0]
+    assert [c["id"] for c in post["comments"]] == ["c0", "c1", "c2", "c3", "c4"]
+    assert post["comments_count"] == len(post["comments"])
+    page = sqlite_db.get_comments_page("p1", limit=2)
+    assert ([c["id"] for c in page["comments"]], page["start"], page["comments_count"]) == (["c3", "c4"], 3, 5)
+    page = sqlite_db.get_comments_page("p1", before=1, limit=2)
+    assert ([c["id"] for c in page["comments"]], page["start"]) == (["c0"], 0)
+    assert page["helpful_comment_id"] == "c1"
+    assert sqlite_db.get_comments_page("missing") is None
+
+
+def test_sqlite_versions_are_bumped_in_the_write_transaction(sqlite_db):
+    assert sqlite_db.get_collection_versions(["posts", "users"]) == {"posts": "0", "users": "0"}
+    sqlite_db.add_post(make_post("p1"))
+    sqlite_db.add_post(make_post("p1"))  # duplicate: nothing written, no bump
+    sqlite_db.toggle_post_like("p1", "guest:1")
+    assert sqlite_db.get_collection_versions(["posts", "users"]) == {"posts": "2", "users": "0"}
+    assert Database().get_collection_versions(["posts"]) == {"posts": "2"}
+
+
+def test_sqlite_cached_rows_follow_other_connections_and_threads(sqlite_db):
+    store = sqlite_db.sqlite
+    store.posts.insert(make_post("p1"))
+    assert [p["id"] for p in store.posts.all()] == ["p1"]
+
+    # Another process (its own store and connection) writes: the cache must not be reused.
+    other = SQLiteStore(store.path)
+    other.posts.insert(make_post("p2"))
+    assert [p["id"] for p in store.posts.all()] == ["p1", "p2"]
+
+    # A write from another thread of this process, read back from a third thread.
+    writer = threading.Thread(target=store.posts.delete, args=("p1",))
+    writer.start()
+    writer.join()
+    seen = []
+    reader = threading.Thread(target=lambda: seen.extend(p["id"] for p in store.posts.all()))
+    reader.start()
+    reader.join()
+    assert seen == ["p2"]
+    assert [p["id"] for p in store.posts.all()] == ["p2"]
+
+
+def test_sqlite_single_post_lookups(sqlite_db):
+    _seed_thread(sqlite_db, count=2)
+    assert sqlite_db.get_post("p1", projection=["title"]) == {"id": "p1", "title": "Post p1"}
+    assert sqlite_db.get_comment("p1", "c1")["content"] == "1"
+    assert sqlite_db.get_post("missing") is None
+
+
+def test_sqlite_community_metrics_follow_writes(sqlite_db):
+    sqlite_db.add_post(make_post("p1"))
+    assert sqlite_db.get_community_metrics()["total_posts"] == 1
+    sqlite_db.add_post(make_post("p2"))
+    sqlite_db.add_comment("p1", {"id": "c1", "author": "A", "content": "hi", "timestamp": "t"})
+    sqlite_db.toggle_post_like("p2", "guest:1")
+    sqlite_db.delete_post("p1")
+    metrics = sqlite_db.get_community_metrics()
+    assert metrics == {
+        "total_posts": 1,
+        "total_comments": 0,
+        "total_likes": 1,
+        "total_reports": 0,
+        "pinned_posts": 0,
+        "helpful_marked_posts": 0,
+        "active_authors_30d": 0,
+        "posts_7d": 0,
+        "comments_7d": 0,
+        "engagement_actions": 1,
+        "engagement_per_post": 1.0,
+        "generated_at": metrics["generated_at"],
+    }
+
+
+def test_sqlite_community_metrics_follow_writes_of_another_process(sqlite_db):
+    sqlite_db.add_post(make_post("p1"))
+    assert sqlite_db.get_community_metrics()["total_posts"] == 1
+
+    other = Database()
+    other.add_post(make_post("p2"))
+    other.toggle_post_like("p1", "guest:1", liked=True)
+    metrics = sqlite_db.get_community_metrics()
+    assert (metrics["total_posts"], metrics["total_likes"]) == (2, 1)
+
+    # Our own writes keep the aggregates current without a rescan.
+    sqlite_db.get_posts = lambda: pytest.fail("an own write must not trigger a rebuild")
+    sqlite_db.add_post(make_post("p3"))
+    assert sqlite_db.get_community_metrics()["total_posts"] == 3
+
+
+def test_sqlite_reports_queue_is_an_indexed_range(sqlite_db):
+    assert {"idx_reports_status_queue", "idx_reports_post"} <= set(sqlite_db.sqlite.index_names("community_reports"))
+    sqlite_db.add_post(make_post("p1"))
+    sqlite_db.add_post(make_post("p2"))
+    for idx in range(3):
+        sqlite_db.report_post("p1", f"guest:{idx}", "spam")
+    sqlite_db.report_post("p2", "guest:0", "abuse")
+
+    first, cursor = sqlite_db.query_community_reports(limit=3)
+    rest, end = sqlite_db.query_community_reports(limit=3, cursor=cursor)
+    assert len(first) == 3 and len(rest) == 1 and end is None
+    assert len({e["id"] for e in first + rest}) == 4
+    assert [e["post_id"] for e in sqlite_db.query_community_reports(reason="abuse")[0]] == ["p2"]
+
+    sqlite_db.delete_post("p1")
+    assert sqlite_db.sqlite.community_reports.count() == 1
+
+
+def test_sqlite_keyword_search_reads_only_matching_rows(sqlite_db):
+    sqlite_db.add_post(make_post("a", title="Học lập trình", timestamp="2026-01-01T10:00:00"))
+    sqlite_db.add_post(make_post("b", title="Lập trình game", timestamp="2026-01-02T10:00:00"))
+    sqlite_db.add_post(make_post("c", title="Khác", timestamp="2026-01-03T10:00:00"))
+    assert [p["id"] for p in sqlite_db.query_posts(keyword="lap trinh")] == ["b", "a"]
+    assert _walk_feed(sqlite_db, keyword="lap") == (["b", "a"], 1)
+
+
+def test_sqlite_keyword_search_sees_posts_written_by_another_process(sqlite_db):
+    sqlite_db.add_post(make_post("a", title="Lập trình web"))
+    assert [p["id"] for p in sqlite_db.query_posts(keyword="lap")] == ["a"]
+
+    other = Database()
+    other.add_post(make_post("b", title="Lập kế hoạch", timestamp="2026-01-02T10:00:00"))
+    assert [p["id"] for p in sqlite_db.query_posts(keyword="lap")] == ["b", "a"]
+    other.delete_post("a")
+    assert [p["id"] for p in sqlite_db.query_posts(keyword="lap")] == ["b"]
+
+    # Our own writes are applied in place: no replay of the collection on the next query.
+    sqlite_db.add_post(make_post("c", title="Lập nghiệp", timestamp="2026-01-03T10:00:00"))
+    sqlite_db.sqlite.post_ids = lambda: pytest.fail("an own write must not trigger a replay")
+    assert [p["id"] for p in sqlite_db.query_posts(keyword="lap")] == ["c", "b"]
@@ -0,0 +1,40 @@
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from backend.fast_json import dumps, project, trusted_response
+from backend.main import Post, Submission
+
+
+def test_projection_matches_the_response_model():
+    post = {
+        "id": "p1",
+        "author": "Nguyễn",
+        "content": "Nội dung",
+        "timestamp": "2026-01-01T10:00:00",
+        "comments": [{"id": "c1", "author": "B", "content": "hi", "timestamp": "t", "reports": [{"actor_id": "x"}]}],
+        "author_username": "secret",
+        "reports": [{"actor_id": "x"}],
+    }
+    expected = Post.model_validate(post).model_dump(mode="json", by_alias=True)
+    assert project(post, Post) == expected
+    assert "reports" not in project(post, Post)["comments"][0]
+
+    submission = {"class": "12A", "riasec": ["R"], "scores": {"R": 3}, "answers": [1], "time": "t", "_id": "x"}
+    assert project(submission, Submission) == Submission.model_validate(submission).model_dump(mode="json", by_alias=True)
+
+
+def test_trusted_response_keeps_headers_and_encodes_utf8():
+    from fastapi import Response
+
+    sub_response = Response()
+    sub_response.headers["ETag"] = 'W/"abc"'
+    response = trusted_response([{"id": "p1", "author": "Ẩn danh", "content": "x", "timestamp": "t"}], Post, sub_response)
+
+    assert response.headers["etag"] == 'W/"abc"'
+    assert response.media_type == "application/json"
+    assert json.loads(response.body)[0]["author"] == "Ẩn danh"
+    assert dumps({"a": "Ẩn"}) == '{"a":"Ẩn"}'.encode("utf-8")